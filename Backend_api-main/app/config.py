@@ -6,4 +6,132 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1  # Token akan expired setelah 1 jam tanpa aktivitas
 
 # Database Configuration (jika diperlukan di masa depan)
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./elearn.db")
\ No newline at end of file
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./elearn.db")
+
+# Face Recognition Configuration
+# Cosine distance maksimum agar wajah dianggap cocok; kalibrasi dengan
+# face-recognition-test/calibrate_threshold.py
+FACE_MATCH_THRESHOLD = float(os.getenv("FACE_MATCH_THRESHOLD", "0.4"))
+# Backend ANN untuk gallery wajah: "ivf" (pure NumPy) atau "exact" (brute force)
+FACE_ANN_BACKEND = os.getenv("FACE_ANN_BACKEND", "ivf")
+# Di bawah ukuran ini gallery selalu memakai exact search
+FACE_ANN_MIN_GALLERY_SIZE = int(os.getenv("FACE_ANN_MIN_GALLERY_SIZE", "5000"))
+# Penyimpanan embedding: "mmap" (satu file matrix + journal, dishare antar worker) atau "pkl"
+FACE_EMBEDDING_STORE = os.getenv("FACE_EMBEDDING_STORE", "mmap")
+# Tipe data matrix di embedding store: "float32" atau "float16"
+FACE_EMBEDDING_STORE_DTYPE = os.getenv("FACE_EMBEDDING_STORE_DTYPE", "float32")
+
+# Pantau folder embeddings (dan embedding store) untuk perubahan dari luar API:
+# "auto" (inotify, fallback polling), "inotify", "poll" atau "off"
+FACE_GALLERY_WATCH = os.getenv("FACE_GALLERY_WATCH", "auto")
+FACE_GALLERY_POLL_SECONDS = float(os.getenv("FACE_GALLERY_POLL_SECONDS", "0.5"))
+
+# Sumber kebenaran embedding: "files" (embeddings/*.pkl) atau "db" (kolom face_registrations.embedding,
+# dishare antar node; gallery tiap node ditarik lewat watermark updated_at)
+FACE_EMBEDDING_SOURCE = os.getenv("FACE_EMBEDDING_SOURCE", "files")
+# Tipe data kolom face_registrations.embedding: "float32" (2 KB) atau "float16" (1 KB)
+FACE_DB_EMBEDDING_DTYPE = os.getenv("FACE_DB_EMBEDDING_DTYPE", "float32")
+# Interval polling baris baru/berubah, dan interval cek baris yang dihapus
+FACE_DB_SYNC_SECONDS = float(os.getenv("FACE_DB_SYNC_SECONDS", "2"))
+FACE_DB_FULL_SYNC_SECONDS = float(os.getenv("FACE_DB_FULL_SYNC_SECONDS", "60"))
+
+# Identitas ruang embedding gallery (bobot FaceNet keras_facenet 20180402-114759, 512 dimensi).
+# Ganti jika gallery di-enroll ulang dengan model lain; embedding dari client harus sama persis
+FACE_EMBEDDING_MODEL_ID = os.getenv("FACE_EMBEDDING_MODEL_ID", "facenet")
+FACE_EMBEDDING_MODEL_VERSION = os.getenv("FACE_EMBEDDING_MODEL_VERSION", "20180402-114759")
+# "1" = /face/recognize, /face/verify dan /face/check-in menerima embedding yang dihitung di HP
+# (FaceNet on-device) sebagai pengganti foto
+FACE_CLIENT_EMBEDDING = os.getenv("FACE_CLIENT_EMBEDDING", "0") == "1"
+# Pack embedding roster per kelas untuk matching offline di HP (/face/roster-pack):
+# jumlah versi lama per kelas yang diingat untuk menjawab delta (?since=)
+FACE_ROSTER_PACK_HISTORY = int(os.getenv("FACE_ROSTER_PACK_HISTORY", "4"))
+
+# Inference executor (MTCNN/FaceNet di luar event loop)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+# Jumlah request yang boleh menunggu; lebih dari ini langsung ditolak 503 + Retry-After
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "16"))
+INFERENCE_RETRY_AFTER_SECONDS = int(os.getenv("INFERENCE_RETRY_AFTER_SECONDS", "1"))
+# Thread per operasi untuk runtime FaceNet (TensorFlow / ONNX Runtime / TFLite), 0 = default
+INFERENCE_TF_INTRA_OP_THREADS = int(os.getenv("INFERENCE_TF_INTRA_OP_THREADS", "0"))
+# Micro-batching embedding FaceNet: batch ditutup setelah sekian ms atau saat penuh
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "16"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+# Runtime FaceNet: "keras" (TensorFlow), "onnx" (ONNX Runtime) atau "tflite"; lihat convert_facenet.py
+FACE_EMBEDDER_BACKEND = os.getenv("FACE_EMBEDDER_BACKEND", "keras")
+# "1" = pakai model hasil kuantisasi int8 dinamis (facenet.int8.onnx / .tflite)
+FACE_EMBEDDER_INT8 = os.getenv("FACE_EMBEDDER_INT8", "0") == "1"
+# Path model onnx/tflite; kosong = model_cache/facenet/facenet[.int8].<ext>
+FACE_EMBEDDER_MODEL_PATH = os.getenv("FACE_EMBEDDER_MODEL_PATH", "")
+# Detector wajah: "mtcnn", "yunet" (OpenCV DNN), "mediapipe" atau "haar" (fallback terakhir)
+FACE_DETECTOR_BACKEND = os.getenv("FACE_DETECTOR_BACKEND", "mtcnn")
+# Folder file model detector (mis. face_detection_yunet_2023mar.onnx untuk YuNet)
+FACE_DETECTOR_MODEL_DIR = os.getenv(
+    "FACE_DETECTOR_MODEL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "model_cache", "face_detector")
+)
+# Wajah dengan confidence di bawah ini diabaikan (0 = pakai default backend)
+FACE_DETECTOR_MIN_CONFIDENCE = float(os.getenv("FACE_DETECTOR_MIN_CONFIDENCE", "0"))
+
+# Upload gambar (/face/*, /gaze/*)
+IMAGE_MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# Batas piksel dari header, menolak "decompression bomb" sebelum decode
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(50_000_000)))
+# Deteksi wajah jalan di gambar yang di-decode tereduksi dengan sisi panjang >= nilai ini
+FACE_DETECT_TARGET_SIDE = int(os.getenv("FACE_DETECT_TARGET_SIDE", "640"))
+GAZE_DETECT_TARGET_SIDE = int(os.getenv("GAZE_DETECT_TARGET_SIDE", "480"))
+# Pool MediaPipe FaceMesh untuk /gaze/predict (FaceMesh tidak thread-safe): satu instance per
+# frame yang diproses bersamaan; 0 = jumlah CPU. Frame di atas pool + antrian ditolak 503
+GAZE_FACE_MESH_POOL_SIZE = int(os.getenv("GAZE_FACE_MESH_POOL_SIZE", "0")) or (os.cpu_count() or 1)
+GAZE_QUEUE_SIZE = int(os.getenv("GAZE_QUEUE_SIZE", "32"))
+# "1" = tiap frame dideteksi ulang (static_image_mode), tracking state tidak tercampur antar user
+GAZE_FACE_MESH_STATIC = os.getenv("GAZE_FACE_MESH_STATIC", "1") == "1"
+# Presensi kelompok (/face/group-check-in): wajah di foto kelas kecil, jadi deteksi di resolusi lebih besar
+FACE_GROUP_DETECT_TARGET_SIDE = int(os.getenv("FACE_GROUP_DETECT_TARGET_SIDE", "1920"))
+FACE_GROUP_MAX_PHOTOS = int(os.getenv("FACE_GROUP_MAX_PHOTOS", "3"))
+# Upload wajah yang sudah di-crop dan di-align di HP (aligned=true di /face/register, /face/recognize):
+# deteksi dilewati, jadi ukuran dan rasio sisi dicek dulu supaya foto utuh tidak ikut di-embed
+FACE_CROP_MIN_SIDE = int(os.getenv("FACE_CROP_MIN_SIDE", "112"))
+FACE_CROP_MAX_SIDE = int(os.getenv("FACE_CROP_MAX_SIDE", "640"))
+FACE_CROP_MAX_ASPECT = float(os.getenv("FACE_CROP_MAX_ASPECT", "1.3"))
+# Burst foto / klip video di /face/recognize dan /face/verify: jumlah frame maksimum yang dianalisis,
+# durasi video yang dibaca (detik), dan jumlah frame terbaik yang di-embed dalam satu batch
+FACE_BURST_MAX_FRAMES = int(os.getenv("FACE_BURST_MAX_FRAMES", "10"))
+FACE_VIDEO_MAX_SECONDS = float(os.getenv("FACE_VIDEO_MAX_SECONDS", "2"))
+FACE_BURST_TOP_K = int(os.getenv("FACE_BURST_TOP_K", "3"))
+# Quality gate setelah deteksi, sebelum FaceNet: wajah blur, kecil, gelap/terang atau menoleh
+# ditolak dengan alasan yang jelas ("0" = nonaktif)
+FACE_QUALITY_GATE = os.getenv("FACE_QUALITY_GATE", "1") == "1"
+# Variansi Laplacian minimum (crop 160x160) dan jarak antar mata minimum (px, resolusi penuh)
+FACE_QUALITY_MIN_SHARPNESS = float(os.getenv("FACE_QUALITY_MIN_SHARPNESS", "30"))
+FACE_QUALITY_MIN_INTER_OCULAR = float(os.getenv("FACE_QUALITY_MIN_INTER_OCULAR", "24"))
+# |yaw| maksimum: geser hidung dari tengah mata / jarak antar mata (0 = frontal)
+FACE_QUALITY_MAX_YAW = float(os.getenv("FACE_QUALITY_MAX_YAW", "0.45"))
+# Rentang rata-rata kecerahan wajah (0-255)
+FACE_QUALITY_MIN_BRIGHTNESS = float(os.getenv("FACE_QUALITY_MIN_BRIGHTNESS", "40"))
+FACE_QUALITY_MAX_BRIGHTNESS = float(os.getenv("FACE_QUALITY_MAX_BRIGHTNESS", "220"))
+# Enrollment multi-foto asinkron (/face/enroll): jumlah foto per job, minimum foto yang lolos
+# (deteksi + quality gate + cek outlier) untuk membentuk centroid, dan job yang diproses bersamaan per worker
+FACE_ENROLL_MIN_IMAGES = int(os.getenv("FACE_ENROLL_MIN_IMAGES", "3"))
+FACE_ENROLL_MAX_IMAGES = int(os.getenv("FACE_ENROLL_MAX_IMAGES", "10"))
+FACE_ENROLL_MIN_ACCEPTED = int(os.getenv("FACE_ENROLL_MIN_ACCEPTED", "2"))
+FACE_ENROLL_CONCURRENCY = int(os.getenv("FACE_ENROLL_CONCURRENCY", "1"))
+# Interval heartbeat job enrollment (detik); job queued/running tanpa heartbeat selama
+# FACE_ENROLL_STALE_SECONDS dianggap mati (worker crash/restart) dan ditandai failed
+FACE_ENROLL_HEARTBEAT_SECONDS = int(os.getenv("FACE_ENROLL_HEARTBEAT_SECONDS", "15"))
+FACE_ENROLL_STALE_SECONDS = int(os.getenv("FACE_ENROLL_STALE_SECONDS", "120"))
+
+# Model ML (FaceNet, detector, FaceMesh)
+# Cache bobot model lokal; isinya diverifikasi dengan SHA256SUMS (lihat prepare_model_cache.py)
+MODEL_CACHE_DIR = os.getenv(
+    "MODEL_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "model_cache")
+)
+# "1" = jangan pernah download bobot, gagal kalau belum ada di cache (host offline)
+MODEL_OFFLINE = os.getenv("MODEL_OFFLINE", "0") == "1"
+# "background" = model dimuat di thread background saat startup, "lazy" = saat request pertama
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "background")
+
+# Cache hasil inference per isi upload (retry dari HP); 0 entry = cache mati
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "2048"))
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "32"))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
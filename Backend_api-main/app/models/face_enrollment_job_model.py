@@ -0,0 +1,19 @@
+# app/models/face_enrollment_job_model.py
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Text
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class FaceEnrollmentJob(Base):
+    __tablename__ = "face_enrollment_jobs"
+
+    id_job = Column(String(32), primary_key=True, comment="uuid4 hex, dikembalikan ke client sebagai job_id")
+    nim = Column(String(50), nullable=False, index=True)
+    status = Column(Enum('queued', 'running', 'done', 'failed'), nullable=False, default='queued')
+    total_images = Column(Integer, nullable=False)
+    accepted_images = Column(Integer, default=0, comment="Foto yang ikut membentuk centroid")
+    rejected = Column(Text, nullable=True, comment="JSON: [{image, reason, message}] foto yang ditolak")
+    message = Column(String(255), nullable=True)
+    worker = Column(String(128), nullable=True, comment="host:pid proses yang memproses job")
+    heartbeat_at = Column(DateTime, nullable=True, comment="Diperbarui berkala selama job hidup di worker-nya")
+    created_at = Column(DateTime, server_default=func.current_timestamp())
+    updated_at = Column(DateTime, server_default=func.current_timestamp(), onupdate=func.current_timestamp())
@@ -1,112 +1,1216 @@
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, UploadFile, File, Form, Header, Depends, HTTPException, Response, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date, datetime
 import numpy as np
-import cv2
-from keras_facenet import FaceNet
-from mtcnn import MTCNN
+import asyncio
+import base64
+import binascii
+import json
 import os
 import pickle
-from scipy.spatial.distance import cosine
+import socket
+import uuid
+from collections import Counter
+from app.config import (
+    INFERENCE_WORKERS,
+    INFERENCE_QUEUE_SIZE,
+    INFERENCE_RETRY_AFTER_SECONDS,
+    INFERENCE_TF_INTRA_OP_THREADS,
+    EMBEDDING_BATCH_MAX_SIZE,
+    EMBEDDING_BATCH_MAX_WAIT_MS,
+    FACE_DETECTOR_BACKEND,
+    FACE_DETECTOR_MODEL_DIR,
+    FACE_DETECTOR_MIN_CONFIDENCE,
+    FACE_DETECT_TARGET_SIDE,
+    FACE_EMBEDDER_BACKEND,
+    FACE_EMBEDDER_INT8,
+    FACE_EMBEDDER_MODEL_PATH,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_MAX_MB,
+    RESULT_CACHE_TTL_SECONDS,
+    FACE_GALLERY_WATCH,
+    FACE_EMBEDDING_SOURCE,
+    FACE_DB_EMBEDDING_DTYPE,
+    FACE_DB_SYNC_SECONDS,
+    FACE_DB_FULL_SYNC_SECONDS,
+    FACE_MATCH_THRESHOLD,
+    FACE_GROUP_DETECT_TARGET_SIDE,
+    FACE_GROUP_MAX_PHOTOS,
+    FACE_EMBEDDING_MODEL_ID,
+    FACE_EMBEDDING_MODEL_VERSION,
+    FACE_CLIENT_EMBEDDING,
+    FACE_CROP_MIN_SIDE,
+    FACE_CROP_MAX_SIDE,
+    FACE_CROP_MAX_ASPECT,
+    FACE_BURST_MAX_FRAMES,
+    FACE_VIDEO_MAX_SECONDS,
+    FACE_BURST_TOP_K,
+    FACE_QUALITY_GATE,
+    FACE_QUALITY_MIN_SHARPNESS,
+    FACE_QUALITY_MIN_INTER_OCULAR,
+    FACE_QUALITY_MAX_YAW,
+    FACE_QUALITY_MIN_BRIGHTNESS,
+    FACE_QUALITY_MAX_BRIGHTNESS,
+    FACE_ROSTER_PACK_HISTORY,
+    FACE_ENROLL_MIN_IMAGES,
+    FACE_ENROLL_MAX_IMAGES,
+    FACE_ENROLL_MIN_ACCEPTED,
+    FACE_ENROLL_CONCURRENCY,
+    FACE_ENROLL_HEARTBEAT_SECONDS,
+    FACE_ENROLL_STALE_SECONDS
+)
+from app.core.database import get_db, SessionLocal
+from app.models.face_registration_model import FaceRegistration
+from app.models.face_enrollment_job_model import FaceEnrollmentJob
+from app.models.presensi_model import Presensi
+from app.models.kelas_mata_kuliah_model import KelasMatKuliah
+from app.models.mahasiswa_model import Mahasiswa
+from app.services.face_gallery import face_gallery, gallery_watcher, normalize, EMBEDDINGS_DIR
+from app.services.gallery_db_sync import GalleryDBSync
+from app.services.face_detector import create_detector
+from app.services.face_embedder import create_embedder, default_model_path, FACENET_INPUT_SIZE
+from app.services.model_registry import model_registry
+from app.services.image_ingest import (
+    read_upload, decode_image, decode_video_frames, probe, IngestedImage, ImageTooLarge, InvalidImage
+)
+from app.services.result_cache import ResultCache, content_digest
+from app.services.inference_executor import InferenceExecutor, InferenceQueueFull, MicroBatcher
+from app.services.presensi_service import check_in_error, mark_hadir, get_kelas_info
+from app.services.group_attendance import assign_faces
+from app.services.face_quality import frame_quality, QualityGate, LowFaceQuality
+from app.services.roster_pack import RosterPackCache, PACK_DTYPE, encode_matrix
+from app.services.face_registration_service import (
+    CONFIDENCE_THRESHOLD,
+    EMBEDDING_DTYPES,
+    decode_embedding,
+    get_active_registration,
+    enrollment_centroid,
+    record_verification,
+    save_embedding,
+    save_samples
+)
 
 router = APIRouter(prefix="/face", tags=["Face Recognition"])
 
-# Inisialisasi FaceNet dan MTCNN
-embedder = FaceNet()   
-detector = MTCNN()
 
-# Folder untuk menyimpan embedding (relatif ke Backend_api)
-EMBEDDINGS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "embeddings")
+def load_facenet():
+    # Backend dari FACE_EMBEDDER_BACKEND: keras (TensorFlow), onnx atau tflite
+    model_path = FACE_EMBEDDER_MODEL_PATH or None
+    if model_path is None and FACE_EMBEDDER_BACKEND != "keras":
+        model_path = default_model_path(FACE_EMBEDDER_BACKEND, int8=FACE_EMBEDDER_INT8)
+    return create_embedder(
+        FACE_EMBEDDER_BACKEND,
+        model_path=model_path,
+        intra_op_threads=INFERENCE_TF_INTRA_OP_THREADS
+    )
+
+
+def load_face_detector():
+    # Backend dari FACE_DETECTOR_BACKEND
+    options = {"model_dir": FACE_DETECTOR_MODEL_DIR}
+    if FACE_DETECTOR_MIN_CONFIDENCE > 0:
+        options["min_confidence"] = FACE_DETECTOR_MIN_CONFIDENCE
+    return create_detector(FACE_DETECTOR_BACKEND, **options)
+
+
+# FACE_EMBEDDING_SOURCE=db: gallery adalah cache dari face_registrations.embedding
+gallery_db_sync = GalleryDBSync(
+    face_gallery,
+    SessionLocal,
+    poll_interval=FACE_DB_SYNC_SECONDS,
+    full_sync_interval=FACE_DB_FULL_SYNC_SECONDS
+)
+
+
+def load_face_gallery():
+    # Index embedding resident di memori, dibangun sekali per proses lalu diperbarui
+    # per perubahan (tanpa full reload): dari tabel face_registrations oleh gallery_db_sync,
+    # atau dari file .pkl oleh gallery_watcher
+    face_gallery.load()
+    if FACE_EMBEDDING_SOURCE == "db":
+        gallery_db_sync.start()
+    elif FACE_GALLERY_WATCH != "off":
+        gallery_watcher.start()
+    return face_gallery
+
+
+# FaceNet, detector dan gallery dimuat saat pertama dipakai (atau oleh warm-up di main.py),
+# bukan saat modul ini di-import
+model_registry.register("face_gallery", load_face_gallery)
+model_registry.register("face_detector", load_face_detector)
+model_registry.register("facenet", load_facenet)
+
+
+def get_gallery():
+    return model_registry.get("face_gallery")
+
+
+# Semua inference jalan di thread pool ini, bukan di event loop
+face_inference = InferenceExecutor(
+    "face-inference",
+    max_workers=INFERENCE_WORKERS,
+    max_queue=INFERENCE_QUEUE_SIZE,
+    retry_after=INFERENCE_RETRY_AFTER_SECONDS
+)
+
 os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
 
-# Threshold cosine similarity
-THRESHOLD = 0.4
+# Threshold cosine distance
+THRESHOLD = FACE_MATCH_THRESHOLD
 
-# ========================
-# Endpoint registrasi wajah
-# ========================
+# Versi pipeline deteksi + embedding, bagian dari key cache hasil
+PIPELINE_VERSION = (
+    f"{FACE_DETECTOR_BACKEND}/{FACE_EMBEDDER_BACKEND}{'-int8' if FACE_EMBEDDER_INT8 else ''}"
+    f"/{FACE_DETECT_TARGET_SIDE}"
+)
 
-@router.post("/register")
-async def register_face(file: UploadFile = File(...), username: str = Form(...)):
+# Pack embedding roster per kelas untuk matching offline di HP
+roster_packs = RosterPackCache(
+    FACE_EMBEDDING_MODEL_ID,
+    FACE_EMBEDDING_MODEL_VERSION,
+    history=FACE_ROSTER_PACK_HISTORY
+)
+
+# Hasil per isi upload: box + embedding (termasuk "wajah tidak terdeteksi") dan response recognize
+face_result_cache = ResultCache(
+    "face",
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024,
+    ttl_seconds=RESULT_CACHE_TTL_SECONDS
+)
+
+
+def get_roster_partition(db: Session, id_kelas_mk: Optional[int] = None, id_presensi: Optional[int] = None):
     """
-    Registrasi wajah baru untuk face recognition
+    Ambil partisi gallery untuk roster kelas (mahasiswa.id_kelas via kelas_mata_kuliah).
+    Partisi di-cache per id_kelas, jadi query roster hanya jalan saat cache kosong.
+    Return None jika kelas tidak ditemukan.
     """
-    try:
-        # Baca file gambar
-        image_bytes = await file.read()
-        np_arr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+    if id_presensi is not None:
+        presensi = db.query(Presensi).filter(Presensi.id_presensi == id_presensi).first()
+        if not presensi:
+            return None
+        id_kelas_mk = presensi.id_kelas_mk
+
+    kelas_mk = db.query(KelasMatKuliah).filter(KelasMatKuliah.id_kelas_mk == id_kelas_mk).first()
+    if not kelas_mk:
+        return None
+
+    partition = get_gallery().get_partition(kelas_mk.id_kelas)
+    if partition is None:
+        roster = db.query(Mahasiswa.nim).filter(Mahasiswa.id_kelas == kelas_mk.id_kelas).all()
+        partition = get_gallery().set_partition(kelas_mk.id_kelas, [row.nim for row in roster])
+    return partition
+
+
+# Wajah yang gagal quality gate tidak pernah sampai ke FaceNet
+face_quality_gate = QualityGate(
+    enabled=FACE_QUALITY_GATE,
+    min_sharpness=FACE_QUALITY_MIN_SHARPNESS,
+    min_inter_ocular=FACE_QUALITY_MIN_INTER_OCULAR,
+    max_yaw=FACE_QUALITY_MAX_YAW,
+    min_brightness=FACE_QUALITY_MIN_BRIGHTNESS,
+    max_brightness=FACE_QUALITY_MAX_BRIGHTNESS
+)
+
+
+def detect_face(image_bytes):
+    """
+    Decode gambar (tereduksi), crop wajah pertama yang terdeteksi lalu cek kualitasnya.
+    Return (box, crop) dengan box di koordinat gambar tereduksi, atau None jika wajah tidak terdeteksi.
+    Wajah yang tidak layak di-embed -> LowFaceQuality.
+    """
+    image = decode_image(image_bytes, FACE_DETECT_TARGET_SIDE)
+
+    # Deteksi wajah di gambar kecil
+    faces = model_registry.get("face_detector").detect(image.image)
+    if len(faces) == 0:
+        return None
 
-        # Deteksi wajah
-        faces = detector.detect_faces(img)
+    # Ambil wajah pertama; crop dari resolusi penuh hanya jika wajahnya kecil
+    box = faces[0]['box']
+    crop = image.crop(box, min_side=FACENET_INPUT_SIZE)
+    face_quality_gate.check(crop, faces[0].get('keypoints'), image.scale)
+    return box, crop
+
+
+class InvalidFaceCrop(ValueError):
+    """Upload aligned=true yang tidak terlihat seperti crop wajah."""
+
+
+def face_crop_error(width, height):
+    """Cek murah ukuran dan rasio sisi crop wajah dari HP. Return pesan error atau None"""
+    if min(width, height) < FACE_CROP_MIN_SIDE:
+        return f"Crop wajah terlalu kecil ({width}x{height}), minimal {FACE_CROP_MIN_SIDE}px"
+    if max(width, height) > FACE_CROP_MAX_SIDE:
+        return f"Crop wajah terlalu besar ({width}x{height}), maksimal {FACE_CROP_MAX_SIDE}px; kirim tanpa aligned untuk foto utuh"
+    if max(width, height) > FACE_CROP_MAX_ASPECT * min(width, height):
+        return f"Crop wajah harus (hampir) persegi, diterima {width}x{height}"
+    return None
+
+
+def load_face_crop(image_bytes):
+    """
+    Pengganti detect_face untuk crop wajah yang sudah di-align di HP (mis. 160x160):
+    tanpa deteksi, seluruh gambar adalah wajah. Ukuran dari header dicek sebelum decode.
+    Return (box, crop) seperti detect_face; crop tidak valid -> InvalidFaceCrop.
+    """
+    width, height, _ = probe(image_bytes)
+    error = face_crop_error(width, height) if width and height else None
+    if error is None:
+        image = decode_image(image_bytes).image
+        height, width = image.shape[:2]
+        error = face_crop_error(width, height)
+    if error:
+        raise InvalidFaceCrop(error)
+    # Tanpa landmark: hanya blur dan exposure yang dicek
+    face_quality_gate.check(image)
+    return [0, 0, width, height], image
+
+
+# Wajah lebih kecil dari ini (px, resolusi penuh) di foto kelas diabaikan: embedding-nya tidak bisa diandalkan
+GROUP_MIN_FACE_SIDE = 24
+
+
+def detect_all_faces(image_bytes):
+    """
+    Deteksi semua wajah di foto kelas. Return list {"box" (koordinat resolusi
+    penuh), "confidence", "crop"}; crop wajah kecil diambil dari resolusi penuh.
+    """
+    image = decode_image(image_bytes, FACE_GROUP_DETECT_TARGET_SIDE)
+    faces = []
+    for face in model_registry.get("face_detector").detect(image.image):
+        box = face["box"]
+        if min(box[2], box[3]) * image.scale < GROUP_MIN_FACE_SIDE:
+            continue
+        crop = image.crop(box, min_side=FACENET_INPUT_SIZE)
+        if crop.size == 0:
+            continue
+        faces.append({
+            "box": [int(v * image.scale) for v in box],
+            "confidence": round(float(face["confidence"]), 4),
+            "crop": crop,
+        })
+    return faces
+
+
+def select_best_frames(frames, top_k):
+    """
+    Deteksi wajah di tiap frame burst (bytes foto) atau video (ndarray yang sudah
+    diperkecil), buang frame yang ditolak quality gate, beri skor murah (sharpness,
+    ukuran wajah, yaw dari landmark) lalu ambil top_k terbaik. Return (kandidat terurut
+    {"frame", "crop", "quality"}, jumlah frame berwajah, {alasan: jumlah frame ditolak}).
+    Ada wajah tapi tidak satu pun frame lolos -> LowFaceQuality (alasan terbanyak).
+    """
+    detector = model_registry.get("face_detector")
+    candidates = []
+    with_face = 0
+    rejected = Counter()
+    for index, frame in enumerate(frames):
+        if isinstance(frame, bytes):
+            image = decode_image(frame, FACE_DETECT_TARGET_SIDE)
+        else:
+            image = IngestedImage(None, frame, 1, 1)
+        faces = detector.detect(image.image)
         if len(faces) == 0:
-            return {"status": "error", "message": "Wajah tidak terdeteksi"}
+            continue
+        face = faces[0]
+        crop = image.crop(face["box"], min_side=FACENET_INPUT_SIZE)
+        if crop.size == 0:
+            continue
+        with_face += 1
+        try:
+            face_quality_gate.check(crop, face.get("keypoints"), image.scale)
+        except LowFaceQuality as e:
+            rejected[e.reason] += 1
+            continue
+        candidates.append({
+            "frame": index,
+            "crop": crop,
+            "quality": frame_quality(crop, face["box"], face["keypoints"], image.scale),
+        })
+    if not candidates and rejected:
+        reason = rejected.most_common(1)[0][0]
+        raise LowFaceQuality(reason, face_quality_gate.MESSAGES[reason])
+    candidates.sort(key=lambda c: c["quality"]["score"], reverse=True)
+    return candidates[:top_k], with_face, dict(rejected)
+
+
+def embed_faces(face_crops):
+    """Satu forward pass FaceNet untuk semua crop dalam batch"""
+    return list(model_registry.get("facenet").embeddings(face_crops))
+
 
-        # Ambil wajah pertama
-        x, y, w, h = faces[0]['box']
-        face_crop = img[y:y+h, x:x+w]
+# Request register/recognize/verify yang datang bersamaan digabung jadi satu batch FaceNet
+embedding_batcher = MicroBatcher(
+    embed_faces,
+    face_inference,
+    max_batch=EMBEDDING_BATCH_MAX_SIZE,
+    max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS
+)
+
+
+def queue_full_error(e: InferenceQueueFull):
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server face recognition sedang sibuk, silakan coba lagi",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+def image_too_large_error(e: ImageTooLarge):
+    return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=e.message)
+
+
+async def read_image(file: UploadFile):
+    """Baca upload dengan batas ukuran; terlalu besar -> 413"""
+    try:
+        return await read_upload(file)
+    except ImageTooLarge as e:
+        raise image_too_large_error(e)
 
-        # Buat embedding
-        embedding = embedder.embeddings([face_crop])[0]
 
-        # Simpan embedding ke file
+async def run_inference(fn, *args):
+    """Jalankan fn di face_inference; antrian penuh -> 503 dengan Retry-After, gambar terlalu besar -> 413"""
+    try:
+        return await face_inference.run(fn, *args)
+    except InferenceQueueFull as e:
+        raise queue_full_error(e)
+    except ImageTooLarge as e:
+        raise image_too_large_error(e)
+
+
+async def extract_embedding(image_bytes, digest=None, aligned=False):
+    """
+    Deteksi wajah lalu buat embedding lewat micro-batcher; aligned=True melewati
+    deteksi (upload sudah berupa crop wajah, lihat load_face_crop).
+    Hasil (termasuk "wajah tidak terdeteksi" dan penolakan quality gate) di-cache per isi upload.
+    Return None jika wajah tidak terdeteksi; wajah berkualitas buruk -> LowFaceQuality.
+    """
+    key = (digest or content_digest(image_bytes), "embedding", PIPELINE_VERSION, aligned)
+    cached = face_result_cache.get(key)
+    if cached is not ResultCache.MISS:
+        if cached.get("rejected"):
+            raise LowFaceQuality(*cached["rejected"])
+        return cached["embedding"]
+
+    try:
+        detected = await run_inference(load_face_crop if aligned else detect_face, image_bytes)
+    except LowFaceQuality as e:
+        face_result_cache.put(key, {"box": None, "embedding": None, "rejected": (e.reason, e.message)})
+        raise
+    if detected is None:
+        face_result_cache.put(key, {"box": None, "embedding": None})
+        return None
+    box, face_crop = detected
+    try:
+        embedding = await embedding_batcher.submit(face_crop)
+    except InferenceQueueFull as e:
+        raise queue_full_error(e)
+    face_result_cache.put(key, {"box": box, "embedding": embedding})
+    return embedding
+
+
+def parse_client_embedding(embedding: str, embedding_dtype: str, model_id: Optional[str], model_version: Optional[str]):
+    """
+    Validasi embedding yang dihitung di HP: base64 dari vektor float32/float16 sepanjang
+    dimensi gallery, dari model yang sama persis dengan gallery. Model/versi lain -> 409
+    (ruang embedding berbeda, jaraknya tidak bermakna), format salah -> 400.
+    """
+    if not FACE_CLIENT_EMBEDDING:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Embedding dari client tidak diaktifkan, kirim foto")
+    if not model_id or not model_version:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="model_id dan model_version wajib dikirim bersama embedding")
+    if (model_id, model_version) != (FACE_EMBEDDING_MODEL_ID, FACE_EMBEDDING_MODEL_VERSION):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=(
+                f"Model embedding {model_id}@{model_version} tidak cocok dengan gallery "
+                f"({FACE_EMBEDDING_MODEL_ID}@{FACE_EMBEDDING_MODEL_VERSION}), kirim foto"
+            )
+        )
+
+    dim = get_gallery().dim
+    try:
+        blob = base64.b64decode(embedding, validate=True)
+    except (binascii.Error, ValueError):
+        blob = None
+    vector = decode_embedding(blob, embedding_dtype, dim)
+    if vector is None or not np.all(np.isfinite(vector)) or not np.any(vector):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Embedding harus base64 dari {dim} nilai {'/'.join(EMBEDDING_DTYPES)} yang valid"
+        )
+    return vector
+
+
+async def query_embedding(file: Optional[UploadFile], embedding: Optional[str], embedding_dtype: str,
+                          model_id: Optional[str], model_version: Optional[str]):
+    """
+    Embedding untuk dicocokkan: dari foto (deteksi + FaceNet) atau langsung dari client
+    (tanpa inference). Return None jika wajah di foto tidak terdeteksi.
+    """
+    if embedding is not None:
+        if file is not None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Kirim foto atau embedding, bukan keduanya")
+        return parse_client_embedding(embedding, embedding_dtype, model_id, model_version)
+    if file is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Foto (file) atau embedding wajib dikirim")
+    return await extract_embedding(await read_image(file))
+
+
+def burst_requested(file, embedding, frames, video):
+    """True jika request berisi burst foto atau video; input lain di request yang sama -> 400"""
+    if not frames and video is None:
+        return False
+    if file is not None or embedding is not None or (frames and video is not None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Kirim satu jenis input: file, frames, video atau embedding")
+    if frames and len(frames) > FACE_BURST_MAX_FRAMES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Maksimal {FACE_BURST_MAX_FRAMES} frame per request")
+    return True
+
+
+async def burst_embedding(frames: Optional[List[UploadFile]], video: Optional[UploadFile]):
+    """
+    Satu keputusan dari burst foto atau klip video 1-2 detik: FACE_BURST_TOP_K frame
+    terbaik di-embed dalam satu batch FaceNet, lalu embedding-nya digabung (rata-rata
+    vektor ternormalisasi). Return (embedding atau None jika tidak ada wajah, info burst).
+    """
+    if video is not None:
+        data = await read_image(video)
+        frames_data = await run_inference(
+            decode_video_frames, data, FACE_BURST_MAX_FRAMES, FACE_VIDEO_MAX_SECONDS, FACE_DETECT_TARGET_SIDE
+        )
+    else:
+        frames_data = [await read_image(frame) for frame in frames]
+
+    best, with_face, rejected = await run_inference(select_best_frames, frames_data, FACE_BURST_TOP_K)
+    info = {
+        "frames_received": len(frames_data),
+        "frames_with_face": with_face,
+        "frames_rejected": rejected,
+        "frames_used": [{"frame": c["frame"], **c["quality"]} for c in best],
+    }
+    if not best:
+        return None, info
+    embeddings = await run_inference(embed_faces, [c["crop"] for c in best])
+    return normalize(np.mean(normalize(np.asarray(embeddings, dtype=np.float32)), axis=0)), info
+
+
+def recognize_response(gallery, embedding, partition=None):
+    # Bandingkan dengan index embedding (sudah terurut, jarak terkecil = match terbaik)
+    results = [
+        {
+            "username": username,
+            "distance": distance,
+            "confidence": 1 - distance
+        }
+        for username, distance in gallery.search(embedding, THRESHOLD, partition=partition)
+    ]
+    if results:
+        return {"status": "success", "recognized": results}
+    return {"status": "success", "recognized": None, "message": "Wajah tidak dikenali"}
+
+
+def store_registration(db: Session, username: str, embedding, samples=None):
+    """
+    Simpan embedding registrasi sesuai FACE_EMBEDDING_SOURCE (commit dan gallery.add
+    dilakukan oleh pemanggil): mode db upsert baris face_registrations, mode files
+    menulis embeddings/<username>.pkl. samples = embedding per foto dari /face/enroll;
+    sampel hanya bisa disimpan di face_registrations, jadi barisnya dibuat di kedua mode.
+    Return baris face_registrations, atau None jika belum ada (/register mode files).
+    """
+    face_reg = db.query(FaceRegistration).filter(FaceRegistration.nim == username).first()
+    if FACE_EMBEDDING_SOURCE == "db" or samples is not None:
+        if face_reg is None:
+            face_reg = FaceRegistration(nim=username, embedding_filename=f"{username}.pkl")
+            db.add(face_reg)
+        face_reg.is_active = True
+        face_reg.failed_attempts = 0
+    if FACE_EMBEDDING_SOURCE != "db":
+        # Simpan embedding ke file .pkl (tetap dipakai sebagai embedding_filename di DB)
         embedding_path = os.path.join(EMBEDDINGS_DIR, f"{username}.pkl")
         with open(embedding_path, "wb") as f:
             pickle.dump(embedding, f)
 
+    # Baris yang sudah ada selalu ikut diperbarui, supaya pindah ke mode db tidak perlu migrasi ulang
+    if face_reg is not None:
+        save_embedding(face_reg, normalize(embedding), FACE_DB_EMBEDDING_DTYPE)
+        save_samples(face_reg, samples)
+    return face_reg
+
+
+def mahasiswa_exists(db: Session, nim: str):
+    return db.query(Mahasiswa).filter(Mahasiswa.nim == nim).first() is not None
+
+
+def save_registration(db: Session, username: str, embedding, samples=None, job_fields=None):
+    """
+    store_registration + commit (+ update job enrollment) lalu gallery.add. Blocking
+    (query DB, tulis .pkl, fsync journal store), jadi dipanggil lewat asyncio.to_thread.
+    """
+    try:
+        store_registration(db, username, embedding, samples)
+        if job_fields is not None:
+            job_id = job_fields.pop("id_job")
+            db.query(FaceEnrollmentJob).filter(FaceEnrollmentJob.id_job == job_id).update(job_fields)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    get_gallery().add(username, embedding)
+
+
+# ========================
+# Endpoint registrasi wajah
+# ========================
+
+@router.post("/register")
+async def register_face(
+    file: UploadFile = File(...),
+    username: str = Form(...),
+    aligned: bool = Form(False),
+    db: Session = Depends(get_db)
+):
+    """
+    Registrasi wajah baru untuk face recognition.
+    Dengan FACE_EMBEDDING_SOURCE=db username harus NIM mahasiswa; embedding
+    disimpan di face_registrations dan ditarik node lain dari sana.
+    aligned=true: file sudah berupa crop wajah yang di-align di HP, deteksi dilewati.
+    """
+    try:
+        # Query DB, tulis .pkl dan journal store jalan di thread, bukan di event loop
+        if FACE_EMBEDDING_SOURCE == "db":
+            if not await asyncio.to_thread(mahasiswa_exists, db, username):
+                return {"status": "error", "message": f"Mahasiswa dengan NIM {username} tidak ditemukan"}
+
+        # Baca file gambar dan buat embedding (aligned: crop wajah dari HP, tanpa deteksi)
+        embedding = await extract_embedding(await read_image(file), aligned=aligned)
+        if embedding is None:
+            return {"status": "error", "message": "Wajah tidak terdeteksi"}
+
+        await asyncio.to_thread(save_registration, db, username, embedding)
+
         return {"status": "success", "message": f"Wajah {username} terdaftar"}
     
+    except LowFaceQuality as e:
+        # Ditolak quality gate sebelum FaceNet; "quality" = kode alasan untuk UI app
+        return {"status": "error", "message": e.message, "quality": e.reason}
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        return {"status": "error", "message": str(e)}
+
+# ========================
+# Enrollment multi-foto asinkron
+# ========================
+
+# Job enrollment berjalan di event loop ini; inference-nya tetap lewat face_inference
+enrollment_slots = asyncio.Semaphore(FACE_ENROLL_CONCURRENCY)
+# Referensi task disimpan supaya tidak di-garbage-collect sebelum selesai
+enrollment_tasks = set()
+
+
+async def background_inference(fn, *args):
+    """Seperti run_inference, tapi job latar belakang menunggu giliran (bukan 503) saat antrian penuh"""
+    while True:
+        try:
+            return await face_inference.run(fn, *args)
+        except InferenceQueueFull as e:
+            await asyncio.sleep(e.retry_after)
+
+
+def update_enrollment_job(job_id, **fields):
+    db = SessionLocal()
+    try:
+        db.query(FaceEnrollmentJob).filter(FaceEnrollmentJob.id_job == job_id).update(fields)
+        db.commit()
+    finally:
+        db.close()
+
+
+def enrollment_worker():
+    """Pemilik job enrollment: host:pid proses ini"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enrollment_owner_gone(job):
+    """True jika proses pemilik job pasti sudah tidak ada (hanya bisa dicek di host yang sama)"""
+    host, _, pid = (job.worker or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    if int(pid) == os.getpid():
+        # pid sama bisa berarti pid dipakai ulang setelah restart: cek task-nya di proses ini
+        return not any(task.get_name() == job.id_job for task in enrollment_tasks)
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass
+    return False
+
+
+def enrollment_job_stale(job, now=None):
+    """Job queued/running yang pemiliknya hilang atau heartbeat-nya lewat FACE_ENROLL_STALE_SECONDS"""
+    if job.status not in ("queued", "running"):
+        return False
+    now = now or datetime.now()
+    if job.heartbeat_at is None or (now - job.heartbeat_at).total_seconds() > FACE_ENROLL_STALE_SECONDS:
+        return True
+    return enrollment_owner_gone(job)
+
+
+STALE_ENROLLMENT_MESSAGE = "Job terhenti karena server restart, kirim ulang foto wajah"
+
+
+def fail_stale_enrollment_jobs():
+    """
+    Dipanggil saat startup: job queued/running yang task-nya hilang (restart/crash) tidak
+    akan pernah selesai, jadi ditandai failed supaya client yang polling tidak menunggu
+    selamanya. Job milik worker lain yang masih hidup (heartbeat baru) tidak disentuh.
+    Return jumlah job yang ditandai.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.now()
+        jobs = db.query(FaceEnrollmentJob).filter(FaceEnrollmentJob.status.in_(["queued", "running"])).all()
+        stale = [job.id_job for job in jobs if enrollment_job_stale(job, now)]
+        if stale:
+            db.query(FaceEnrollmentJob).filter(FaceEnrollmentJob.id_job.in_(stale)).update(
+                {"status": "failed", "message": STALE_ENROLLMENT_MESSAGE},
+                synchronize_session=False
+            )
+            db.commit()
+        return len(stale)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def enrollment_heartbeat(job_id):
+    """Perbarui heartbeat_at selama job masih ada di proses ini (termasuk saat antri slot)"""
+    while True:
+        await asyncio.sleep(FACE_ENROLL_HEARTBEAT_SECONDS)
+        try:
+            await asyncio.to_thread(update_enrollment_job, job_id, heartbeat_at=datetime.now())
+        except Exception as e:
+            print(f"❌ Error updating face enrollment heartbeat: {e}")
+
+
+def notify_enrollment(job_id, username, job_status, message):
+    """Push FCM ke HP mahasiswa saat job selesai (opsional, client tetap bisa polling)"""
+    try:
+        from app.services.notification_service import notification_service
+        from app.models.user_device_model import UserDevice
+
+        if not notification_service.active:
+            return
+        db = SessionLocal()
+        try:
+            mahasiswa = db.query(Mahasiswa).filter(Mahasiswa.nim == username).first()
+            if not mahasiswa or not mahasiswa.user_id:
+                return
+            tokens = [d.fcm_token for d in db.query(UserDevice).filter(UserDevice.id_user == mahasiswa.user_id)]
+            if tokens:
+                notification_service.send_multicast(
+                    tokens=tokens,
+                    title="Registrasi Wajah" + (" Berhasil" if job_status == "done" else " Gagal"),
+                    body=message,
+                    data={"type": "face_enrollment", "job_id": job_id, "status": job_status},
+                    db_session=db
+                )
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"❌ Error sending face enrollment notification: {e}")
+
+
+async def run_enrollment_job(job_id: str, username: str, images: List[bytes]):
+    """
+    Deteksi + quality gate per foto, satu batch FaceNet untuk semua crop yang lolos,
+    buang foto outlier, lalu simpan centroid (dipakai matching) dan embedding per foto.
+    """
+    heartbeat = asyncio.create_task(enrollment_heartbeat(job_id))
+    try:
+        async with enrollment_slots:
+            rejected = []
+            try:
+                await asyncio.to_thread(update_enrollment_job, job_id, status="running")
+                crops = []
+                for index, data in enumerate(images):
+                    try:
+                        detected = await background_inference(detect_face, data)
+                    except LowFaceQuality as e:
+                        rejected.append({"image": index, "reason": e.reason, "message": e.message})
+                        continue
+                    except (InvalidImage, ImageTooLarge) as e:
+                        rejected.append({"image": index, "reason": "invalid_image", "message": str(e)})
+                        continue
+                    if detected is None:
+                        rejected.append({"image": index, "reason": "no_face", "message": "Wajah tidak terdeteksi"})
+                        continue
+                    crops.append((index, detected[1]))
+
+                centroid, samples = None, []
+                if len(crops) >= FACE_ENROLL_MIN_ACCEPTED:
+                    embeddings = await background_inference(embed_faces, [crop for _, crop in crops])
+                    centroid, keep = enrollment_centroid(embeddings, THRESHOLD)
+                    for (index, _), kept in zip(crops, keep):
+                        if not kept:
+                            rejected.append({"image": index, "reason": "outlier", "message": "Wajah berbeda dari foto lainnya"})
+                    samples = normalize(np.asarray(embeddings, dtype=np.float32)[keep])
+
+                if centroid is None or len(samples) < FACE_ENROLL_MIN_ACCEPTED:
+                    job_status = "failed"
+                    message = f"Foto yang lolos kurang dari {FACE_ENROLL_MIN_ACCEPTED}, ambil ulang foto wajah"
+                    await asyncio.to_thread(
+                        update_enrollment_job, job_id, status=job_status, accepted_images=len(samples),
+                        rejected=json.dumps(rejected), message=message
+                    )
+                else:
+                    job_status = "done"
+                    message = f"Wajah {username} terdaftar dari {len(samples)} foto"
+                    db = SessionLocal()
+                    try:
+                        await asyncio.to_thread(save_registration, db, username, centroid, samples, {
+                            "id_job": job_id,
+                            "status": job_status,
+                            "accepted_images": len(samples),
+                            "rejected": json.dumps(rejected),
+                            "message": message
+                        })
+                    finally:
+                        db.close()
+            except Exception as e:
+                job_status, message = "failed", str(e)[:255]
+                await asyncio.to_thread(
+                    update_enrollment_job, job_id, status=job_status, rejected=json.dumps(rejected), message=message
+                )
+    finally:
+        heartbeat.cancel()
+
+    await asyncio.to_thread(notify_enrollment, job_id, username, job_status, message)
+
+
+@router.post("/enroll")
+async def create_enrollment_job(
+    files: List[UploadFile] = File(...),
+    username: str = Form(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Registrasi wajah dari FACE_ENROLL_MIN_IMAGES-FACE_ENROLL_MAX_IMAGES foto tanpa menahan
+    request: foto dibaca lalu job_id langsung dikembalikan. Deteksi, quality gate dan
+    embedding (satu batch) jalan di latar belakang; status lewat GET /face/enroll/{job_id}
+    atau push FCM saat selesai.
+    """
+    try:
+        if not FACE_ENROLL_MIN_IMAGES <= len(files) <= FACE_ENROLL_MAX_IMAGES:
+            return {
+                "status": "error",
+                "message": f"Kirim {FACE_ENROLL_MIN_IMAGES}-{FACE_ENROLL_MAX_IMAGES} foto wajah"
+            }
+        # Di kedua mode: embedding per foto disimpan di face_registrations (FK ke mahasiswa)
+        if not await asyncio.to_thread(mahasiswa_exists, db, username):
+            return {"status": "error", "message": f"Mahasiswa dengan NIM {username} tidak ditemukan"}
+
+        images = [await read_image(file) for file in files]
+        # job_id disimpan dulu: atribut job kedaluwarsa setelah commit (reload = query di event loop)
+        job_id = uuid.uuid4().hex
+        job = FaceEnrollmentJob(
+            id_job=job_id, nim=username, status="queued", total_images=len(images),
+            worker=enrollment_worker(), heartbeat_at=datetime.now()
+        )
+        db.add(job)
+        await asyncio.to_thread(db.commit)
+
+        # Nama task = job_id, dipakai enrollment_owner_gone()
+        task = asyncio.create_task(run_enrollment_job(job_id, username, images), name=job_id)
+        enrollment_tasks.add(task)
+        task.add_done_callback(enrollment_tasks.discard)
+
+        return {
+            "status": "success",
+            "job_id": job_id,
+            "job_status": "queued",
+            "message": f"{len(images)} foto diterima, registrasi wajah sedang diproses"
+        }
+
+    except HTTPException:
+        raise
     except Exception as e:
+        db.rollback()
         return {"status": "error", "message": str(e)}
 
+
+@router.get("/enroll/{job_id}")
+def enrollment_job_status(job_id: str, db: Session = Depends(get_db)):
+    """Status job enrollment (queued/running/done/failed) beserta foto yang ditolak dan alasannya"""
+    job = db.query(FaceEnrollmentJob).filter(FaceEnrollmentJob.id_job == job_id).first()
+    if not job:
+        return {"status": "error", "message": "Job enrollment tidak ditemukan"}
+    if enrollment_job_stale(job):
+        # Pemilik job mati setelah startup semua worker: tandai failed saat dibaca
+        job.status, job.message = "failed", STALE_ENROLLMENT_MESSAGE
+        db.commit()
+    return {
+        "status": "success",
+        "job_id": job.id_job,
+        "nim": job.nim,
+        "job_status": job.status,
+        "total_images": job.total_images,
+        "accepted_images": job.accepted_images,
+        "rejected": json.loads(job.rejected) if job.rejected else [],
+        "message": job.message,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at
+    }
+
 # ========================
 # Endpoint face recognition
 # ========================
 
 @router.post("/recognize")
-async def recognize_face(file: UploadFile = File(...)):
+async def recognize_face(
+    file: Optional[UploadFile] = File(None),
+    id_kelas_mk: Optional[int] = Form(None),
+    id_presensi: Optional[int] = Form(None),
+    embedding: Optional[str] = Form(None),
+    embedding_dtype: str = Form("float32"),
+    model_id: Optional[str] = Form(None),
+    model_version: Optional[str] = Form(None),
+    aligned: bool = Form(False),
+    frames: Optional[List[UploadFile]] = File(None),
+    video: Optional[UploadFile] = File(None),
+    db: Session = Depends(get_db)
+):
     """
-    Mengenali wajah dari gambar yang diupload
+    Mengenali wajah dari gambar yang diupload (aligned=true: sudah berupa crop wajah,
+    deteksi dilewati), dari burst foto (frames) atau klip video pendek (video),
+    atau dari embedding yang sudah dihitung di HP
+    (embedding + model_id + model_version, lihat FACE_CLIENT_EMBEDDING).
+    Jika id_kelas_mk atau id_presensi dikirim, matching dibatasi ke roster kelas tersebut.
     """
     try:
-        # Baca file gambar
-        image_bytes = await file.read()
-        np_arr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        partition = None
+        if id_kelas_mk is not None or id_presensi is not None:
+            partition = get_roster_partition(db, id_kelas_mk=id_kelas_mk, id_presensi=id_presensi)
+            if partition is None:
+                return {"status": "error", "message": "Kelas mata kuliah atau presensi tidak ditemukan"}
 
-        # Deteksi wajah
-        faces = detector.detect_faces(img)
-        if len(faces) == 0:
-            return {"status": "error", "message": "Wajah tidak terdeteksi"}
+        gallery = get_gallery()
+        if burst_requested(file, embedding, frames, video):
+            embedding_new, burst = await burst_embedding(frames, video)
+            if embedding_new is None:
+                return {"status": "error", "message": "Wajah tidak terdeteksi", "burst": burst}
+            return {**recognize_response(gallery, embedding_new, partition), "burst": burst}
 
-        x, y, w, h = faces[0]['box']
-        face_crop = img[y:y+h, x:x+w]
-        embedding_new = embedder.embeddings([face_crop])[0]
-
-        # Bandingkan dengan semua embedding yang tersimpan
-        results = []
-        if os.path.exists(EMBEDDINGS_DIR):
-            for file_name in os.listdir(EMBEDDINGS_DIR):
-                if file_name.endswith('.pkl'):
-                    with open(os.path.join(EMBEDDINGS_DIR, file_name), "rb") as f:
-                        embedding_registered = pickle.load(f)
-                    distance = cosine(embedding_registered, embedding_new)
-                    if distance < THRESHOLD:
-                        results.append({
-                            "username": file_name.replace(".pkl", ""), 
-                            "distance": float(distance),
-                            "confidence": float(1 - distance)
-                        })
+        if embedding is not None or file is None:
+            # Embedding dari client: langsung ke gallery, tidak ada inference yang perlu di-cache
+            embedding_new = await query_embedding(file, embedding, embedding_dtype, model_id, model_version)
+            return recognize_response(gallery, embedding_new, partition)
 
-        # Sort by distance (lowest = best match)
-        results.sort(key=lambda x: x['distance'])
+        # Baca file gambar; upload yang sama persis (retry) langsung dijawab dari cache
+        image_bytes = await read_image(file)
+        digest = content_digest(image_bytes)
+        result_key = (
+            digest, "recognize", PIPELINE_VERSION, aligned, THRESHOLD, gallery.version,
+            partition["created"] if partition is not None else None
+        )
+        cached = face_result_cache.get(result_key)
+        if cached is not ResultCache.MISS:
+            return cached
 
-        if results:
-            return {"status": "success", "recognized": results}
+        embedding_new = await extract_embedding(image_bytes, digest, aligned)
+        if embedding_new is None:
+            response = {"status": "error", "message": "Wajah tidak terdeteksi"}
         else:
-            return {"status": "success", "recognized": None, "message": "Wajah tidak dikenali"}
+            response = recognize_response(gallery, embedding_new, partition)
+
+        face_result_cache.put(result_key, response)
+        return response
     
+    except LowFaceQuality as e:
+        return {"status": "error", "message": e.message, "quality": e.reason}
+    except HTTPException:
+        raise
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+# ========================
+# Endpoint verifikasi wajah 1:1
+# ========================
+
+@router.post("/verify")
+async def verify_face(
+    file: Optional[UploadFile] = File(None),
+    nim: str = Form(...),
+    embedding: Optional[str] = Form(None),
+    embedding_dtype: str = Form("float32"),
+    model_id: Optional[str] = Form(None),
+    model_version: Optional[str] = Form(None),
+    frames: Optional[List[UploadFile]] = File(None),
+    video: Optional[UploadFile] = File(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Verifikasi 1:1: bandingkan wajah (foto, burst foto/klip video, atau embedding dari HP)
+    hanya dengan embedding milik NIM tersebut, lalu update statistik face_registrations
+    dalam request yang sama. Burst/video dihitung sebagai satu percobaan.
+    """
+    try:
+        face_reg = get_active_registration(db, nim)
+        if not face_reg:
+            return {"status": "error", "message": "Wajah belum terdaftar atau nonaktif"}
+        if nim not in get_gallery():
+            return {"status": "error", "message": f"Embedding wajah {nim} tidak ditemukan"}
+
+        burst = None
+        if burst_requested(file, embedding, frames, video):
+            embedding_new, burst = await burst_embedding(frames, video)
+        else:
+            embedding_new = await query_embedding(file, embedding, embedding_dtype, model_id, model_version)
+        if embedding_new is None:
+            response = {"status": "error", "message": "Wajah tidak terdeteksi"}
+            if burst is not None:
+                response["burst"] = burst
+            return response
+
+        distance = get_gallery().distance(nim, embedding_new)
+        if distance is None:
+            # Embedding dihapus (delete/sync) selama inference berjalan
+            return {"status": "error", "message": f"Embedding wajah {nim} tidak ditemukan"}
+        confidence_score = round((1 - distance) * 100, 2)
+        # Satu aturan cocok (sama dengan /recognize dan threshold di roster pack)
+        verified = record_verification(face_reg, distance < THRESHOLD)
+        db.commit()
+
+        response = {
+            "status": "success",
+            "verified": verified,
+            "nim": nim,
+            "distance": distance,
+            "confidence_score": confidence_score,
+            "message": "Wajah terverifikasi" if verified else "Wajah tidak cocok"
+        }
+        if burst is not None:
+            response["burst"] = burst
+        return response
+
+    except LowFaceQuality as e:
+        return {"status": "error", "message": e.message, "quality": e.reason}
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        return {"status": "error", "message": str(e)}
+
+# ========================
+# Endpoint presensi wajah sekali jalan
+# ========================
+
+@router.post("/check-in")
+async def check_in_face(
+    file: Optional[UploadFile] = File(None),
+    id_presensi: int = Form(...),
+    embedding: Optional[str] = Form(None),
+    embedding_dtype: str = Form("float32"),
+    model_id: Optional[str] = Form(None),
+    model_version: Optional[str] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Presensi dengan wajah dalam satu request (pengganti /face/recognize +
+    /face-registration/verify + /presensi/update-status-face-recognition):
+    validasi waktu presensi dulu (tanpa inference jika sudah ditutup), verifikasi
+    1:1 terhadap embedding mahasiswa pemilik presensi, lalu statistik
+    face_registrations dan status Hadir di-commit dalam satu transaksi.
+    Seperti /face/verify, foto boleh diganti embedding yang dihitung di HP.
+    """
+    try:
+        row = db.query(Presensi, Mahasiswa).join(
+            Mahasiswa, Mahasiswa.id_mahasiswa == Presensi.id_mahasiswa
+        ).filter(Presensi.id_presensi == id_presensi).first()
+        if not row:
+            return {"status": "error", "message": "Presensi tidak ditemukan"}
+        presensi, mahasiswa = row
+
+        # Waktu masuk dicatat saat request diterima, bukan setelah inference selesai
+        now = datetime.now()
+        error = check_in_error(presensi, now)
+        if error:
+            return {"status": "error", "message": error}
+
+        nim = mahasiswa.nim
+        face_reg = get_active_registration(db, nim)
+        if not face_reg:
+            return {"status": "error", "message": "Wajah belum terdaftar atau nonaktif"}
+        if nim not in get_gallery():
+            return {"status": "error", "message": f"Embedding wajah {nim} tidak ditemukan"}
+
+        embedding_new = await query_embedding(file, embedding, embedding_dtype, model_id, model_version)
+        if embedding_new is None:
+            return {"status": "error", "message": "Wajah tidak terdeteksi"}
+
+        distance = get_gallery().distance(nim, embedding_new)
+        if distance is None:
+            # Embedding dihapus (delete/sync) selama inference berjalan
+            return {"status": "error", "message": f"Embedding wajah {nim} tidak ditemukan"}
+        confidence_score = round((1 - distance) * 100, 2)
+        # Satu aturan cocok (sama dengan /recognize dan threshold di roster pack)
+        verified = record_verification(face_reg, distance < THRESHOLD)
+        if verified:
+            mark_hadir(presensi, now)
+        db.commit()
+
+        response = {
+            "status": "success",
+            "verified": verified,
+            "nim": nim,
+            "distance": distance,
+            "confidence_score": confidence_score,
+            "message": "Presensi berhasil disimpan" if verified else "Wajah tidak cocok"
+        }
+        if verified:
+            kelas_info = get_kelas_info(db, presensi.id_kelas_mk)
+            response["presensi"] = {
+                "id_presensi": presensi.id_presensi,
+                "nama": mahasiswa.nama,
+                "mata_kuliah": kelas_info.nama_mk if kelas_info else "-",
+                "kelas": kelas_info.nama_kelas if kelas_info else "-",
+                "tanggal": presensi.tanggal,
+                "pertemuan_ke": presensi.pertemuan_ke,
+                "status": presensi.status,
+                "waktu_input": presensi.waktu_input
+            }
+        return response
+
+    except LowFaceQuality as e:
+        return {"status": "error", "message": e.message, "quality": e.reason}
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        return {"status": "error", "message": str(e)}
+
+# ========================
+# Endpoint presensi kelompok dari foto kelas
+# ========================
+
+@router.post("/group-check-in")
+async def group_check_in(
+    files: List[UploadFile] = File(...),
+    id_kelas_mk: int = Form(...),
+    pertemuan_ke: int = Form(...),
+    tanggal: Optional[date] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Presensi satu kelas dari 1-FACE_GROUP_MAX_PHOTOS foto ruangan (diambil dosen):
+    semua wajah dideteksi, semua crop di-embed dalam satu forward pass, lalu
+    dipasangkan satu-satu dengan roster kelas (Hungarian pada satu matrix jarak
+    per foto). Mahasiswa yang cocok dengan confidence cukup di-set Hadir dalam
+    satu UPDATE; yang cocok tapi confidence rendah hanya dilaporkan supaya
+    dosen bisa konfirmasi lewat /presensi/admin/update-status.
+    """
+    try:
+        if len(files) > FACE_GROUP_MAX_PHOTOS:
+            return {"status": "error", "message": f"Maksimal {FACE_GROUP_MAX_PHOTOS} foto per request"}
+
+        # Validasi DB dulu (murah), inference hanya jika presensi dan roster ada
+        tanggal = tanggal or datetime.now().date()
+        presensi_rows = db.query(Presensi.id_presensi, Presensi.status, Mahasiswa.nim).join(
+            Mahasiswa, Mahasiswa.id_mahasiswa == Presensi.id_mahasiswa
+        ).filter(
+            Presensi.id_kelas_mk == id_kelas_mk,
+            Presensi.tanggal == tanggal,
+            Presensi.pertemuan_ke == pertemuan_ke
+        ).all()
+        if not presensi_rows:
+            return {"status": "error", "message": "Presensi untuk pertemuan ini belum di-generate"}
+        presensi_by_nim = {row.nim: row for row in presensi_rows}
+
+        partition = get_roster_partition(db, id_kelas_mk=id_kelas_mk)
+        if partition is None:
+            return {"status": "error", "message": "Kelas mata kuliah tidak ditemukan"}
+
+        photos = [await read_image(file) for file in files]
+        detected = [await run_inference(detect_all_faces, data) for data in photos]
+        crops = [face["crop"] for faces in detected for face in faces]
+        if not crops:
+            return {"status": "error", "message": "Wajah tidak terdeteksi"}
+        embeddings = await run_inference(embed_faces, crops)
+
+        # Satu-satu per foto; mahasiswa yang muncul di dua foto diambil jarak terbaiknya
+        best, unmatched, offset = {}, [], 0
+        for photo, faces in enumerate(detected):
+            pairs, distances = assign_faces(embeddings[offset:offset + len(faces)], partition["matrix"], THRESHOLD)
+            offset += len(faces)
+            assigned = set()
+            for face_index, row, distance in pairs:
+                assigned.add(face_index)
+                nim = partition["labels"][row]
+                if nim not in best or distance < best[nim]["distance"]:
+                    best[nim] = {
+                        "nim": nim,
+                        "distance": distance,
+                        "confidence_score": round((1 - distance) * 100, 2),
+                        "photo": photo,
+                        "box": faces[face_index]["box"],
+                    }
+            for face_index, face in enumerate(faces):
+                if face_index in assigned:
+                    continue
+                entry = {"photo": photo, "box": face["box"], "detection_confidence": face["confidence"]}
+                if distances.shape[1]:
+                    nearest = int(distances[face_index].argmin())
+                    entry["nearest_nim"] = partition["labels"][nearest]
+                    entry["nearest_distance"] = float(distances[face_index, nearest])
+                unmatched.append(entry)
+
+        matched, low_confidence, already_present, not_in_presensi, to_update = [], [], [], [], []
+        for nim, entry in sorted(best.items()):
+            row = presensi_by_nim.get(nim)
+            if row is None:
+                not_in_presensi.append(entry)
+            elif entry["confidence_score"] < CONFIDENCE_THRESHOLD:
+                low_confidence.append(entry)
+            elif row.status == "Hadir":
+                already_present.append(entry)
+            else:
+                matched.append(entry)
+                to_update.append(row.id_presensi)
+
+        if to_update:
+            db.query(Presensi).filter(Presensi.id_presensi.in_(to_update)).update(
+                {Presensi.status: "Hadir", Presensi.waktu_input: datetime.now()},
+                synchronize_session=False
+            )
+            db.commit()
+
+        return {
+            "status": "success",
+            "faces": len(crops),
+            "updated": len(to_update),
+            "matched": matched,
+            "already_present": already_present,
+            "low_confidence": low_confidence,
+            "unmatched": unmatched,
+            "not_in_presensi": not_in_presensi,
+            "absent": sorted(nim for nim, row in presensi_by_nim.items() if row.status != "Hadir" and nim not in best),
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        return {"status": "error", "message": str(e)}
+
 # ========================
 # Endpoint list registered faces
 # ========================
@@ -117,14 +1221,7 @@ async def list_registered_faces():
     Melihat daftar wajah yang sudah terdaftar
     """
     try:
-        if not os.path.exists(EMBEDDINGS_DIR):
-            return {"status": "success", "registered": []}
-        
-        registered = []
-        for file_name in os.listdir(EMBEDDINGS_DIR):
-            if file_name.endswith('.pkl'):
-                registered.append(file_name.replace(".pkl", ""))
-        
+        registered = get_gallery().labels()
         return {"status": "success", "registered": registered, "count": len(registered)}
     
     except Exception as e:
@@ -135,18 +1232,116 @@ async def list_registered_faces():
 # ========================
 
 @router.delete("/register/{username}")
-async def delete_registered_face(username: str):
+async def delete_registered_face(username: str, db: Session = Depends(get_db)):
     """
-    Menghapus registrasi wajah
+    Menghapus registrasi wajah (file .pkl, embedding di face_registrations, dan gallery)
     """
     try:
         embedding_path = os.path.join(EMBEDDINGS_DIR, f"{username}.pkl")
+        face_reg = db.query(FaceRegistration).filter(FaceRegistration.nim == username).first()
         
-        if not os.path.exists(embedding_path):
+        if not os.path.exists(embedding_path) and username not in get_gallery() and face_reg is None:
             return {"status": "error", "message": f"Wajah {username} tidak ditemukan"}
         
-        os.remove(embedding_path)
+        if face_reg is not None:
+            db.delete(face_reg)
+            db.commit()
+        if os.path.exists(embedding_path):
+            os.remove(embedding_path)
+        get_gallery().remove(username)
         return {"status": "success", "message": f"Wajah {username} berhasil dihapus"}
     
     except Exception as e:
+        db.rollback()
         return {"status": "error", "message": str(e)}
+
+
+# ========================
+# Endpoint pack roster untuk matching offline
+# ========================
+
+@router.get("/roster-pack/{id_kelas_mk}")
+def roster_pack(
+    id_kelas_mk: int,
+    response: Response,
+    since: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Embedding roster kelas (float16, urut NIM) untuk di-cache di HP, supaya saat
+    presensi massal / koneksi buruk matching bisa jalan on-device dengan model dan
+    threshold yang sama. ETag = versi pack (If-None-Match -> 304). Dengan ?since=<versi
+    lama> hanya baris yang berubah + NIM yang dihapus yang dikirim; jika versi lama
+    tidak dikenal server, pack penuh yang dikirim (delta=false).
+    """
+    try:
+        partition = get_roster_partition(db, id_kelas_mk=id_kelas_mk)
+        if partition is None:
+            return {"status": "error", "message": "Kelas mata kuliah tidak ditemukan"}
+
+        pack = roster_packs.get(id_kelas_mk, partition)
+        etag = f'"{pack["version"]}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if if_none_match and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+
+        body = {
+            "status": "success",
+            "id_kelas_mk": id_kelas_mk,
+            "version": pack["version"],
+            "model_id": FACE_EMBEDDING_MODEL_ID,
+            "model_version": FACE_EMBEDDING_MODEL_VERSION,
+            "threshold": THRESHOLD,
+            "dtype": PACK_DTYPE,
+            "dim": get_gallery().dim,
+        }
+        delta = roster_packs.delta(id_kelas_mk, pack, since) if since else None
+        if delta is not None:
+            body.update({
+                "delta": True,
+                "base_version": since,
+                "nims": delta["nims"],
+                "matrix": encode_matrix(delta["matrix"]),
+                "removed": delta["removed"],
+            })
+        else:
+            body.update({
+                "delta": False,
+                "nims": pack["nims"],
+                "matrix": encode_matrix(pack["matrix"]),
+                "removed": [],
+            })
+        return body
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+# ========================
+# Endpoint metrics inference
+# ========================
+
+@router.get("/metrics")
+def face_metrics():
+    """
+    Statistik antrian inference (queue depth, wait time, request yang ditolak)
+    dan hit/miss cache hasil per isi upload
+    """
+    return {
+        "status": "success",
+        "inference": face_inference.stats(),
+        "embedding_batching": embedding_batcher.stats(),
+        "quality_gate": face_quality_gate.stats(embedding_batcher.item_ms_mean()),
+        "face_detector": FACE_DETECTOR_BACKEND,
+        "face_embedder": FACE_EMBEDDER_BACKEND + ("-int8" if FACE_EMBEDDER_INT8 else ""),
+        "models": model_registry.status(),
+        "result_cache": face_result_cache.stats(),
+        "roster_packs": roster_packs.stats(),
+        "enrollment_jobs_in_progress": len(enrollment_tasks),
+        "gallery_watcher": gallery_watcher.stats(),
+        "gallery_db_sync": gallery_db_sync.stats() if FACE_EMBEDDING_SOURCE == "db" else None,
+        "gallery_size": len(face_gallery)
+    }
@@ -2,9 +2,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
+import os
+from app.config import FACE_DB_EMBEDDING_DTYPE
 from app.core.database import get_db
 from app.models.face_registration_model import FaceRegistration
 from app.models.mahasiswa_model import Mahasiswa
+from app.services.face_gallery import face_gallery, normalize, EMBEDDINGS_DIR
+from app.services.model_registry import model_registry
+from app.services.face_registration_service import (
+    CONFIDENCE_THRESHOLD,
+    get_active_registration,
+    record_verification,
+    save_embedding
+)
 from app.schemas.face_registration_schema import (
     FaceRegistrationCreate,
     FaceRegistrationResponse,
@@ -23,7 +33,8 @@ def register_face_to_db(
 ):
     """
     Register mahasiswa's face embedding metadata to database.
-    Called AFTER mobile app successfully saves the .pkl file via /face/register
+    Called AFTER mobile app successfully saves the .pkl file via /face/register.
+    The embedding itself is copied from the .pkl into face_registrations.embedding.
     """
     # Check if mahasiswa exists
     mahasiswa = db.query(Mahasiswa).filter(Mahasiswa.nim == registration.nim).first()
@@ -33,6 +44,11 @@ def register_face_to_db(
             detail=f"Mahasiswa with NIM {registration.nim} not found"
         )
     
+    # Salin embedding dari .pkl; None jika file tidak ada (FACE_EMBEDDING_SOURCE=db:
+    # embedding sudah ditulis langsung oleh /face/register)
+    label = os.path.basename(registration.embedding_filename)
+    vector = face_gallery.read_pkl(label[:-len(".pkl")] if label.endswith(".pkl") else label)
+    
     # Check if already registered
     existing = db.query(FaceRegistration).filter(FaceRegistration.nim == registration.nim).first()
     if existing:
@@ -41,6 +57,8 @@ def register_face_to_db(
         existing.registration_date = datetime.now()
         existing.is_active = True
         existing.failed_attempts = 0
+        if vector is not None:
+            save_embedding(existing, normalize(vector), FACE_DB_EMBEDDING_DTYPE)
         db.commit()
         db.refresh(existing)
         return existing
@@ -50,6 +68,8 @@ def register_face_to_db(
         nim=registration.nim,
         embedding_filename=registration.embedding_filename
     )
+    if vector is not None:
+        save_embedding(new_registration, normalize(vector), FACE_DB_EMBEDDING_DTYPE)
     
     db.add(new_registration)
     db.commit()
@@ -68,10 +88,7 @@ def verify_face_update_stats(
     Called AFTER mobile app successfully verifies face via /face/verify
     """
     # Check if face is registered
-    face_reg = db.query(FaceRegistration).filter(
-        FaceRegistration.nim == verification.nim,
-        FaceRegistration.is_active == True
-    ).first()
+    face_reg = get_active_registration(db, verification.nim)
     
     if not face_reg:
         return FaceVerificationResponse(
@@ -79,37 +96,22 @@ def verify_face_update_stats(
             message="Face not registered or inactive"
         )
     
-    # Check confidence threshold
-    CONFIDENCE_THRESHOLD = 70.0  # 70%
+    verified = record_verification(face_reg, verification.confidence_score >= CONFIDENCE_THRESHOLD)
+    db.commit()
     
-    if verification.confidence_score >= CONFIDENCE_THRESHOLD:
-        # Successful verification
-        face_reg.last_verified = datetime.now()
-        face_reg.verification_count += 1
-        face_reg.failed_attempts = 0  # Reset failed attempts on success
-        db.commit()
-        
+    if verified:
         return FaceVerificationResponse(
             success=True,
             message="Face verified successfully",
             confidence_score=verification.confidence_score,
             nim=verification.nim
         )
-    else:
-        # Failed verification
-        face_reg.failed_attempts += 1
-        
-        # Auto-disable after too many failures
-        if face_reg.failed_attempts >= 10:
-            face_reg.is_active = False
-            
-        db.commit()
-        
-        return FaceVerificationResponse(
-            success=False,
-            message=f"Face verification failed. Confidence too low: {verification.confidence_score}%",
-            confidence_score=verification.confidence_score
-        )
+    
+    return FaceVerificationResponse(
+        success=False,
+        message=f"Face verification failed. Confidence too low: {verification.confidence_score}%",
+        confidence_score=verification.confidence_score
+    )
 
 
 @router.get("/status/{nim}", response_model=FaceRegistrationResponse)
@@ -178,8 +180,9 @@ def delete_face_registration(
     db: Session = Depends(get_db)
 ):
     """
-    Delete face registration from database (admin only).
-    WARNING: Remember to also delete the .pkl file manually from embeddings folder!
+    Delete face registration from database (admin only), together with its
+    .pkl file and the in-memory gallery entry. Other nodes drop the embedding
+    on their next full sync (FACE_DB_FULL_SYNC_SECONDS).
     """
     face_reg = db.query(FaceRegistration).filter(FaceRegistration.nim == nim).first()
     
@@ -189,13 +192,21 @@ def delete_face_registration(
             detail=f"No face registration found for NIM {nim}"
         )
     
-    embedding_filename = face_reg.embedding_filename
+    embedding_file = os.path.basename(face_reg.embedding_filename)
+    embedding_path = os.path.join(EMBEDDINGS_DIR, embedding_file)
+    # Label gallery = nama file .pkl tanpa ekstensi (bisa berbeda dari NIM)
+    label = embedding_file[:-len(".pkl")] if embedding_file.endswith(".pkl") else embedding_file
     
     db.delete(face_reg)
     db.commit()
     
+    file_deleted = os.path.exists(embedding_path)
+    if file_deleted:
+        os.remove(embedding_path)
+    model_registry.get("face_gallery").remove(label)
+    
     return {
         "success": True,
         "message": f"Face registration deleted for {nim}",
-        "note": f"Remember to manually delete file: embeddings/{embedding_filename}"
+        "embedding_file_deleted": file_deleted
     }
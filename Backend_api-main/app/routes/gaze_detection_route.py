@@ -7,27 +7,63 @@ import os
 # Suppress MediaPipe logs
 os.environ["GLOG_minloglevel"] = "2"
 
-import mediapipe as mp
 from fastapi import APIRouter, File, UploadFile, HTTPException
 from pydantic import BaseModel
 from typing import Tuple
+from app.config import (
+    GAZE_DETECT_TARGET_SIDE,
+    GAZE_FACE_MESH_POOL_SIZE,
+    GAZE_FACE_MESH_STATIC,
+    GAZE_QUEUE_SIZE,
+    INFERENCE_RETRY_AFTER_SECONDS,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_MAX_MB,
+    RESULT_CACHE_TTL_SECONDS
+)
+from app.services.image_ingest import read_upload, decode_image, ImageTooLarge
+from app.services.inference_executor import InferenceExecutor, InferenceQueueFull
+from app.services.model_pool import ModelPool, ModelPoolTimeout
+from app.services.model_registry import model_registry
+from app.services.result_cache import ResultCache, content_digest
 
 router = APIRouter(prefix="/gaze", tags=["Gaze Detection"])
 
-# MediaPipe init (Lazy)
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = None
-
-def get_face_mesh():
-    global face_mesh
-    if face_mesh is None:
-        face_mesh = mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.3,
-            min_tracking_confidence=0.3
-        )
-    return face_mesh
+# MediaPipe init (Lazy, lewat model_registry supaya status warm-up terlihat di /ready)
+def load_face_mesh():
+    import mediapipe as mp
+    return mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=GAZE_FACE_MESH_STATIC,
+        max_num_faces=1,
+        refine_landmarks=True,
+        min_detection_confidence=0.3,
+        min_tracking_confidence=0.3
+    )
+
+# FaceMesh tidak thread-safe: tiap frame meminjam instance sendiri dari pool
+face_mesh_pool = ModelPool("face_mesh", load_face_mesh, GAZE_FACE_MESH_POOL_SIZE)
+model_registry.register("face_mesh", face_mesh_pool.warm_up)
+
+def get_face_mesh_pool():
+    return model_registry.get("face_mesh")
+
+# mesh.process jalan di thread pool ini (satu worker per instance FaceMesh), bukan di event loop
+gaze_inference = InferenceExecutor(
+    "gaze-inference",
+    max_workers=GAZE_FACE_MESH_POOL_SIZE,
+    max_queue=GAZE_QUEUE_SIZE,
+    retry_after=INFERENCE_RETRY_AFTER_SECONDS
+)
+
+# Batas tunggu instance FaceMesh; normalnya tidak pernah menunggu karena worker = ukuran pool
+FACE_MESH_ACQUIRE_TIMEOUT_SECONDS = 5
+
+# Hasil process_frame per isi upload (retry dari HP), termasuk "wajah tidak terdeteksi"
+gaze_result_cache = ResultCache(
+    "gaze",
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024,
+    ttl_seconds=RESULT_CACHE_TTL_SECONDS
+)
 
 # iris indices (MediaPipe face_mesh)
 LEFT_IRIS = [474, 475, 476, 477]
@@ -45,20 +81,16 @@ class GazeResult(BaseModel):
     processing_time_ms: float
 
 def read_image_bytes(b: bytes):
-    arr = np.frombuffer(b, np.uint8)
-    img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-    if img is None:
-        raise ValueError("Failed to decode image")
-    return img
+    """Decode tereduksi; return (frame, scale) dengan scale = piksel asli per piksel frame"""
+    image = decode_image(b, GAZE_DETECT_TARGET_SIDE)
+    return image.image, image.scale
 
-def process_frame(frame):
-    h, w, _ = frame.shape
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+def process_frame(frame, scale=1):
     h, w, _ = frame.shape
     rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     
-    mesh = get_face_mesh()
-    results = mesh.process(rgb)
+    with get_face_mesh_pool().acquire(timeout=FACE_MESH_ACQUIRE_TIMEOUT_SECONDS) as mesh:
+        results = mesh.process(rgb)
     if not results.multi_face_landmarks:
         return None
 
@@ -86,15 +118,26 @@ def process_frame(frame):
     else:
         gaze_text = "CENTER"
 
+    # Koordinat dikembalikan dalam piksel gambar asli (sebelum decode tereduksi)
     return {
-        "left_center": (int(left_center[0]), int(left_center[1])),
-        "right_center": (int(right_center[0]), int(right_center[1])),
-        "cx": int(cx),
-        "cy": int(cy),
-        "nose_x": int(nose_x),
+        "left_center": (int(left_center[0] * scale), int(left_center[1] * scale)),
+        "right_center": (int(right_center[0] * scale), int(right_center[1] * scale)),
+        "cx": int(cx * scale),
+        "cy": int(cy * scale),
+        "nose_x": int(nose_x * scale),
         "gaze": gaze_text
     }
 
+def predict_bytes(data: bytes):
+    """Decode + FaceMesh untuk satu upload; dijalankan di gaze_inference"""
+    try:
+        frame, scale = read_image_bytes(data)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
+    return process_frame(frame, scale)
+
 @router.post("/predict", response_model=GazeResult)
 async def predict_gaze(file: UploadFile = File(...)):
     """
@@ -104,15 +147,24 @@ async def predict_gaze(file: UploadFile = File(...)):
     if file.content_type.split("/")[0] != "image":
         raise HTTPException(status_code=400, detail="File harus berupa gambar")
     
-    data = await file.read()
+    try:
+        data = await read_upload(file)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=e.message)
     start = time.time()
     
-    try:
-        frame = read_image_bytes(data)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
-
-    res = process_frame(frame)
+    cache_key = (content_digest(data), GAZE_DETECT_TARGET_SIDE)
+    res = gaze_result_cache.get(cache_key)
+    if res is ResultCache.MISS:
+        try:
+            res = await gaze_inference.run(predict_bytes, data)
+        except (InferenceQueueFull, ModelPoolTimeout):
+            raise HTTPException(
+                status_code=503,
+                detail="Server gaze detection sedang sibuk, silakan coba lagi",
+                headers={"Retry-After": str(INFERENCE_RETRY_AFTER_SECONDS)}
+            )
+        gaze_result_cache.put(cache_key, res)
     elapsed = (time.time() - start) * 1000.0
     
     if res is None:
@@ -147,5 +199,9 @@ def gaze_health_check():
         "service": "gaze_detection",
         "model": "MediaPipe FaceMesh",
         "detection_confidence": 0.3,
-        "tracking_confidence": 0.3
+        "tracking_confidence": 0.3,
+        "static_image_mode": GAZE_FACE_MESH_STATIC,
+        "inference": gaze_inference.stats(),
+        "face_mesh_pool": face_mesh_pool.stats(),
+        "result_cache": gaze_result_cache.stats()
     }
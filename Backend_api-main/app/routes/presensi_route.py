@@ -12,6 +12,7 @@ from app.schemas.presensi_schema import (
     PresensiMahasiswaResponse,
     FaceRecognitionUpdateRequest
 )
+from app.services.presensi_service import check_in_error, mark_hadir, get_kelas_info
 from typing import List
 from datetime import datetime, time, timedelta
 
@@ -653,55 +654,23 @@ def update_status_face_recognition(
             detail="NIM tidak sesuai dengan data presensi"
         )
     
-    # 3. Validasi tanggal presensi
-    current_date = datetime.now().date()
-    if presensi.tanggal != current_date:
+    # 3. Validasi tanggal, rentang waktu presensi, dan belum pernah absen
+    now = datetime.now()
+    error = check_in_error(presensi, now)
+    if error:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Presensi hanya bisa dilakukan pada tanggal {presensi.tanggal}"
+            detail=error
         )
     
-    # 4. Validasi waktu presensi (harus dalam rentang waktu_mulai dan waktu_selesai)
-    current_time = datetime.now().time()
-    
-    if presensi.waktu_mulai and current_time < presensi.waktu_mulai:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Presensi belum dibuka. Waktu mulai: {presensi.waktu_mulai}"
-        )
-    
-    if presensi.waktu_selesai and current_time > presensi.waktu_selesai:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Waktu presensi sudah ditutup. Waktu selesai: {presensi.waktu_selesai}"
-        )
-    
-    # 5. Cek apakah sudah pernah absen
-    if presensi.status == "Hadir":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Anda sudah melakukan presensi sebelumnya"
-        )
-    
-    # 6. Update status presensi
-    presensi.status = "Hadir"
-    presensi.waktu_input = datetime.now()
+    # 4. Update status presensi
+    mark_hadir(presensi, now)
     
     db.commit()
     db.refresh(presensi)
     
     # Get info kelas mata kuliah untuk response
-    query = """
-        SELECT 
-            mk.nama_mk,
-            k.nama_kelas
-        FROM kelas_mata_kuliah km
-        JOIN mata_kuliah mk ON km.kode_mk = mk.kode_mk
-        JOIN kelas k ON km.id_kelas = k.id_kelas
-        WHERE km.id_kelas_mk = :id_kelas_mk
-    """
-    
-    result = db.execute(text(query), {"id_kelas_mk": presensi.id_kelas_mk}).fetchone()
+    result = get_kelas_info(db, presensi.id_kelas_mk)
     
     return {
         "message": "Presensi berhasil disimpan",
@@ -18,6 +18,7 @@ from app.schemas.dosen_schema import (
     UserDosenUpdate
 )
 from app.core.security import hash_password
+from app.services.face_gallery import face_gallery
 from app.utils.token_utils import require_super_admin, require_admin_or_super_admin, get_current_user
 
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -319,6 +320,7 @@ def create_mahasiswa(
         db.commit()
         db.refresh(new_user)
         db.refresh(new_mahasiswa)
+        face_gallery.invalidate_partition(new_mahasiswa.id_kelas)
         
         # Get kelas name
         nama_kelas = None
@@ -392,6 +394,7 @@ def update_mahasiswa(
         
         # Update mahasiswa profile
         mahasiswa = db.query(Mahasiswa).filter(Mahasiswa.user_id == user_id).first()
+        old_id_kelas = mahasiswa.id_kelas if mahasiswa else None
         if mahasiswa:
             if update_data.nim is not None:
                 existing = db.query(Mahasiswa).filter(
@@ -423,6 +426,10 @@ def update_mahasiswa(
         db.refresh(user)
         db.refresh(mahasiswa)
         
+        # Roster kelas berubah, partisi face gallery harus dibangun ulang
+        face_gallery.invalidate_partition(old_id_kelas)
+        face_gallery.invalidate_partition(mahasiswa.id_kelas)
+        
         # Build response
         user_dict = {
             "id_user": user.id_user,
@@ -690,6 +697,7 @@ def delete_user(
             mahasiswa = db.query(Mahasiswa).filter(Mahasiswa.user_id == user_id).first()
             if mahasiswa:
                 # Delete akan cascade ke presensi melalui database FK
+                face_gallery.invalidate_partition(mahasiswa.id_kelas)
                 db.delete(mahasiswa)
         
         # Manual cascade delete untuk dosen profile jika ada
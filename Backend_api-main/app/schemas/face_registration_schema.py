@@ -12,6 +12,8 @@ class FaceRegistrationResponse(BaseModel):
     nim: str
     embedding_filename: str
     registration_date: datetime
+    embedding_dtype: Optional[str] = None
+    sample_count: Optional[int] = 0
     updated_at: Optional[datetime] = None
     
     class Config:
@@ -0,0 +1,223 @@
+import os
+import logging
+import tempfile
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def kmeans(data, n_clusters, n_iter=20, seed=0):
+    """Spherical k-means atas baris ternormalisasi L2; return centroid ternormalisasi"""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = np.argmax(data @ centroids.T, axis=1)
+        counts = np.bincount(assign, minlength=n_clusters)
+        # Jumlah per cluster lewat sort + reduceat (np.add.at sangat lambat untuk ini)
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        nonempty = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(data[order], starts[nonempty], axis=0)
+        # Cluster kosong: isi ulang dari titik acak
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class ExactIndex:
+    """Fallback brute force: semua baris jadi kandidat"""
+
+    name = "exact"
+
+    def __init__(self, dim):
+        self.dim = dim
+
+    @property
+    def ready(self):
+        return False
+
+    @property
+    def size(self):
+        return 0
+
+    def build(self, matrix, labels):
+        pass
+
+    def needs_retrain(self, size):
+        return False
+
+    def add(self, row, vector):
+        pass
+
+    def candidates(self, query):
+        return None
+
+    def snapshot(self, labels):
+        return None
+
+    def load(self, path):
+        return False
+
+
+class IVFIndex:
+    """
+    Index inverted-file atas baris matrix FaceGallery (NumPy murni): gallery dibagi
+    ke nlist cell dengan spherical k-means, query hanya men-scan baris di nprobe
+    cell terdekat lalu diurutkan ulang secara exact.
+
+    Index hanya menyimpan cell per baris. Baris gallery append-only: baris baru
+    lewat add(), baris yang dihapus/ditimpa tetap di cell-nya dan disaring gallery
+    (tandai mati) sampai build ulang.
+    """
+
+    name = "ivf"
+
+    def __init__(self, dim, nprobe=8, train_iters=20):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.train_iters = train_iters
+        self.centroids = None
+        self.trained_size = 0
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._size = 0
+        self._lists = {}
+        self._saved_cells = {}
+
+    @property
+    def ready(self):
+        return self.centroids is not None
+
+    @property
+    def size(self):
+        return self._size
+
+    @staticmethod
+    def nlist_for(n):
+        return max(1, int(np.sqrt(n)))
+
+    def build(self, matrix, labels):
+        """
+        Tetapkan cell tiap baris; centroid dilatih dulu jika belum ada (atau gallery
+        sudah jauh lebih besar). Label dari file index yang di-load memakai cell tersimpan.
+        """
+        n = len(matrix)
+        if self.centroids is None or self.needs_retrain(n):
+            nlist = self.nlist_for(n)
+            sample = matrix
+            if n > nlist * 64:
+                sample = matrix[np.random.default_rng(0).choice(n, nlist * 64, replace=False)]
+            self.centroids = kmeans(sample, nlist, self.train_iters)
+            self.trained_size = n
+            self._saved_cells = {}
+
+        self._assign = np.zeros(max(16, n), dtype=np.int32)
+        self._size = n
+        unknown = []
+        for row, label in enumerate(labels):
+            cell = self._saved_cells.get(label)
+            if cell is None:
+                unknown.append(row)
+            else:
+                self._assign[row] = cell
+        if unknown:
+            self._assign[unknown] = np.argmax(matrix[unknown] @ self.centroids.T, axis=1)
+        self._saved_cells = {}
+        self._lists = {}
+
+    def needs_retrain(self, size):
+        return self.ready and size > 4 * self.trained_size
+
+    def add(self, row, vector):
+        if not self.ready:
+            return
+        if row >= len(self._assign):
+            assign = np.zeros(max(16, len(self._assign) * 2), dtype=np.int32)
+            assign[:self._size] = self._assign[:self._size]
+            self._assign = assign
+        cell = int(np.argmax(self.centroids @ vector))
+        if row < self._size:
+            self._lists.pop(int(self._assign[row]), None)
+        self._assign[row] = cell
+        self._size = max(self._size, row + 1)
+        self._lists.pop(cell, None)
+
+    def candidates(self, query):
+        """Baris di nprobe cell terdekat ke query"""
+        scores = self.centroids @ query
+        nprobe = min(self.nprobe, len(scores))
+        cells = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self._cell_rows(int(c)) for c in cells])
+
+    def _cell_rows(self, cell):
+        rows = self._lists.get(cell)
+        if rows is None:
+            rows = np.flatnonzero(self._assign[:self._size] == cell)
+            self._lists[cell] = rows
+        return rows
+
+    def snapshot(self, labels):
+        """Salinan state untuk save_index(), diambil di bawah lock gallery (murah: hanya copy assign)"""
+        if not self.ready:
+            return None
+        return {
+            "centroids": self.centroids,
+            "trained_size": self.trained_size,
+            "labels": labels,
+            "assign": self._assign[:self._size].copy(),
+        }
+
+    def load(self, path):
+        """Load centroid dan cell per label dari path; diterapkan oleh build()"""
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as data:
+                centroids = data["centroids"]
+                trained_size = int(data["trained_size"])
+                saved_cells = dict(zip(data["labels"].tolist(), data["assign"].tolist()))
+        except Exception as e:
+            logger.error(f"Failed to load ANN index {path}: {e}")
+            return False
+        if centroids.ndim != 2 or centroids.shape[1] != self.dim:
+            return False
+        self.centroids = centroids.astype(np.float32)
+        self.trained_size = trained_size
+        self._saved_cells = saved_cells
+        return True
+
+
+def save_index(path, snapshot):
+    """Tulis snapshot index ke path di luar lock; file tmp per proses, lalu os.replace"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    labels = np.array(["" if label is None else label for label in snapshot["labels"]], dtype=str)
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=".tmp", delete=False) as f:
+        np.savez(
+            f,
+            centroids=snapshot["centroids"],
+            trained_size=snapshot["trained_size"],
+            labels=labels,
+            assign=snapshot["assign"],
+        )
+    try:
+        os.replace(f.name, path)
+    except OSError:
+        os.remove(f.name)
+        raise
+
+
+ANN_BACKENDS = {
+    ExactIndex.name: ExactIndex,
+    IVFIndex.name: IVFIndex,
+}
+
+
+def create_index(backend, dim):
+    if backend not in ANN_BACKENDS:
+        raise ValueError(f"Unknown ANN backend '{backend}', choose one of {sorted(ANN_BACKENDS)}")
+    return ANN_BACKENDS[backend](dim)
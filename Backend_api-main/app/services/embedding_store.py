@@ -0,0 +1,231 @@
+import os
+import json
+import logging
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: dev server satu proses, tanpa lock antar proses
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LABEL_BYTES = 64
+MANIFEST = "manifest.json"
+
+
+class EmbeddingStore:
+    """
+    Embedding store satu file yang bisa di-np.memmap oleh semua worker. Satu
+    generasi aktif: manifest.json, vectors-<gen>.bin (capacity x dim, baris
+    [0, count) terpakai), labels-<gen>.json (NIM per baris) dan journal-<gen>.bin
+    (record add/delete ukuran tetap). compact() melipat journal ke generasi baru
+    dan menukar manifest dengan os.replace; proses yang masih memmap generasi
+    lama tetap valid sampai membuka ulang.
+    """
+
+    OP_ADD = 1
+    OP_DELETE = 2
+
+    def __init__(self, path, dim=512, dtype="float32", compact_after=1000):
+        self.path = path
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.compact_after = compact_after
+        self.record_dtype = np.dtype([
+            ("op", "u1"),
+            ("label", f"S{LABEL_BYTES}"),
+            ("vector", self.dtype, (dim,)),
+        ])
+
+    # ========================
+    # Path & manifest
+    # ========================
+
+    def _file(self, kind, generation):
+        ext = "json" if kind == "labels" else "bin"
+        return os.path.join(self.path, f"{kind}-{generation}.{ext}")
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, MANIFEST))
+
+    def manifest(self):
+        with open(os.path.join(self.path, MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest["dim"] != self.dim:
+            raise ValueError(f"Embedding store dim {manifest['dim']} != {self.dim}")
+        return manifest
+
+    def locked(self):
+        """Lock tulis antar proses untuk beberapa operasi; di dalamnya pakai append/delete(locked=True)"""
+        return self._write_lock()
+
+    @contextmanager
+    def _write_lock(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, ".lock"), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ========================
+    # Baca
+    # ========================
+
+    def open(self, mode="c"):
+        """
+        Map generasi aktif. Return (manifest, labels, matrix, journal); matrix = np.memmap
+        capacity x dim (mode "c" = copy-on-write: tulisan tidak mengubah file maupun
+        halaman yang shared dengan proses lain), journal = record yang belum dilipat.
+        """
+        for attempt in range(3):
+            manifest = self.manifest()
+            generation = manifest["generation"]
+            try:
+                with open(self._file("labels", generation)) as f:
+                    labels = json.load(f)
+                matrix = np.memmap(
+                    self._file("vectors", generation),
+                    dtype=np.dtype(manifest["dtype"]),
+                    mode=mode,
+                    shape=(manifest["capacity"], self.dim),
+                )
+                return manifest, labels, matrix, self.read_journal(generation)
+            except FileNotFoundError:
+                # Compaction di proses lain baru saja mengganti generasi, baca ulang manifest
+                if attempt == 2:
+                    raise
+
+    def read_journal(self, generation, start=0):
+        """Record journal mulai index start (hanya record yang tertulis utuh)"""
+        journal_path = self._file("journal", generation)
+        if not os.path.exists(journal_path):
+            return np.zeros(0, dtype=self.record_dtype)
+        size = os.path.getsize(journal_path) // self.record_dtype.itemsize
+        if size <= start:
+            return np.zeros(0, dtype=self.record_dtype)
+        return np.fromfile(
+            journal_path,
+            dtype=self.record_dtype,
+            count=size - start,
+            offset=start * self.record_dtype.itemsize,
+        )
+
+    @staticmethod
+    def decode_label(raw):
+        return raw.rstrip(b"\0").decode("utf-8")
+
+    def snapshot(self):
+        """(labels, vektor float32) setelah journal diterapkan"""
+        manifest, labels, matrix, journal = self.open(mode="r")
+        vectors = {label: matrix[i] for i, label in enumerate(labels)}
+        for record in journal:
+            label = self.decode_label(record["label"])
+            if record["op"] == self.OP_ADD:
+                vectors[label] = record["vector"]
+            else:
+                vectors.pop(label, None)
+        labels = list(vectors)
+        matrix = np.array([vectors[label] for label in labels], dtype=np.float32).reshape(-1, self.dim)
+        return labels, matrix
+
+    # ========================
+    # Tulis
+    # ========================
+
+    def create(self, labels, vectors, overwrite=True):
+        """Tulis generasi baru berisi tepat labels/vectors"""
+        with self._write_lock():
+            if self.exists() and not overwrite:
+                return False
+            self._write_generation(list(labels), np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+            return True
+
+    def append(self, label, vector, locked=False):
+        self._append_record(self.OP_ADD, label, vector, locked)
+
+    def delete(self, label, locked=False):
+        self._append_record(self.OP_DELETE, label, None, locked)
+
+    def compact(self):
+        """Lipat journal ke generasi baru; False jika journal kosong"""
+        with self._write_lock():
+            if not len(self.read_journal(self.manifest()["generation"])):
+                return False
+            labels, vectors = self.snapshot()
+            self._write_generation(labels, vectors)
+            return True
+
+    def _append_record(self, op, label, vector, locked=False):
+        encoded = label.encode("utf-8")
+        if len(encoded) > LABEL_BYTES:
+            raise ValueError(f"Label '{label}' lebih dari {LABEL_BYTES} byte")
+        record = np.zeros(1, dtype=self.record_dtype)
+        record["op"] = op
+        record["label"] = encoded
+        if vector is not None:
+            record["vector"] = np.asarray(vector, dtype=np.float32).reshape(self.dim)
+
+        if locked:
+            return self._write_record(record)
+        with self._write_lock():
+            self._write_record(record)
+
+    def _write_record(self, record):
+        if not self.exists():
+            self._write_generation([], np.zeros((0, self.dim), dtype=np.float32))
+        generation = self.manifest()["generation"]
+        journal_path = self._file("journal", generation)
+        with open(journal_path, "ab") as f:
+            f.write(record.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        pending = os.path.getsize(journal_path) // self.record_dtype.itemsize
+        if pending >= self.compact_after:
+            labels, vectors = self.snapshot()
+            self._write_generation(labels, vectors)
+
+    def _write_generation(self, labels, vectors):
+        """Tulis vectors/labels/journal kosong generasi baru, lalu tukar manifest"""
+        generation = self.manifest()["generation"] + 1 if self.exists() else 1
+        count = len(labels)
+        # Sisakan ruang kosong supaya proses yang memmap bisa append in place
+        capacity = max(16, 1 << int(np.ceil(np.log2(max(count * 2, 1)))))
+
+        matrix = np.memmap(
+            self._file("vectors", generation), dtype=self.dtype, mode="w+", shape=(capacity, self.dim)
+        )
+        matrix[:count] = vectors
+        matrix.flush()
+        del matrix
+        with open(self._file("labels", generation), "w") as f:
+            json.dump(labels, f)
+        open(self._file("journal", generation), "wb").close()
+
+        manifest = {
+            "generation": generation,
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "count": count,
+            "capacity": capacity,
+        }
+        tmp_path = os.path.join(self.path, MANIFEST + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST))
+
+        # Generasi lama: proses yang masih memmap tetap valid (inode belum dibebaskan)
+        for kind in ("vectors", "labels", "journal"):
+            old_path = self._file(kind, generation - 1)
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+        logger.info(f"Embedding store generation {generation}: {count} embedding(s)")
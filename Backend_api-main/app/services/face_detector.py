@@ -0,0 +1,160 @@
+import os
+import logging
+import threading
+import cv2
+from app.services.model_cache import model_cache
+
+logger = logging.getLogger(__name__)
+
+
+def make_face(box, confidence, keypoints=None):
+    """
+    Hasil deteksi dengan struktur yang sama seperti mtcnn.MTCNN().detect_faces:
+    {"box": [x, y, w, h], "confidence": float, "keypoints": {name: (x, y)}}.
+    "left"/"right" mengikuti posisi di gambar (left_eye = x lebih kecil).
+    """
+    x, y, w, h = (int(round(v)) for v in box)
+    return {
+        "box": [max(x, 0), max(y, 0), w, h],
+        "confidence": float(confidence),
+        "keypoints": keypoints or {},
+    }
+
+
+def _point(p):
+    return (int(round(p[0])), int(round(p[1])))
+
+
+def _left_right(a, b):
+    return (a, b) if a[0] <= b[0] else (b, a)
+
+
+class MTCNNDetector:
+    """mtcnn.MTCNN: paling akurat, paling lambat (cascade 3 tahap)"""
+
+    name = "mtcnn"
+
+    def __init__(self, min_confidence=0.0, **kwargs):
+        from mtcnn import MTCNN
+        self.min_confidence = min_confidence
+        self._detector = MTCNN()
+
+    def detect(self, image):
+        # Gambar diteruskan apa adanya (BGR dari cv2.imdecode) seperti route sebelumnya,
+        # supaya box - dan embedding yang sudah terdaftar - tetap konsisten
+        faces = self._detector.detect_faces(image)
+        return [f for f in faces if f["confidence"] >= self.min_confidence]
+
+
+class YuNetDetector:
+    """OpenCV DNN YuNet (cv2.FaceDetectorYN): CNN kecil, cepat di CPU, ada 5 landmark"""
+
+    name = "yunet"
+    MODEL_FILE = "face_detection_yunet_2023mar.onnx"
+
+    def __init__(self, min_confidence=0.6, model_dir=None, **kwargs):
+        model_path = os.path.join(model_dir or "", self.MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"Model YuNet tidak ditemukan: {model_path} "
+                "(download dari github.com/opencv/opencv_zoo/tree/main/models/face_detection_yunet)"
+            )
+        model_cache.verify(model_path)
+        self.min_confidence = min_confidence
+        self._detector = cv2.FaceDetectorYN.create(model_path, "", (320, 320), min_confidence)
+        # setInputSize + detect harus atomik: executor inference punya beberapa worker
+        self._lock = threading.Lock()
+
+    def detect(self, image):
+        h, w = image.shape[:2]
+        with self._lock:
+            self._detector.setInputSize((w, h))
+            _, rows = self._detector.detect(image)
+        if rows is None:
+            return []
+        faces = []
+        for row in rows:
+            # x, y, w, h, mata kanan, mata kiri, hidung, mulut kanan, mulut kiri, score
+            landmarks = row[4:14].reshape(5, 2)
+            left_eye, right_eye = _left_right(landmarks[0], landmarks[1])
+            mouth_left, mouth_right = _left_right(landmarks[3], landmarks[4])
+            faces.append(make_face(row[:4], row[14], {
+                "left_eye": _point(left_eye),
+                "right_eye": _point(right_eye),
+                "nose": _point(landmarks[2]),
+                "mouth_left": _point(mouth_left),
+                "mouth_right": _point(mouth_right),
+            }))
+        return faces
+
+
+class MediaPipeDetector:
+    """MediaPipe face detection (BlazeFace): sangat cepat, landmark tanpa sudut mulut"""
+
+    name = "mediapipe"
+
+    def __init__(self, min_confidence=0.5, **kwargs):
+        import mediapipe as mp
+        self._detector = mp.solutions.face_detection.FaceDetection(
+            model_selection=1,  # model full-range, cocok untuk foto HP
+            min_detection_confidence=min_confidence
+        )
+        # Graph MediaPipe tidak thread-safe
+        self._lock = threading.Lock()
+
+    def detect(self, image):
+        h, w = image.shape[:2]
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        with self._lock:
+            results = self._detector.process(rgb)
+        faces = []
+        for detection in results.detections or []:
+            bbox = detection.location_data.relative_bounding_box
+            points = [(kp.x * w, kp.y * h) for kp in detection.location_data.relative_keypoints]
+            left_eye, right_eye = _left_right(points[0], points[1])
+            # MediaPipe hanya memberi titik tengah mulut
+            faces.append(make_face(
+                (bbox.xmin * w, bbox.ymin * h, bbox.width * w, bbox.height * h),
+                detection.score[0],
+                {
+                    "left_eye": _point(left_eye),
+                    "right_eye": _point(right_eye),
+                    "nose": _point(points[2]),
+                    "mouth_left": _point(points[3]),
+                    "mouth_right": _point(points[3]),
+                }
+            ))
+        return faces
+
+
+class HaarDetector:
+    """Haar cascade OpenCV: fallback terakhir, tanpa landmark dan tanpa skor asli"""
+
+    name = "haar"
+
+    def __init__(self, **kwargs):
+        cascade_path = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        self._detector = cv2.CascadeClassifier(cascade_path)
+
+    def detect(self, image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        boxes = self._detector.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(40, 40))
+        # Wajah terbesar dulu, karena pemanggil memakai faces[0]
+        boxes = sorted(boxes, key=lambda b: b[2] * b[3], reverse=True)
+        return [make_face(box, 1.0) for box in boxes]
+
+
+FACE_DETECTORS = {
+    MTCNNDetector.name: MTCNNDetector,
+    YuNetDetector.name: YuNetDetector,
+    MediaPipeDetector.name: MediaPipeDetector,
+    HaarDetector.name: HaarDetector,
+}
+
+
+def create_detector(backend, **kwargs):
+    if backend not in FACE_DETECTORS:
+        raise ValueError(f"Unknown face detector '{backend}', choose one of {sorted(FACE_DETECTORS)}")
+    detector = FACE_DETECTORS[backend](**kwargs)
+    logger.info(f"Face detector backend: {backend}")
+    return detector
@@ -0,0 +1,118 @@
+import os
+import logging
+import threading
+import cv2
+import numpy as np
+from app.services.model_cache import model_cache
+
+logger = logging.getLogger(__name__)
+
+FACENET_INPUT_SIZE = 160
+
+
+def preprocess(face_crops, size=FACENET_INPUT_SIZE):
+    """
+    Sama persis dengan keras_facenet.FaceNet.embeddings: resize ke 160x160 lalu
+    fixed image standardization (x - 127.5) / 127.5. Return batch NHWC float32.
+    """
+    return np.float32([
+        (np.float32(cv2.resize(crop, (size, size))) - 127.5) / 127.5
+        for crop in face_crops
+    ])
+
+
+class KerasFaceNetEmbedder:
+    """keras_facenet.FaceNet di TensorFlow penuh (backend asli)"""
+
+    name = "keras"
+
+    def __init__(self, intra_op_threads=0, **kwargs):
+        import tensorflow as tf
+        from keras_facenet import FaceNet
+
+        # Batasi thread TensorFlow supaya beberapa worker inference tidak saling rebut core
+        if intra_op_threads > 0:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        self._model = FaceNet(cache_folder=model_cache.facenet_folder()).model
+
+    def embeddings(self, face_crops):
+        return np.asarray(self._model.predict(preprocess(face_crops), verbose=0), dtype=np.float32)
+
+
+class OnnxFaceNetEmbedder:
+    """FaceNet hasil konversi (convert_facenet.py) di ONNX Runtime CPU, tanpa TensorFlow"""
+
+    name = "onnx"
+
+    def __init__(self, model_path, intra_op_threads=0, **kwargs):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+            options.inter_op_num_threads = 1
+        self._session = ort.InferenceSession(
+            model_cache.verify(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self._input = self._session.get_inputs()[0].name
+
+    def embeddings(self, face_crops):
+        return self._session.run(None, {self._input: preprocess(face_crops)})[0].astype(np.float32)
+
+
+class TFLiteFaceNetEmbedder:
+    """FaceNet hasil konversi di TFLite (tflite-runtime bila ada, fallback tf.lite)"""
+
+    name = "tflite"
+
+    def __init__(self, model_path, intra_op_threads=0, **kwargs):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+
+        self._interpreter = Interpreter(
+            model_path=model_cache.verify(model_path),
+            num_threads=intra_op_threads or None
+        )
+        self._input = self._interpreter.get_input_details()[0]["index"]
+        self._output = self._interpreter.get_output_details()[0]["index"]
+        self._batch_size = None
+        # Interpreter TFLite tidak thread-safe, sedangkan executor inference punya beberapa worker
+        self._lock = threading.Lock()
+
+    def embeddings(self, face_crops):
+        batch = preprocess(face_crops)
+        with self._lock:
+            if self._batch_size != len(batch):
+                self._interpreter.resize_tensor_input(self._input, batch.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self._interpreter.set_tensor(self._input, batch)
+            self._interpreter.invoke()
+            return np.array(self._interpreter.get_tensor(self._output), dtype=np.float32)
+
+
+FACE_EMBEDDERS = {
+    KerasFaceNetEmbedder.name: KerasFaceNetEmbedder,
+    OnnxFaceNetEmbedder.name: OnnxFaceNetEmbedder,
+    TFLiteFaceNetEmbedder.name: TFLiteFaceNetEmbedder,
+}
+
+
+def default_model_path(backend, int8=False):
+    """Lokasi output convert_facenet.py di MODEL_CACHE_DIR, mis. facenet/facenet.int8.onnx"""
+    ext = {"onnx": "onnx", "tflite": "tflite"}[backend]
+    name = f"facenet.int8.{ext}" if int8 else f"facenet.{ext}"
+    return os.path.join(model_cache.path, "facenet", name)
+
+
+def create_embedder(backend, model_path=None, **kwargs):
+    if backend not in FACE_EMBEDDERS:
+        raise ValueError(f"Unknown face embedder '{backend}', choose one of {sorted(FACE_EMBEDDERS)}")
+    if backend != KerasFaceNetEmbedder.name:
+        kwargs["model_path"] = model_path or default_model_path(backend)
+    embedder = FACE_EMBEDDERS[backend](**kwargs)
+    logger.info(f"Face embedder backend: {backend}")
+    return embedder
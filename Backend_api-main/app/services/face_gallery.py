@@ -0,0 +1,542 @@
+import os
+import pickle
+import threading
+import time
+import logging
+import numpy as np
+from app.config import (
+    FACE_ANN_BACKEND,
+    FACE_ANN_MIN_GALLERY_SIZE,
+    FACE_EMBEDDING_STORE,
+    FACE_EMBEDDING_STORE_DTYPE,
+    FACE_GALLERY_WATCH,
+    FACE_GALLERY_POLL_SECONDS
+)
+from app.services.ann_index import create_index, save_index
+from app.services.embedding_store import EmbeddingStore
+from app.services.gallery_watcher import GalleryWatcher
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 512
+
+# Folder untuk menyimpan embedding (relatif ke Backend_api)
+EMBEDDINGS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "embeddings")
+
+# Index ANN dan embedding store disimpan di samping folder embeddings
+ANN_INDEX_DIR = EMBEDDINGS_DIR + "_index"
+EMBEDDING_STORE_DIR = EMBEDDINGS_DIR + "_store"
+
+# Partisi roster juga dibangun ulang setelah sekian detik, supaya perubahan kelas
+# lewat worker lain akhirnya ikut terbaca
+PARTITION_TTL_SECONDS = 300
+
+
+def normalize(vector):
+    """L2-normalisasi satu embedding (atau tiap baris matrix) sebagai float32"""
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(arr, axis=-1, keepdims=True)
+    norm[norm == 0] = 1.0
+    return arr / norm
+
+
+class FaceGallery:
+    """
+    Index resident semua embedding wajah terdaftar: satu matrix float32 (baris
+    ternormalisasi) + label NIM per baris, jadi jarak cosine ke seluruh gallery
+    cukup satu perkalian matrix-vektor.
+
+    Baris yang sudah dipublikasikan tidak pernah diubah: embedding baru/ditimpa
+    ditulis ke kapasitas kosong setelah _size, baris lama hanya ditandai mati,
+    lalu snapshot ditukar di bawah lock singkat. Pembaca scan tanpa lock.
+    Gallery besar dicari lewat index ANN (ann_index.py), partisi roster per
+    kelas di-cache untuk check-in.
+
+    Dengan EmbeddingStore, matrix adalah np.memmap store (shared antar worker)
+    dan setiap perubahan di-journal; refresh_from_store() menerapkan journal
+    proses lain. Kapasitas habis / terlalu banyak baris mati -> compact + map ulang.
+    """
+
+    OP_ADD = "add"
+    OP_DELETE = "delete"
+
+    def __init__(
+        self,
+        embeddings_dir,
+        dim=EMBEDDING_DIM,
+        ann_backend="exact",
+        ann_min_size=0,
+        index_dir=None,
+        store=None
+    ):
+        self.embeddings_dir = embeddings_dir
+        self.dim = dim
+        self.store = store
+        self.store_generation = None
+        self.journal_position = 0
+        self.ann_min_size = ann_min_size
+        self.ann_backend = ann_backend
+        self._ann = create_index(ann_backend, dim)
+        self._index_path = os.path.join(index_dir, f"{self._ann.name}.npz") if index_dir else None
+        # File index hanya ditulis ulang setelah build (centroid/cell baru), bukan tiap add
+        self._index_dirty = False
+        # _lock: swap snapshot, ANN, partitions. _write_lock: satu writer dalam satu waktu
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._labels = np.empty(0, dtype=object)
+        self._rows = {}
+        # _size: baris terpakai (hidup + mati), _alive: False untuk baris yang dihapus/ditimpa
+        self._size = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._dead = 0
+        self._compact_pending = False
+        self._partitions = {}
+        # Naik setiap isi gallery berubah; dipakai sebagai bagian key cache hasil recognize
+        self.version = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, label):
+        return label in self._rows
+
+    def labels(self):
+        with self._lock:
+            return [label for label in self._labels[:self._size] if label is not None]
+
+    def load(self):
+        """
+        Bangun index dari embedding store; tanpa store (atau store belum ada)
+        dari file .pkl, yang lalu diimpor ke store.
+        """
+        if self.store is not None and self.store.exists():
+            # Lipat journal dulu supaya semua baris ada di file yang dimap (shared antar worker)
+            self.store.compact()
+            return self._load_store()
+
+        labels, vectors = self._read_pkl_files()
+        if self.store is not None:
+            matrix = normalize(np.vstack(vectors)) if vectors else np.zeros((0, self.dim), dtype=np.float32)
+            self.store.create(labels, matrix, overwrite=False)
+            return self._load_store()
+        return self.load_matrix(labels, vectors)
+
+    def _read_pkl_files(self):
+        labels, vectors = [], []
+        if os.path.exists(self.embeddings_dir):
+            for file_name in sorted(os.listdir(self.embeddings_dir)):
+                if not file_name.endswith(".pkl"):
+                    continue
+                vector = self.read_pkl(file_name[:-len(".pkl")])
+                if vector is not None:
+                    labels.append(file_name[:-len(".pkl")])
+                    vectors.append(vector)
+        return labels, vectors
+
+    def read_pkl(self, label):
+        """Embedding dari embeddings/<label>.pkl, None jika tidak ada/rusak"""
+        file_name = f"{label}.pkl"
+        try:
+            with open(os.path.join(self.embeddings_dir, file_name), "rb") as f:
+                return np.asarray(pickle.load(f), dtype=np.float32).reshape(self.dim)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Failed to load embedding {file_name}: {e}")
+            return None
+
+    def load_matrix(self, labels, vectors):
+        """Ganti seluruh index dengan labels dan baris embedding ini"""
+        labels = list(labels)
+        matrix = normalize(np.vstack(vectors)) if len(labels) else np.zeros((0, self.dim), dtype=np.float32)
+        labels_array = np.array(labels, dtype=object)
+        with self._write_lock:
+            self._publish(np.ascontiguousarray(matrix), labels_array, {label: i for i, label in enumerate(labels)})
+        self._save_index()
+        logger.info(f"Face gallery loaded: {len(self)} embedding(s), ANN backend: {self._ann.name}")
+        return len(self)
+
+    def _load_store(self):
+        """
+        Map matrix store copy-on-write; perubahan hanya ditulis ke baris kosong,
+        jadi halaman baris yang sudah ada tetap shared antar worker.
+        """
+        with self._write_lock:
+            manifest, labels, matrix, journal = self.store.open(mode="c")
+            if matrix.dtype != np.float32:
+                # Store float16: BLAS butuh float32, jadi perlu salinan privat per worker
+                # (yang shared hanya file/page cache float16)
+                matrix = np.array(matrix, dtype=np.float32)
+            labels_array = np.empty(len(matrix), dtype=object)
+            labels_array[:len(labels)] = labels
+            self._publish(matrix, labels_array, {label: i for i, label in enumerate(labels)})
+            self._apply(self._journal_ops(journal))
+            self.store_generation = manifest["generation"]
+            self.journal_position = len(journal)
+        self._save_index()
+        logger.info(
+            f"Face gallery loaded from store generation {self.store_generation}: "
+            f"{len(self)} embedding(s), ANN backend: {self._ann.name}"
+        )
+        return len(self)
+
+    def _publish(self, matrix, labels, rows):
+        """Tukar seluruh snapshot (load/reload) dan bangun ulang index ANN"""
+        with self._lock:
+            self._matrix, self._labels, self._rows, self._size = matrix, labels, rows, len(rows)
+            self._alive = np.zeros(len(matrix), dtype=bool)
+            self._alive[:self._size] = True
+            self._dead = 0
+            self.version += 1
+            self._partitions.clear()
+            if self._size and self._size >= self.ann_min_size:
+                if self._index_path:
+                    self._ann.load(self._index_path)
+                self._ann.build(self._matrix[:self._size], self._labels[:self._size])
+                self._index_dirty = True
+            else:
+                # Di bawah ann_min_size: buang index lama, cell-nya menunjuk ke baris yang sudah tidak ada
+                self._ann = create_index(self.ann_backend, self.dim)
+
+    def _journal_ops(self, journal):
+        ops = []
+        for record in journal:
+            label = self.store.decode_label(record["label"])
+            if record["op"] == self.store.OP_ADD:
+                ops.append((self.OP_ADD, label, normalize(record["vector"])))
+            else:
+                ops.append((self.OP_DELETE, label, None))
+        return ops
+
+    # ========================
+    # Tulis (append + tandai mati)
+    # ========================
+
+    def add(self, label, embedding):
+        """Tambah/timpa embedding label (dan journal ke store)"""
+        vector = normalize(np.asarray(embedding, dtype=np.float32).reshape(self.dim))
+        with self._write_lock:
+            self._write([(self.OP_ADD, label, vector)])
+        self._save_index()
+
+    def remove(self, label):
+        """Hapus label dari index (dan store). Return False jika tidak ada"""
+        with self._write_lock:
+            if label not in self._rows:
+                return False
+            self._write([(self.OP_DELETE, label, None)])
+        self._save_index()
+        return True
+
+    def sync_files(self, labels):
+        """
+        Baca ulang embeddings/<label>.pkl yang berubah di disk dan terapkan hanya
+        perbedaannya (file hilang = hapus). Return jumlah perubahan.
+        """
+        vectors = {label: self.read_pkl(label) for label in labels}
+        return self.apply_changes(vectors, source=self.embeddings_dir)
+
+    def apply_changes(self, vectors, source="external"):
+        """
+        Terapkan {label: vector atau None} dari sumber luar (.pkl, tabel
+        face_registrations), lewati yang sudah sama. Dengan store, perubahan
+        di-journal sekali di bawah lock store. Return jumlah perubahan.
+        """
+        with self._write_lock:
+            if self.store is None:
+                ops = self._effective_ops(vectors)
+                self._apply(ops)
+            else:
+                with self.store.locked():
+                    self._refresh_store()
+                    ops = self._effective_ops(vectors)
+                    self._journal(ops)
+                self._compact_store()
+        if ops:
+            self._save_index()
+            logger.info(f"Face gallery synced {len(ops)} change(s) from {source}")
+        return len(ops)
+
+    def _write(self, ops):
+        """Terapkan ops dari proses ini (dan journal ke store). Pemanggil memegang _write_lock"""
+        if self.store is None:
+            self._apply(ops)
+            return
+        with self.store.locked():
+            self._refresh_store()
+            self._journal(ops)
+        self._compact_store()
+
+    def _journal(self, ops):
+        """
+        Tulis ops ke journal lalu terapkan; journal_position ikut maju supaya record
+        milik proses ini tidak diterapkan ulang oleh refresh. Di dalam store.locked().
+        """
+        for op, label, vector in ops:
+            if op == self.OP_ADD:
+                self.store.append(label, vector, locked=True)
+            else:
+                self.store.delete(label, locked=True)
+        self._apply(ops)
+        if self.store_generation == self.store.manifest()["generation"]:
+            self.journal_position += len(ops)
+
+    def refresh_from_store(self):
+        """Terapkan journal dari proses lain (atau map ulang setelah compaction)"""
+        if self.store is None or not self.store.exists():
+            return 0
+        with self._write_lock:
+            applied = self._refresh_store()
+            self._compact_store()
+        if applied:
+            self._save_index()
+        return applied
+
+    def _refresh_store(self):
+        manifest = self.store.manifest()
+        if manifest["generation"] != self.store_generation:
+            # Compaction: generasi baru, map ulang (snapshot lama tetap valid untuk pembaca)
+            self._load_store()
+            return len(self)
+        journal = self.store.read_journal(self.store_generation, start=self.journal_position)
+        self.journal_position += len(journal)
+        current = {}
+        for op, label, vector in self._journal_ops(journal):
+            current[label] = vector
+        return self._apply(self._effective_ops(current))
+
+    def _effective_ops(self, vectors):
+        """{label: vector atau None} -> ops, tanpa yang tidak mengubah apa pun"""
+        ops = []
+        for label, vector in vectors.items():
+            row = self._rows.get(label)
+            if vector is None:
+                if row is not None:
+                    ops.append((self.OP_DELETE, label, None))
+                continue
+            vector = normalize(vector)
+            if row is None or not self._same_vector(self._matrix[row], vector):
+                ops.append((self.OP_ADD, label, vector))
+        return ops
+
+    def _same_vector(self, current, vector):
+        # Dibandingkan di presisi store: baris dari journal float16 sudah dibulatkan
+        if self.store is not None:
+            current, vector = current.astype(self.store.dtype), vector.astype(self.store.dtype)
+        return np.allclose(current, vector, atol=1e-6 if current.dtype == np.float32 else 1e-3)
+
+    def _apply(self, ops):
+        """
+        Terapkan ops ("add"/"delete", label, vector): baris baru ditulis setelah _size
+        (belum terlihat pembaca), baris lama hanya ditandai mati, jadi matrix tidak
+        pernah disalin. Pemanggil memegang _write_lock.
+        """
+        if not ops:
+            return 0
+        appends = sum(1 for op, _, _ in ops if op == self.OP_ADD)
+        if self._size + appends > self._matrix.shape[0]:
+            return self._rebuild(ops)
+
+        matrix, size, dead = self._matrix, self._size, self._dead
+        # Index yang tidak mengikuti layout baris saat ini harus dibangun ulang, bukan ditambah
+        ann_stale = self._ann.ready and self._ann.size != size
+        rows = dict(self._rows)
+        labels = self._labels.copy()
+        alive = self._alive.copy()
+        added = []
+        touched = set()
+        for op, label, vector in ops:
+            touched.add(label)
+            row = rows.pop(label, None)
+            if row is not None:
+                labels[row] = None
+                alive[row] = False
+                dead += 1
+            if op == self.OP_ADD:
+                matrix[size] = vector
+                labels[size] = label
+                alive[size] = True
+                rows[label] = size
+                added.append((size, vector))
+                size += 1
+        if self.store is None and self._too_many_dead(dead, size):
+            return self._rebuild(ops)
+
+        with self._lock:
+            self._labels, self._alive, self._rows, self._size, self._dead = labels, alive, rows, size, dead
+            self.version += 1
+            for label in touched:
+                self._drop_partitions_with(label)
+            if size >= self.ann_min_size and (not self._ann.ready or ann_stale or self._ann.needs_retrain(size)):
+                if size:
+                    self._ann.build(matrix[:size], labels[:size])
+                    self._index_dirty = True
+            else:
+                for row, vector in added:
+                    self._ann.add(row, vector)
+        if self.store is not None and self._too_many_dead(dead, size):
+            self._compact_pending = True
+        return len(ops)
+
+    @staticmethod
+    def _too_many_dead(dead, size):
+        return dead > max(64, size // 4)
+
+    def _rebuild(self, ops):
+        """
+        Salinan privat yang padat (baris mati dibuang) + ops, saat kapasitas habis.
+        Dengan store, compaction dijadwalkan supaya matrix kembali shared.
+        """
+        vectors = {label: self._matrix[row] for label, row in sorted(self._rows.items(), key=lambda item: item[1])}
+        for op, label, vector in ops:
+            if op == self.OP_ADD:
+                vectors[label] = vector
+            else:
+                vectors.pop(label, None)
+        labels = list(vectors)
+        capacity = max(16, 2 * len(labels))
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        if labels:
+            matrix[:len(labels)] = np.vstack([vectors[label] for label in labels])
+        labels_array = np.empty(capacity, dtype=object)
+        labels_array[:len(labels)] = labels
+        self._publish(matrix, labels_array, {label: i for i, label in enumerate(labels)})
+        if self.store is not None:
+            self._compact_pending = True
+        return len(ops)
+
+    def _compact_store(self):
+        """Lipat journal store ke generasi baru lalu map ulang (jangan di dalam store.locked())"""
+        if self.store is None or not self._compact_pending:
+            return
+        self._compact_pending = False
+        self.store.compact()
+        self._load_store()
+
+    # ========================
+    # Partisi roster
+    # ========================
+
+    def get_partition(self, key):
+        """Partisi ter-cache untuk key, None jika tidak ada atau kedaluwarsa"""
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is not None and time.monotonic() - partition["created"] > PARTITION_TTL_SECONDS:
+                del self._partitions[key]
+                partition = None
+            return partition
+
+    def set_partition(self, key, roster):
+        """Cache (dan return) sub-matrix label roster yang terdaftar di bawah key"""
+        roster = frozenset(roster)
+        with self._lock:
+            rows = [self._rows[label] for label in roster if label in self._rows]
+            partition = {
+                "roster": roster,
+                "matrix": np.ascontiguousarray(self._matrix[rows]),
+                "labels": self._labels[rows].copy(),
+                "created": time.monotonic(),
+            }
+            self._partitions[key] = partition
+            return partition
+
+    def invalidate_partition(self, key):
+        with self._lock:
+            self._partitions.pop(key, None)
+
+    def _drop_partitions_with(self, label):
+        for key in [k for k, p in self._partitions.items() if label in p["roster"]]:
+            del self._partitions[key]
+
+    # ========================
+    # Baca
+    # ========================
+
+    def distance(self, label, embedding):
+        """Jarak cosine embedding ke embedding label (None jika tidak ada)"""
+        query = normalize(np.asarray(embedding, dtype=np.float32).reshape(self.dim))
+        with self._lock:
+            row = self._rows.get(label)
+            if row is None:
+                return None
+            vector = self._matrix[row]
+        return max(float(1.0 - vector @ query), 0.0)
+
+    def search(self, embedding, threshold, top_k=5, partition=None):
+        """
+        Maksimal top_k (label, jarak) dengan jarak cosine < threshold, terurut dari
+        yang terbaik. Dengan partition, hanya roster itu yang di-scan.
+        """
+        query = normalize(np.asarray(embedding, dtype=np.float32).reshape(self.dim))
+        # Ambil snapshot di bawah lock; scan matrix di luar lock karena snapshot tidak pernah diubah
+        rows = None
+        with self._lock:
+            alive = self._alive if self._dead else None
+            if partition is not None:
+                matrix, labels = partition["matrix"], partition["labels"]
+                alive = None
+            elif self._ann.ready and self._size >= self.ann_min_size:
+                rows = self._ann.candidates(query)
+                matrix, labels = self._matrix, self._labels[rows]
+            else:
+                matrix, labels = self._matrix[:self._size], self._labels[:self._size]
+        if rows is not None:
+            matrix = matrix[rows]
+        size = len(labels)
+        if size == 0:
+            return []
+        distances = 1.0 - matrix @ query
+        if alive is not None:
+            # Baris mati (dihapus/ditimpa) tidak boleh ikut hasil
+            distances[~(alive[rows] if rows is not None else alive[:size])] = np.inf
+
+        k = min(top_k, size)
+        if k < size:
+            candidates = np.argpartition(distances, k - 1)[:k]
+        else:
+            candidates = np.arange(size)
+        candidates = candidates[np.argsort(distances[candidates])]
+        return [
+            (labels[i], max(float(distances[i]), 0.0))
+            for i in candidates
+            if distances[i] < threshold
+        ]
+
+    def _save_index(self):
+        if not self._index_path:
+            return
+        # Snapshot di bawah lock, tulis file di luar lock supaya search tidak tertahan
+        with self._lock:
+            if not self._index_dirty:
+                return
+            snapshot = self._ann.snapshot(self._labels[:self._size])
+            self._index_dirty = False
+        if snapshot is None:
+            return
+        try:
+            save_index(self._index_path, snapshot)
+        except Exception as e:
+            logger.error(f"Failed to save ANN index: {e}")
+
+
+embedding_store = None
+if FACE_EMBEDDING_STORE == "mmap":
+    embedding_store = EmbeddingStore(EMBEDDING_STORE_DIR, EMBEDDING_DIM, FACE_EMBEDDING_STORE_DTYPE)
+
+face_gallery = FaceGallery(
+    EMBEDDINGS_DIR,
+    ann_backend=FACE_ANN_BACKEND,
+    ann_min_size=FACE_ANN_MIN_GALLERY_SIZE,
+    index_dir=ANN_INDEX_DIR,
+    store=embedding_store
+)
+
+# Dijalankan setelah face_gallery.load() (lihat face_recognition_route.load_face_gallery)
+gallery_watcher = GalleryWatcher(
+    face_gallery,
+    EMBEDDINGS_DIR,
+    EMBEDDING_STORE_DIR if embedding_store is not None else None,
+    mode=FACE_GALLERY_WATCH,
+    poll_interval=FACE_GALLERY_POLL_SECONDS
+)
@@ -0,0 +1,158 @@
+import threading
+from collections import Counter
+import cv2
+import numpy as np
+
+# Nilai yang dianggap "cukup" untuk skor frame: variansi Laplacian crop 160x160,
+# dan sisi pendek wajah (px, resolusi penuh) = ukuran input FaceNet
+SHARPNESS_REFERENCE = 100.0
+FACE_SIDE_REFERENCE = 160
+SHARPNESS_SIZE = 160
+
+
+def sharpness(face_crop):
+    """Variansi Laplacian crop wajah (diseragamkan ke 160x160); kecil = blur"""
+    crop = cv2.resize(face_crop, (SHARPNESS_SIZE, SHARPNESS_SIZE))
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def yaw_estimate(keypoints):
+    """
+    Perkiraan yaw dari landmark detector: geser horizontal hidung terhadap titik
+    tengah kedua mata, dibagi jarak antar mata. ~0 = frontal, |yaw| >= 0.5 = menoleh jauh.
+    None jika landmark tidak tersedia (detector haar).
+    """
+    keypoints = keypoints or {}
+    left_eye, right_eye, nose = keypoints.get("left_eye"), keypoints.get("right_eye"), keypoints.get("nose")
+    if not left_eye or not right_eye or not nose:
+        return None
+    inter_ocular = float(np.hypot(right_eye[0] - left_eye[0], right_eye[1] - left_eye[1]))
+    if inter_ocular == 0:
+        return None
+    return float((nose[0] - (left_eye[0] + right_eye[0]) / 2) / inter_ocular)
+
+
+def frame_quality(face_crop, box, keypoints, scale=1):
+    """
+    Skor 0..1 untuk memilih frame terbaik dari burst/video: sharpness x ukuran wajah x
+    frontalitas. box dan keypoints di koordinat gambar deteksi, scale = faktor ke resolusi penuh.
+    """
+    sharp = sharpness(face_crop)
+    face_side = min(box[2], box[3]) * scale
+    yaw = yaw_estimate(keypoints)
+    score = min(sharp / SHARPNESS_REFERENCE, 1.0) * min(face_side / FACE_SIDE_REFERENCE, 1.0)
+    if yaw is not None:
+        score *= 1.0 - min(abs(yaw), 1.0)
+    return {
+        "score": round(score, 4),
+        "sharpness": round(sharp, 1),
+        "face_side": int(face_side),
+        "yaw": round(yaw, 3) if yaw is not None else None,
+    }
+
+
+def inter_ocular_distance(keypoints, scale=1):
+    """Jarak antar mata (px, resolusi penuh), None jika landmark tidak tersedia"""
+    keypoints = keypoints or {}
+    left_eye, right_eye = keypoints.get("left_eye"), keypoints.get("right_eye")
+    if not left_eye or not right_eye:
+        return None
+    return float(np.hypot(right_eye[0] - left_eye[0], right_eye[1] - left_eye[1])) * scale
+
+
+def exposure(face_crop):
+    """Rata-rata kecerahan (0-255) dan fraksi piksel terpotong gelap/terang dari histogram crop"""
+    crop = cv2.resize(face_crop, (SHARPNESS_SIZE, SHARPNESS_SIZE))
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    hist = np.bincount(gray.ravel(), minlength=256) / gray.size
+    return {
+        "brightness": float(hist @ np.arange(256)),
+        "dark": float(hist[:16].sum()),
+        "bright": float(hist[240:].sum()),
+    }
+
+
+class LowFaceQuality(ValueError):
+    """Wajah terdeteksi tapi kualitasnya tidak layak di-embed; message berisi saran untuk user."""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+        self.message = message
+
+
+class QualityGate:
+    """
+    Cek kualitas murah tepat setelah deteksi, sebelum forward pass FaceNet:
+    blur (variansi Laplacian), jarak antar mata minimum, exposure (histogram)
+    dan yaw dari landmark. Frame yang buruk ditolak dengan alasan yang bisa
+    ditindaklanjuti user, jadi tidak ada inference yang terbuang dan
+    failed_attempts tidak bertambah karena foto jelek.
+    Dipanggil dari thread inference, counter dijaga lock.
+    """
+
+    MESSAGES = {
+        "blur": "Foto wajah terlalu blur, tahan HP tetap diam lalu ulangi",
+        "too_small": "Wajah terlalu kecil atau jauh, dekatkan wajah ke kamera",
+        "too_dark": "Wajah terlalu gelap (backlight), hadapkan wajah ke sumber cahaya",
+        "too_bright": "Wajah terlalu terang, hindari cahaya langsung ke wajah",
+        "yaw": "Wajah menoleh, hadapkan wajah lurus ke kamera",
+    }
+
+    def __init__(self, enabled=True, min_sharpness=30.0, min_inter_ocular=24.0, max_yaw=0.45,
+                 min_brightness=40.0, max_brightness=220.0, max_clipped=0.4):
+        self.enabled = enabled
+        self.min_sharpness = min_sharpness
+        self.min_inter_ocular = min_inter_ocular
+        self.max_yaw = max_yaw
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.max_clipped = max_clipped
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._rejected = Counter()
+
+    def assess(self, face_crop, keypoints=None, scale=1):
+        """Return kode alasan penolakan, atau None jika wajah layak di-embed"""
+        distance = inter_ocular_distance(keypoints, scale)
+        if distance is not None and distance < self.min_inter_ocular:
+            return "too_small"
+        yaw = yaw_estimate(keypoints)
+        if yaw is not None and abs(yaw) > self.max_yaw:
+            return "yaw"
+        light = exposure(face_crop)
+        if light["brightness"] < self.min_brightness or light["dark"] > self.max_clipped:
+            return "too_dark"
+        if light["brightness"] > self.max_brightness or light["bright"] > self.max_clipped:
+            return "too_bright"
+        if sharpness(face_crop) < self.min_sharpness:
+            return "blur"
+        return None
+
+    def check(self, face_crop, keypoints=None, scale=1):
+        """assess() + statistik; raise LowFaceQuality jika wajah ditolak"""
+        if not self.enabled:
+            return
+        reason = self.assess(face_crop, keypoints, scale)
+        with self._lock:
+            self._checked += 1
+            if reason is not None:
+                self._rejected[reason] += 1
+        if reason is not None:
+            raise LowFaceQuality(reason, self.MESSAGES[reason])
+
+    def stats(self, embed_ms_per_face=None):
+        """embed_ms_per_face: rata-rata waktu FaceNet per wajah, untuk estimasi inference yang dihemat"""
+        with self._lock:
+            checked = self._checked
+            rejected = sum(self._rejected.values())
+            reasons = dict(self._rejected)
+        return {
+            "enabled": self.enabled,
+            "checked": checked,
+            "rejected": rejected,
+            "rejection_rate": round(rejected / checked, 4) if checked else 0.0,
+            "rejected_by_reason": reasons,
+            "inference_ms_saved": round(rejected * embed_ms_per_face, 1) if embed_ms_per_face else None,
+        }
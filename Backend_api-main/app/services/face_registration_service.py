@@ -0,0 +1,108 @@
+# app/services/face_registration_service.py
+from datetime import datetime
+import numpy as np
+from sqlalchemy.orm import Session
+from app.config import FACE_MATCH_THRESHOLD
+from app.models.face_registration_model import FaceRegistration
+from app.services.face_gallery import normalize
+
+# Minimum confidence (%) agar verifikasi dianggap berhasil; confidence = (1 - jarak) x 100,
+# jadi diturunkan dari FACE_MATCH_THRESHOLD supaya hanya ada satu aturan cocok
+CONFIDENCE_THRESHOLD = round((1 - FACE_MATCH_THRESHOLD) * 100, 2)
+
+# Registrasi dinonaktifkan otomatis setelah gagal sebanyak ini
+MAX_FAILED_ATTEMPTS = 10
+
+# Tipe data kolom face_registrations.embedding (512 x 4 atau 2 byte)
+EMBEDDING_DTYPES = ("float32", "float16")
+
+# Embedding per foto enrollment disimpan ringkas; yang dipakai matching hanya centroid-nya
+SAMPLE_DTYPE = "float16"
+
+
+def get_active_registration(db: Session, nim: str):
+    return db.query(FaceRegistration).filter(
+        FaceRegistration.nim == nim,
+        FaceRegistration.is_active == True
+    ).first()
+
+
+def record_verification(face_reg: FaceRegistration, success: bool) -> bool:
+    """
+    Update statistik verifikasi face_registrations (commit dilakukan oleh pemanggil).
+    Return success supaya bisa langsung dipakai di response.
+    """
+    if success:
+        face_reg.last_verified = datetime.now()
+        face_reg.verification_count = (face_reg.verification_count or 0) + 1
+        face_reg.failed_attempts = 0  # Reset failed attempts on success
+        return True
+
+    face_reg.failed_attempts = (face_reg.failed_attempts or 0) + 1
+
+    # Auto-disable after too many failures
+    if face_reg.failed_attempts >= MAX_FAILED_ATTEMPTS:
+        face_reg.is_active = False
+    return False
+
+
+def encode_embedding(vector, dtype="float32") -> bytes:
+    """Embedding (sudah L2-normalised) -> bytes untuk kolom face_registrations.embedding"""
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unknown embedding dtype '{dtype}', choose one of {list(EMBEDDING_DTYPES)}")
+    return np.ascontiguousarray(vector, dtype=dtype).tobytes()
+
+
+def decode_embedding(blob: bytes, dtype: str, dim: int = 512):
+    """Kebalikan encode_embedding. Return float32 array, atau None jika blob kosong/rusak"""
+    if not blob or dtype not in EMBEDDING_DTYPES:
+        return None
+    vector = np.frombuffer(blob, dtype=dtype)
+    if vector.size != dim:
+        return None
+    return vector.astype(np.float32)
+
+
+def save_embedding(face_reg: FaceRegistration, vector, dtype="float32"):
+    """
+    Simpan embedding ke baris face_registrations (commit dilakukan oleh pemanggil).
+    updated_at ikut berubah (onupdate), jadi node lain menarik embedding ini lewat watermark.
+    """
+    face_reg.embedding = encode_embedding(vector, dtype)
+    face_reg.embedding_dtype = dtype
+    return face_reg
+
+
+def save_samples(face_reg: FaceRegistration, samples=None):
+    """
+    Simpan embedding per foto enrollment (n x 512 float16) ke face_registrations
+    (commit dilakukan oleh pemanggil). samples None = registrasi satu foto, sampel lama dihapus.
+    """
+    if samples is None or len(samples) == 0:
+        face_reg.sample_embeddings = None
+        face_reg.sample_count = 0
+    else:
+        face_reg.sample_embeddings = np.ascontiguousarray(samples, dtype=SAMPLE_DTYPE).tobytes()
+        face_reg.sample_count = len(samples)
+    return face_reg
+
+
+def enrollment_centroid(embeddings, threshold):
+    """
+    Centroid (rata-rata ternormalisasi) embedding enrollment. Dengan >= 3 foto, foto yang
+    jaraknya ke centroid foto-foto lain >= threshold (orang lain, wajah salah deteksi)
+    dibuang. Dengan 2 foto outlier-nya tidak bisa ditentukan, jadi keduanya dibuang jika
+    jarak antar keduanya >= threshold. Return (centroid atau None, mask foto yang dipakai).
+    """
+    matrix = normalize(np.asarray(embeddings, dtype=np.float32))
+    keep = np.ones(len(matrix), dtype=bool)
+    if len(matrix) == 2:
+        keep[:] = 1.0 - float(matrix[0] @ matrix[1]) < threshold
+    elif len(matrix) >= 3:
+        total = matrix.sum(axis=0)
+        for i in range(len(matrix)):
+            others = normalize(total - matrix[i])
+            keep[i] = 1.0 - float(matrix[i] @ others) < threshold
+    if not keep.any():
+        return None, keep
+    return normalize(matrix[keep].mean(axis=0)), keep
@@ -0,0 +1,125 @@
+import threading
+import time
+import logging
+from datetime import timedelta
+from app.models.face_registration_model import FaceRegistration
+from app.services.face_registration_service import decode_embedding
+
+logger = logging.getLogger(__name__)
+
+# Baris dengan updated_at sedikit di bawah watermark ikut dibaca ulang: kolom timestamp
+# MySQL beresolusi detik, dan transaksi yang commit belakangan bisa membawa updated_at
+# lebih lama dari baris yang sudah terbaca. Baris yang tidak berubah dibuang oleh gallery.
+WATERMARK_OVERLAP_SECONDS = 5
+
+
+class GalleryDBSync:
+    """
+    Menjaga FaceGallery (cache di memori tiap node) sinkron dengan kolom
+    face_registrations.embedding, sumber kebenaran bersama antar node:
+
+    - tiap poll_interval detik: baris dengan updated_at >= watermark
+      (registrasi baru, embedding diganti, is_active diubah)
+    - tiap full_sync_interval detik: daftar NIM yang masih aktif, untuk
+      menangkap baris yang di-DELETE (tidak terlihat lewat updated_at)
+
+    Registrasi nonaktif atau tanpa embedding dihapus dari gallery.
+    """
+
+    def __init__(self, gallery, session_factory, poll_interval=2.0, full_sync_interval=60.0):
+        self.gallery = gallery
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.full_sync_interval = full_sync_interval
+        self.watermark = None
+        self._last_full_sync = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.synced_rows = 0
+        self.applied_changes = 0
+        self.last_sync = None
+        self.last_error = None
+
+    def start(self):
+        """Tarik semua embedding sekali (sinkron), lalu lanjutkan polling di thread daemon"""
+        if self._thread is not None:
+            return self
+        self.sync()
+        self._thread = threading.Thread(target=self._run, name="gallery-db-sync", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def sync(self):
+        """Satu putaran sinkronisasi. Return jumlah perubahan yang diterapkan ke gallery."""
+        full = self._last_full_sync is None or time.monotonic() - self._last_full_sync >= self.full_sync_interval
+        db = self.session_factory()
+        try:
+            query = db.query(
+                FaceRegistration.nim,
+                FaceRegistration.embedding,
+                FaceRegistration.embedding_dtype,
+                FaceRegistration.is_active,
+                FaceRegistration.updated_at
+            )
+            if self.watermark is not None:
+                query = query.filter(
+                    FaceRegistration.updated_at >= self.watermark - timedelta(seconds=WATERMARK_OVERLAP_SECONDS)
+                )
+            rows = query.all()
+            active = None
+            if full:
+                active = {
+                    nim for (nim,) in db.query(FaceRegistration.nim).filter(
+                        FaceRegistration.is_active == True,
+                        FaceRegistration.embedding.isnot(None)
+                    )
+                }
+        finally:
+            db.close()
+
+        vectors = {}
+        watermark = self.watermark
+        for nim, blob, dtype, is_active, updated_at in rows:
+            vector = decode_embedding(blob, dtype, self.gallery.dim) if is_active else None
+            if is_active and blob and vector is None:
+                logger.error(f"Embedding {nim} di face_registrations rusak ({dtype}, {len(blob)} byte)")
+            vectors[nim] = vector
+            if updated_at is not None and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+        if active is not None:
+            # Baris yang sudah dihapus dari tabel ikut dihapus dari gallery
+            for label in self.gallery.labels():
+                if label not in active and label not in vectors:
+                    vectors[label] = None
+
+        applied = self.gallery.apply_changes(vectors, source="face_registrations") if vectors else 0
+        self.watermark = watermark
+        if full:
+            self._last_full_sync = time.monotonic()
+        self.synced_rows += len(rows)
+        self.applied_changes += applied
+        self.last_sync = time.time()
+        return applied
+
+    def stats(self):
+        return {
+            "watermark": self.watermark.isoformat() if self.watermark is not None else None,
+            "synced_rows": self.synced_rows,
+            "applied_changes": self.applied_changes,
+            "last_sync": self.last_sync,
+            "last_error": self.last_error,
+        }
+
+    def _run(self):
+        logger.info(f"Gallery DB sync (polling {self.poll_interval}s) memantau face_registrations")
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.sync()
+                self.last_error = None
+            except Exception as e:
+                # DB sementara tidak bisa dihubungi: gallery tetap melayani snapshot terakhir
+                self.last_error = str(e)
+                logger.error(f"Gallery DB sync gagal: {e}")
@@ -0,0 +1,250 @@
+import os
+import ctypes
+import ctypes.util
+import select
+import struct
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+EVENT_HEADER = struct.Struct("iIII")
+
+# .pkl dianggap berubah setelah selesai ditulis / dipindah / dihapus (bukan saat IN_MODIFY parsial)
+PKL_EVENTS = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+STORE_EVENTS = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+class Inotify:
+    """Pembungkus ctypes minimal untuk inotify Linux (tanpa dependency tambahan)."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 gagal")
+        self.watches = {}
+
+    def add_watch(self, path, mask):
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch gagal: {path}")
+        self.watches[wd] = path
+        return wd
+
+    def read(self, timeout):
+        """Return list (path_watch, mask, name) atau [] setelah timeout detik."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "replace")
+            offset += length
+            events.append((self.watches.get(wd), mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class GalleryWatcher:
+    """
+    Menjaga FaceGallery tetap sinkron dengan file di disk tanpa full reload:
+
+    - embeddings/*.pkl yang ditulis face_register.py, restore embeddings.zip,
+      atau worker lain -> FaceGallery.sync_files(label yang berubah saja)
+    - journal/manifest embedding store yang ditulis worker lain
+      -> FaceGallery.refresh_from_store()
+
+    Memakai inotify bila ada (Linux), selain itu polling stat tiap
+    poll_interval detik. Event dikumpulkan selama debounce detik lalu
+    diterapkan sekaligus, jadi restore ribuan file hanya satu kali swap snapshot.
+    """
+
+    def __init__(self, gallery, embeddings_dir, store_dir=None, mode="auto", poll_interval=0.5, debounce=0.1):
+        self.gallery = gallery
+        self.embeddings_dir = embeddings_dir
+        self.store_dir = store_dir
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.backend = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._pkl_stats = {}
+        self._store_stats = None
+        self.synced_files = 0
+        self.store_refreshes = 0
+        self.last_sync = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        os.makedirs(self.embeddings_dir, exist_ok=True)
+        self.reconcile()
+        self._thread = threading.Thread(target=self._run, name="gallery-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def reconcile(self):
+        """
+        Sinkronisasi awal: .pkl yang ditambah/dihapus/diubah saat server mati.
+        File dianggap berubah jika lebih baru dari tulisan terakhir ke embedding store.
+        """
+        self._pkl_stats = self._scan_pkl()
+        self._store_stats = self._scan_store()
+        on_disk = set(self._pkl_stats)
+        in_gallery = set(self.gallery.labels())
+        changed = on_disk - in_gallery
+        if on_disk:
+            # Folder kosong/hilang tidak dianggap "semua dihapus"
+            changed |= in_gallery - on_disk
+        if self._store_stats:
+            last_store_write = max(mtime for mtime, _ in self._store_stats.values())
+            changed |= {label for label, (mtime, _) in self._pkl_stats.items() if mtime > last_store_write}
+        if changed:
+            self._sync(changed)
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "synced_files": self.synced_files,
+            "store_refreshes": self.store_refreshes,
+            "last_sync": self.last_sync,
+        }
+
+    # ========================
+    # Loop
+    # ========================
+
+    def _run(self):
+        if self.mode in ("auto", "inotify"):
+            try:
+                inotify = Inotify()
+                inotify.add_watch(self.embeddings_dir, PKL_EVENTS | IN_Q_OVERFLOW)
+                if self.store_dir and os.path.isdir(self.store_dir):
+                    inotify.add_watch(self.store_dir, STORE_EVENTS)
+            except (OSError, AttributeError, TypeError) as e:
+                if self.mode == "inotify":
+                    logger.error(f"Gallery watcher: inotify tidak tersedia ({e})")
+                    return
+                logger.warning(f"Gallery watcher: inotify tidak tersedia ({e}), fallback ke polling")
+            else:
+                self.backend = "inotify"
+                logger.info(f"Gallery watcher (inotify) memantau {self.embeddings_dir}")
+                return self._run_inotify(inotify)
+        self.backend = "polling"
+        logger.info(f"Gallery watcher (polling {self.poll_interval}s) memantau {self.embeddings_dir}")
+        self._run_polling()
+
+    def _run_inotify(self, inotify):
+        try:
+            while not self._stop.is_set():
+                events = inotify.read(self.poll_interval)
+                if not events:
+                    continue
+                deadline = time.monotonic() + self.debounce
+                while time.monotonic() < deadline:
+                    events += inotify.read(max(deadline - time.monotonic(), 0))
+
+                labels, store_changed, overflow = set(), False, False
+                for path, mask, name in events:
+                    if mask & IN_Q_OVERFLOW:
+                        overflow = True
+                    elif path == self.embeddings_dir and name.endswith(".pkl"):
+                        labels.add(name[:-len(".pkl")])
+                    elif path == self.store_dir:
+                        store_changed = True
+                if overflow:
+                    # Antrian event penuh: cari perubahan lewat stat seperti polling
+                    labels |= self._diff_pkl()
+                if store_changed:
+                    self._refresh_store()
+                if labels:
+                    self._sync(labels)
+        finally:
+            inotify.close()
+
+    def _run_polling(self):
+        while not self._stop.wait(self.poll_interval):
+            store_stats = self._scan_store()
+            if store_stats != self._store_stats:
+                self._store_stats = store_stats
+                self._refresh_store()
+            labels = self._diff_pkl()
+            if labels:
+                self._sync(labels)
+
+    # ========================
+    # Apply
+    # ========================
+
+    def _sync(self, labels):
+        try:
+            self.synced_files += self.gallery.sync_files(sorted(labels))
+            self.last_sync = time.time()
+        except Exception as e:
+            logger.error(f"Gallery watcher: gagal sinkron {len(labels)} file: {e}")
+
+    def _refresh_store(self):
+        try:
+            if self.gallery.refresh_from_store():
+                self.store_refreshes += 1
+                self.last_sync = time.time()
+        except Exception as e:
+            logger.error(f"Gallery watcher: gagal refresh embedding store: {e}")
+
+    def _diff_pkl(self):
+        stats = self._scan_pkl()
+        previous, self._pkl_stats = self._pkl_stats, stats
+        return {label for label in stats.keys() | previous.keys() if stats.get(label) != previous.get(label)}
+
+    def _scan_pkl(self):
+        stats = {}
+        try:
+            with os.scandir(self.embeddings_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".pkl"):
+                        st = entry.stat()
+                        stats[entry.name[:-len(".pkl")]] = (st.st_mtime, st.st_size)
+        except FileNotFoundError:
+            pass
+        return stats
+
+    def _scan_store(self):
+        if not self.store_dir:
+            return {}
+        stats = {}
+        try:
+            with os.scandir(self.store_dir) as entries:
+                for entry in entries:
+                    if entry.name == "manifest.json" or entry.name.startswith("journal-"):
+                        st = entry.stat()
+                        stats[entry.name] = (st.st_mtime, st.st_size)
+        except FileNotFoundError:
+            pass
+        return stats
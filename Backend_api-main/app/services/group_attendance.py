@@ -0,0 +1,27 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from app.services.face_gallery import normalize
+
+# Biaya pasangan di atas threshold: tidak pernah dipilih selama masih ada pasangan yang sah
+UNMATCHABLE_COST = 1e6
+
+
+def assign_faces(embeddings, roster_matrix, threshold):
+    """
+    Pasangkan wajah di satu foto dengan roster secara satu-satu (Hungarian,
+    scipy linear_sum_assignment) dari satu matrix jarak cosine wajah x roster.
+    Satu mahasiswa tidak bisa mengisi dua wajah, dan sebaliknya.
+    Return (pasangan [(index wajah, index roster, jarak)] dengan jarak < threshold,
+    matrix jarak).
+    """
+    if len(embeddings) == 0 or len(roster_matrix) == 0:
+        return [], np.zeros((len(embeddings), len(roster_matrix)), dtype=np.float32)
+    distances = np.maximum(1.0 - normalize(np.asarray(embeddings)) @ roster_matrix.T, 0.0)
+    cost = np.where(distances < threshold, distances, UNMATCHABLE_COST)
+    faces, rows = linear_sum_assignment(cost)
+    pairs = [
+        (int(face), int(row), float(distances[face, row]))
+        for face, row in zip(faces, rows)
+        if distances[face, row] < threshold
+    ]
+    return pairs, distances
@@ -0,0 +1,280 @@
+import struct
+import logging
+import tempfile
+import cv2
+import numpy as np
+from app.config import (
+    IMAGE_MAX_UPLOAD_BYTES,
+    IMAGE_MAX_PIXELS,
+    FACE_GROUP_MAX_PHOTOS,
+    FACE_BURST_MAX_FRAMES,
+    FACE_ENROLL_MAX_IMAGES
+)
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Endpoint upload gambar yang dicek Content-Length-nya oleh middleware di main.py
+IMAGE_UPLOAD_PATH_PREFIXES = ("/face/", "/gaze/")
+# Endpoint yang menerima beberapa gambar dalam satu request: jumlah gambar maksimum
+MULTI_IMAGE_PATHS = {
+    "/face/group-check-in": FACE_GROUP_MAX_PHOTOS,
+    # Burst foto (frames) juga boleh dikirim ke endpoint ini
+    "/face/recognize": FACE_BURST_MAX_FRAMES,
+    "/face/verify": FACE_BURST_MAX_FRAMES,
+    "/face/enroll": FACE_ENROLL_MAX_IMAGES,
+}
+# Ruang untuk boundary dan field form lain di body multipart
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Faktor reduksi yang didukung libjpeg saat decode (DCT scaling), dari yang terbesar
+REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+class ImageTooLarge(ValueError):
+    """Upload lebih besar dari batas byte atau piksel."""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class InvalidImage(ValueError):
+    """Data upload tidak bisa di-decode sebagai gambar."""
+
+
+def request_too_large(path, content_length):
+    """True jika request upload gambar sudah pasti melebihi batas dari header Content-Length saja"""
+    if not path.startswith(IMAGE_UPLOAD_PATH_PREFIXES) or not content_length or not content_length.isdigit():
+        return False
+    images = MULTI_IMAGE_PATHS.get(path.rstrip("/"), 1)
+    return int(content_length) > images * IMAGE_MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+
+
+async def read_upload(file, max_bytes=IMAGE_MAX_UPLOAD_BYTES):
+    """
+    Baca UploadFile per chunk dan berhenti begitu melewati max_bytes,
+    jadi upload raksasa tidak pernah disalin utuh ke memori.
+    """
+    size = getattr(file, "size", None)
+    if size is not None and size > max_bytes:
+        raise ImageTooLarge(f"Ukuran file melebihi batas {max_bytes // (1024 * 1024)}MB")
+
+    chunks = []
+    total = 0
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise ImageTooLarge(f"Ukuran file melebihi batas {max_bytes // (1024 * 1024)}MB")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+# ========================
+# Header parsing (tanpa decode piksel)
+# ========================
+
+def probe(data):
+    """
+    Baca (width, height, exif_orientation) dari header JPEG/PNG.
+    Format lain: (None, None, 1), decode tetap jalan tanpa reduksi.
+    """
+    if data[:2] == b"\xff\xd8":
+        return _probe_jpeg(data)
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        width, height = struct.unpack(">II", data[16:24])
+        return width, height, 1
+    return None, None, 1
+
+
+def _probe_jpeg(data):
+    width = height = None
+    orientation = 1
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            break
+        marker = data[i + 1]
+        if marker == 0xFF:  # padding
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        segment = data[i + 4:i + 2 + length]
+        if marker == 0xE1 and segment[:6] == b"Exif\x00\x00":
+            orientation = _exif_orientation(segment[6:])
+        elif 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC) and len(segment) >= 5:
+            # SOFn: precision(1), height(2), width(2)
+            height, width = struct.unpack(">HH", segment[1:5])
+            break
+        elif marker == 0xDA:  # start of scan tanpa SOF sebelumnya
+            break
+        i += 2 + length
+    return width, height, orientation
+
+
+def _exif_orientation(tiff):
+    try:
+        endian = "<" if tiff[:2] == b"II" else ">"
+        ifd_offset = struct.unpack(endian + "I", tiff[4:8])[0]
+        count = struct.unpack(endian + "H", tiff[ifd_offset:ifd_offset + 2])[0]
+        for n in range(count):
+            entry = ifd_offset + 2 + n * 12
+            tag = struct.unpack(endian + "H", tiff[entry:entry + 2])[0]
+            if tag == EXIF_ORIENTATION_TAG:
+                value = struct.unpack(endian + "H", tiff[entry + 8:entry + 10])[0]
+                return value if 1 <= value <= 8 else 1
+    except struct.error:
+        pass
+    return 1
+
+
+def apply_orientation(img, orientation):
+    """Putar/flip gambar sesuai tag EXIF Orientation (1-8)."""
+    if orientation == 2:
+        return cv2.flip(img, 1)
+    if orientation == 3:
+        return cv2.rotate(img, cv2.ROTATE_180)
+    if orientation == 4:
+        return cv2.flip(img, 0)
+    if orientation == 5:
+        return cv2.transpose(img)
+    if orientation == 6:
+        return cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.flip(cv2.transpose(img), -1)
+    if orientation == 8:
+        return cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return img
+
+
+# ========================
+# Decode
+# ========================
+
+def reduction_for(width, height, target_side):
+    """Faktor reduksi terbesar (8/4/2) yang sisi panjangnya masih >= target_side."""
+    if not width or not height or not target_side:
+        return 1
+    longest = max(width, height)
+    for factor, _ in REDUCED_FLAGS:
+        if longest // factor >= target_side:
+            return factor
+    return 1
+
+
+def _decode(data, factor, orientation):
+    flags = dict(REDUCED_FLAGS).get(factor, cv2.IMREAD_COLOR)
+    # Orientasi diterapkan sendiri supaya sama untuk decode penuh maupun tereduksi
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), flags | cv2.IMREAD_IGNORE_ORIENTATION)
+    if img is None:
+        raise InvalidImage("Gagal decode gambar")
+    return apply_orientation(img, orientation)
+
+
+class IngestedImage:
+    """
+    Gambar hasil decode tereduksi (untuk deteksi) plus bytes aslinya, supaya
+    crop bisa diambil ulang dari resolusi penuh kalau wajahnya kecil.
+    """
+
+    def __init__(self, data, image, scale, orientation):
+        self.data = data
+        self.image = image
+        self.scale = scale
+        self.orientation = orientation
+        self._full = image if scale == 1 else None
+
+    def full(self):
+        if self._full is None:
+            self._full = _decode(self.data, 1, self.orientation)
+        return self._full
+
+    def crop(self, box, min_side=0):
+        """
+        Crop box [x, y, w, h] (koordinat self.image). Jika sisi terpendek crop
+        di gambar kecil < min_side, crop diambil dari resolusi penuh.
+        """
+        x, y, w, h = (int(v) for v in box)
+        x, y = max(x, 0), max(y, 0)
+        if self.scale == 1 or min(w, h) >= min_side:
+            return self.image[y:y + h, x:x + w]
+        s = self.scale
+        return self.full()[y * s:(y + h) * s, x * s:(x + w) * s]
+
+
+def decode_image(data, target_side=None):
+    """
+    Decode upload dengan resolusi sekecil mungkin yang sisi panjangnya masih
+    >= target_side (IMREAD_REDUCED_COLOR_2/4/8, dipilih dari dimensi header).
+    target_side None = resolusi penuh. Raise ImageTooLarge/InvalidImage.
+    """
+    width, height, orientation = probe(data)
+    if width and height and width * height > IMAGE_MAX_PIXELS:
+        raise ImageTooLarge(f"Resolusi gambar {width}x{height} melebihi batas")
+    factor = reduction_for(width, height, target_side)
+    image = _decode(data, factor, orientation)
+    if width is None and image.shape[0] * image.shape[1] > IMAGE_MAX_PIXELS:
+        raise ImageTooLarge(f"Resolusi gambar {image.shape[1]}x{image.shape[0]} melebihi batas")
+    return IngestedImage(data, image, factor, orientation)
+
+
+def fit_side(image, target_side):
+    """Perkecil ndarray (INTER_AREA) sampai sisi panjangnya <= target_side"""
+    longest = max(image.shape[:2])
+    if not target_side or longest <= target_side:
+        return image
+    ratio = target_side / longest
+    return cv2.resize(image, (int(image.shape[1] * ratio), int(image.shape[0] * ratio)), interpolation=cv2.INTER_AREA)
+
+
+def decode_video_frames(data, max_frames, max_seconds, target_side=None):
+    """
+    Decode klip video pendek dari kamera HP (mp4/3gp/webm) jadi maksimal max_frames
+    frame BGR, tersebar merata di max_seconds pertama dan diperkecil ke sisi panjang
+    target_side. Raise InvalidImage/ImageTooLarge.
+    """
+    frames = []
+    # cv2.VideoCapture hanya bisa membaca dari path, bukan dari bytes
+    with tempfile.NamedTemporaryFile(suffix=".mp4") as tmp:
+        tmp.write(data)
+        tmp.flush()
+        capture = cv2.VideoCapture(tmp.name)
+        try:
+            if not capture.isOpened():
+                raise InvalidImage("Gagal membuka video")
+            fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+            total = int(fps * max_seconds)
+            frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            if frame_count > 0:
+                total = min(total, frame_count)
+            step = max(total // max_frames, 1)
+            for index in range(total):
+                # grab() tanpa retrieve() melewati konversi warna frame yang tidak dipakai
+                if len(frames) >= max_frames or not capture.grab():
+                    break
+                if index % step:
+                    continue
+                ok, frame = capture.retrieve()
+                if not ok:
+                    continue
+                if frame.shape[0] * frame.shape[1] > IMAGE_MAX_PIXELS:
+                    raise ImageTooLarge(f"Resolusi video {frame.shape[1]}x{frame.shape[0]} melebihi batas")
+                frames.append(fit_side(frame, target_side))
+        finally:
+            capture.release()
+    if not frames:
+        raise InvalidImage("Video tidak berisi frame yang bisa dibaca")
+    return frames
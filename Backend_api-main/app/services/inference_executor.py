@@ -0,0 +1,181 @@
+import asyncio
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFull(Exception):
+    """Antrian inference penuh; pemanggil sebaiknya mencoba lagi setelah retry_after detik"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Inference queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class InferenceExecutor:
+    """
+    Thread pool khusus inference (detector / FaceNet / MediaPipe), supaya forward
+    pass tidak memblokir event loop. Maksimal max_workers job jalan dan max_queue
+    menunggu; selebihnya langsung ditolak dengan InferenceQueueFull.
+    """
+
+    def __init__(self, name, max_workers=2, max_queue=16, retry_after=1, window=1000):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._failed = 0
+        self._wait_ms = deque(maxlen=window)
+        self._run_ms = deque(maxlen=window)
+
+    async def run(self, fn, *args, **kwargs):
+        """Jalankan fn(*args, **kwargs) di pool dan tunggu hasilnya"""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise InferenceQueueFull(self.retry_after)
+            self._in_flight += 1
+            self._submitted += 1
+        enqueued_at = time.perf_counter()
+
+        def job():
+            started_at = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                self._wait_ms.append((started_at - enqueued_at) * 1000.0)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._run_ms.append((time.perf_counter() - started_at) * 1000.0)
+
+        try:
+            future = self._executor.submit(job)
+        except Exception:
+            self._release()
+            raise
+        # Dilepas saat job benar-benar selesai (atau batal sebelum mulai), bukan saat
+        # await-nya dibatalkan: job yang masih jalan tetap dihitung di antrian
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wrap_future(future)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+
+    def _release(self, future=None):
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            wait_ms = np.array(self._wait_ms) if self._wait_ms else np.zeros(1)
+            run_ms = np.array(self._run_ms) if self._run_ms else np.zeros(1)
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queue_depth": self._in_flight - self._running,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "failed": self._failed,
+                "wait_ms_p50": round(float(np.percentile(wait_ms, 50)), 2),
+                "wait_ms_p95": round(float(np.percentile(wait_ms, 95)), 2),
+                "wait_ms_max": round(float(wait_ms.max()), 2),
+                "run_ms_p50": round(float(np.percentile(run_ms, 50)), 2),
+                "run_ms_p95": round(float(np.percentile(run_ms, 95)), 2),
+            }
+
+
+class MicroBatcher:
+    """
+    Gabungkan panggilan inference satu item yang datang bersamaan jadi satu batch:
+    item dikumpulkan sampai max_batch atau max_wait_ms sejak item pertama, lalu
+    batch_fn(items) jalan sekali di executor. batch_fn harus mengembalikan satu
+    hasil per item, sesuai urutan.
+    """
+
+    def __init__(self, batch_fn, executor, max_batch=16, max_wait_ms=5.0):
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._pending = []
+        self._timer = None
+        # Referensi task batch disimpan supaya tidak di-garbage-collect sebelum selesai
+        self._tasks = set()
+        self._batches = 0
+        self._items = 0
+        self._batch_sizes = deque(maxlen=1000)
+        self._item_ms = deque(maxlen=1000)
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000.0, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        self._batches += 1
+        self._items += len(batch)
+        self._batch_sizes.append(len(batch))
+        try:
+            results = await self.executor.run(self._timed_batch, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _timed_batch(self, items):
+        started_at = time.perf_counter()
+        results = self.batch_fn(items)
+        self._item_ms.append((time.perf_counter() - started_at) * 1000.0 / len(items))
+        return results
+
+    def item_ms_mean(self):
+        """Rata-rata waktu hitung per item (tanpa antri), None sebelum batch pertama"""
+        return float(np.mean(self._item_ms)) if self._item_ms else None
+
+    def stats(self):
+        sizes = np.array(self._batch_sizes) if self._batch_sizes else np.zeros(1)
+        item_ms = self.item_ms_mean()
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self._batches,
+            "items": self._items,
+            "batch_size_mean": round(float(sizes.mean()), 2),
+            "batch_size_max": int(sizes.max()),
+            "item_ms_mean": round(item_ms, 2) if item_ms is not None else None,
+        }
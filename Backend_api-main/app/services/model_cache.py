@@ -0,0 +1,108 @@
+import os
+import hashlib
+import logging
+import threading
+from app.config import MODEL_CACHE_DIR, MODEL_OFFLINE
+
+logger = logging.getLogger(__name__)
+
+CHECKSUM_FILE = "SHA256SUMS"
+FACENET_KEY = "20180402-114759"
+
+
+class ModelWeightsError(RuntimeError):
+    """Bobot model tidak ada di cache atau checksum-nya tidak cocok."""
+
+
+def sha256sum(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ModelCache:
+    """
+    Folder bobot model lokal dengan file SHA256SUMS (format sha256sum:
+    "<hash>  <path relatif>"). Semua model dimuat dari sini, sehingga host
+    offline cukup menyalin folder ini (dibuat oleh prepare_model_cache.py).
+    """
+
+    def __init__(self, path, offline=False):
+        self.path = path
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._verified = {}
+
+    def checksums(self):
+        sums = {}
+        sums_path = os.path.join(self.path, CHECKSUM_FILE)
+        if os.path.exists(sums_path):
+            with open(sums_path) as f:
+                for line in f:
+                    if line.strip():
+                        digest, name = line.strip().split(None, 1)
+                        sums[name.lstrip("*")] = digest
+        return sums
+
+    def write_checksums(self):
+        """Hitung ulang SHA256SUMS untuk semua file di cache. Return jumlah file."""
+        lines = []
+        for root, _, files in os.walk(self.path):
+            for file_name in sorted(files):
+                full_path = os.path.join(root, file_name)
+                name = os.path.relpath(full_path, self.path).replace(os.sep, "/")
+                if name == CHECKSUM_FILE:
+                    continue
+                lines.append(f"{sha256sum(full_path)}  {name}")
+        with open(os.path.join(self.path, CHECKSUM_FILE), "w") as f:
+            f.write("\n".join(sorted(lines, key=lambda l: l.split(None, 1)[1])) + "\n")
+        self._verified.clear()
+        return len(lines)
+
+    def verify(self, path, sha256=None):
+        """
+        Pastikan file bobot ada dan checksum-nya cocok (dari argumen sha256 atau
+        SHA256SUMS). File yang tidak tercatat di SHA256SUMS hanya dicek keberadaannya.
+        Hasil verifikasi di-cache per (path, size, mtime).
+        """
+        if not os.path.isfile(path):
+            raise ModelWeightsError(f"Bobot model tidak ditemukan: {path}")
+        if sha256 is None:
+            name = os.path.relpath(path, self.path).replace(os.sep, "/")
+            sha256 = self.checksums().get(name)
+            if sha256 is None:
+                return path
+
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime)
+        with self._lock:
+            if self._verified.get(key) == sha256:
+                return path
+        actual = sha256sum(path)
+        if actual != sha256:
+            raise ModelWeightsError(f"Checksum bobot model tidak cocok: {path} ({actual} != {sha256})")
+        with self._lock:
+            self._verified[key] = sha256
+        return path
+
+    def facenet_folder(self, key=FACENET_KEY):
+        """
+        cache_folder untuk keras_facenet.FaceNet. Bobot diverifikasi dengan sha256
+        dari metadata keras-facenet; bila belum ada, FaceNet boleh download sendiri
+        kecuali mode offline.
+        """
+        from keras_facenet.metadata import MODEL_METADATA
+
+        metadata = MODEL_METADATA[key]
+        folder = os.path.join(self.path, "keras-facenet")
+        weights_path = os.path.join(folder, metadata["dir_name"], metadata["keras_weights_filename"])
+        if os.path.isfile(weights_path) or self.offline:
+            self.verify(weights_path, metadata["keras_weights_sha256"])
+        else:
+            logger.warning(f"Bobot FaceNet belum ada di {folder}, akan didownload")
+        return folder
+
+
+model_cache = ModelCache(MODEL_CACHE_DIR, offline=MODEL_OFFLINE)
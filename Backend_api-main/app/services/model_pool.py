@@ -0,0 +1,88 @@
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+
+class ModelPoolTimeout(Exception):
+    """Tidak ada instance pool yang bebas dalam batas waktu"""
+
+
+class ModelPool:
+    """
+    Pool instance model yang tidak thread-safe (MediaPipe FaceMesh): tiap request
+    meminjam instance sendiri lewat acquire(), jadi tidak ada objek yang dipakai
+    bersamaan. Instance dibuat saat dibutuhkan sampai size; waktu tunggu dicatat untuk metrics.
+    """
+
+    def __init__(self, name, factory, size, window=1000):
+        self.name = name
+        self.factory = factory
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_ms = deque(maxlen=window)
+
+    def warm_up(self):
+        with self.acquire():
+            pass
+        return self
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """Pinjam satu instance selama blok with"""
+        started_at = time.perf_counter()
+        instance = self._take(timeout)
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_ms.append((time.perf_counter() - started_at) * 1000.0)
+        try:
+            yield instance
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._idle.put(instance)
+
+    def _take(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return self.factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise ModelPoolTimeout(f"No {self.name} instance free after {timeout}s")
+
+    def stats(self):
+        with self._lock:
+            wait_ms = np.array(self._wait_ms) if self._wait_ms else np.zeros(1)
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "wait_ms_p50": round(float(np.percentile(wait_ms, 50)), 2),
+                "wait_ms_p95": round(float(np.percentile(wait_ms, 95)), 2),
+                "wait_ms_max": round(float(wait_ms.max()), 2),
+            }
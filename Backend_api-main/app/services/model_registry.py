@@ -0,0 +1,87 @@
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+COLD = "cold"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelRegistry:
+    """
+    Model ML yang dimuat saat pertama kali dipakai (atau oleh warm_up di thread
+    background), bukan saat modul di-import. Dengan begitu proses API yang hanya
+    melayani CRUD tidak ikut membayar import TensorFlow dan load bobot.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def register(self, name, loader):
+        with self._lock:
+            self._models[name] = {
+                "loader": loader,
+                "lock": threading.Lock(),
+                "state": COLD,
+                "instance": None,
+                "error": None,
+                "load_seconds": None,
+            }
+
+    def get(self, name):
+        """Return instance model, memuatnya dulu jika belum. Exception loader diteruskan."""
+        entry = self._models[name]
+        if entry["state"] == READY:
+            return entry["instance"]
+        with entry["lock"]:
+            if entry["state"] == READY:
+                return entry["instance"]
+            entry["state"] = LOADING
+            started = time.perf_counter()
+            try:
+                entry["instance"] = entry["loader"]()
+            except Exception as e:
+                entry["state"] = FAILED
+                entry["error"] = str(e)
+                logger.error(f"Gagal memuat model {name}: {e}")
+                raise
+            entry["load_seconds"] = round(time.perf_counter() - started, 3)
+            entry["error"] = None
+            entry["state"] = READY
+            logger.info(f"Model {name} siap dalam {entry['load_seconds']}s")
+            return entry["instance"]
+
+    def warm_up(self, names=None):
+        """Muat model (default: semua) berurutan di thread daemon. Return thread-nya."""
+        names = list(names or self._models)
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    pass  # sudah di-log, status FAILED terlihat di /ready
+
+        thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def is_ready(self, names=None):
+        return all(self._models[name]["state"] == READY for name in (names or self._models))
+
+    def status(self):
+        return {
+            name: {
+                "state": entry["state"],
+                "load_seconds": entry["load_seconds"],
+                "error": entry["error"],
+            }
+            for name, entry in self._models.items()
+        }
+
+
+model_registry = ModelRegistry()
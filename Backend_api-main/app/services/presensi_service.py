@@ -0,0 +1,45 @@
+# app/services/presensi_service.py
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.models.presensi_model import Presensi
+
+
+def check_in_error(presensi: Presensi, now: datetime):
+    """
+    Validasi presensi mandiri mahasiswa (tanggal, rentang waktu_mulai - waktu_selesai,
+    belum pernah Hadir). Return pesan error, atau None jika presensi boleh diisi.
+    """
+    if presensi.tanggal != now.date():
+        return f"Presensi hanya bisa dilakukan pada tanggal {presensi.tanggal}"
+
+    current_time = now.time()
+    if presensi.waktu_mulai and current_time < presensi.waktu_mulai:
+        return f"Presensi belum dibuka. Waktu mulai: {presensi.waktu_mulai}"
+    if presensi.waktu_selesai and current_time > presensi.waktu_selesai:
+        return f"Waktu presensi sudah ditutup. Waktu selesai: {presensi.waktu_selesai}"
+
+    if presensi.status == "Hadir":
+        return "Anda sudah melakukan presensi sebelumnya"
+    return None
+
+
+def mark_hadir(presensi: Presensi, now: datetime):
+    """Set status Hadir (commit dilakukan oleh pemanggil)"""
+    presensi.status = "Hadir"
+    presensi.waktu_input = now
+    return presensi
+
+
+def get_kelas_info(db: Session, id_kelas_mk: int):
+    """Nama mata kuliah dan kelas untuk response presensi (None jika tidak ditemukan)"""
+    query = """
+        SELECT
+            mk.nama_mk,
+            k.nama_kelas
+        FROM kelas_mata_kuliah km
+        JOIN mata_kuliah mk ON km.kode_mk = mk.kode_mk
+        JOIN kelas k ON km.id_kelas = k.id_kelas
+        WHERE km.id_kelas_mk = :id_kelas_mk
+    """
+    return db.execute(text(query), {"id_kelas_mk": id_kelas_mk}).fetchone()
@@ -0,0 +1,105 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Perkiraan ukuran entry non-array (dict hasil, box, None)
+DEFAULT_ENTRY_BYTES = 256
+
+
+def content_digest(data):
+    """
+    Hash cepat isi upload (BLAKE2b 128-bit). Key cache = (digest, versi model,
+    threshold, ...), sehingga ganti model atau threshold tidak memakai hasil lama.
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def estimate_size(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes + DEFAULT_ENTRY_BYTES
+    if isinstance(value, dict):
+        return sum(estimate_size(v) for v in value.values()) + DEFAULT_ENTRY_BYTES
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value) + DEFAULT_ENTRY_BYTES
+    return DEFAULT_ENTRY_BYTES
+
+
+class ResultCache:
+    """
+    LRU cache hasil inference per isi upload (retry dari HP mengirim JPEG yang
+    sama persis). Entry dibuang setelah ttl_seconds, atau yang paling lama tidak
+    dipakai saat max_entries / max_bytes terlampaui. Hasil negatif ("wajah tidak
+    terdeteksi") juga di-cache, jadi nilai None adalah hit yang sah; gunakan
+    MISS untuk membedakan.
+    """
+
+    MISS = object()
+
+    def __init__(self, name, max_entries=2048, max_bytes=32 * 1024 * 1024, ttl_seconds=300):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expired = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return self.MISS
+            value, size, expires_at = entry
+            if time.monotonic() > expires_at:
+                self._remove(key)
+                self._expired += 1
+                self._misses += 1
+                return self.MISS
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl_seconds)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expired": self._expired,
+            }
@@ -0,0 +1,97 @@
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+PACK_DTYPE = "float16"
+
+
+def row_hash(row):
+    return hashlib.sha1(row.tobytes()).hexdigest()[:12]
+
+
+class RosterPackCache:
+    """
+    Pack embedding roster per kelas untuk matching offline di HP: matrix float16
+    (1 KB per mahasiswa) + NIM + versi, diturunkan dari partisi gallery (embedding store).
+
+    Versi pack = hash isi (NIM + baris float16 + model), bukan FaceGallery.version:
+    versi gallery berbeda di tiap worker/node, sedangkan hash isi sama di mana pun,
+    jadi bisa dipakai sebagai ETag dan sebagai titik awal delta (?since=versi lama).
+    Riwayat beberapa versi terakhir per kelas disimpan untuk menghitung delta;
+    versi yang tidak dikenal (sudah tergeser, atau dari worker lain) dijawab pack penuh.
+    """
+
+    def __init__(self, model_id, model_version, history=4):
+        self.model_id = model_id
+        self.model_version = model_version
+        self.history = history
+        self._lock = threading.Lock()
+        self._packs = {}
+        self._builds = 0
+        self._hits = 0
+
+    def get(self, key, partition):
+        """Pack untuk partisi ini; dibangun ulang hanya jika partisinya sudah diganti"""
+        with self._lock:
+            entry = self._packs.get(key)
+            if entry is not None and entry["created"] == partition["created"]:
+                self._hits += 1
+                return entry["pack"]
+
+        pack = self._build(partition)
+        with self._lock:
+            entry = self._packs.setdefault(key, {"created": None, "pack": None, "history": OrderedDict()})
+            entry["created"] = partition["created"]
+            entry["pack"] = pack
+            entry["history"][pack["version"]] = pack["row_hashes"]
+            entry["history"].move_to_end(pack["version"])
+            while len(entry["history"]) > self.history:
+                entry["history"].popitem(last=False)
+            self._builds += 1
+        return pack
+
+    def _build(self, partition):
+        # Urut NIM supaya versi (hash isi) sama di semua worker
+        order = np.argsort(partition["labels"].astype(str), kind="stable")
+        nims = [str(label) for label in partition["labels"][order]]
+        matrix = np.ascontiguousarray(partition["matrix"][order], dtype=PACK_DTYPE)
+        hashes = {nim: row_hash(matrix[i]) for i, nim in enumerate(nims)}
+
+        digest = hashlib.sha1(f"{self.model_id}@{self.model_version}/{PACK_DTYPE}".encode())
+        for nim in nims:
+            digest.update(f"{nim}:{hashes[nim]};".encode())
+        return {
+            "version": digest.hexdigest()[:16],
+            "nims": nims,
+            "matrix": matrix,
+            "row_hashes": hashes,
+        }
+
+    def delta(self, key, pack, since):
+        """
+        Baris yang berubah/baru dan NIM yang dihapus sejak versi since.
+        Return None jika versi since tidak ada di riwayat (kirim pack penuh).
+        """
+        with self._lock:
+            entry = self._packs.get(key)
+            old = entry["history"].get(since) if entry is not None else None
+        if old is None:
+            return None
+        changed = [i for i, nim in enumerate(pack["nims"]) if old.get(nim) != pack["row_hashes"][nim]]
+        current = set(pack["nims"])
+        return {
+            "nims": [pack["nims"][i] for i in changed],
+            "matrix": pack["matrix"][changed],
+            "removed": sorted(nim for nim in old if nim not in current),
+        }
+
+    def stats(self):
+        with self._lock:
+            return {"classes": len(self._packs), "builds": self._builds, "hits": self._hits}
+
+
+def encode_matrix(matrix):
+    """Matrix float16 row-major little-endian sebagai base64"""
+    return base64.b64encode(np.ascontiguousarray(matrix, dtype="<f2").tobytes()).decode("ascii")
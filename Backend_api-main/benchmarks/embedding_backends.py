@@ -0,0 +1,122 @@
+"""
+Benchmark runtime FaceNet: Keras vs ONNX Runtime vs TFLite (float32 / int8)
+===========================================================================
+Tiap backend dijalankan di proses terpisah supaya import time dan RSS tidak
+saling tercampur. Dilaporkan: waktu import+load, latency batch 1 dan batch 16,
+peak RSS, dan cosine drift embedding terhadap Keras pada crop sampel yang sama.
+
+Model onnx/tflite dibuat dulu dengan convert_facenet.py.
+
+Cara run (dari folder Backend_api-main):
+    python -m benchmarks.embedding_backends --samples /path/ke/crop_wajah
+    python -m benchmarks.embedding_backends --backends keras onnx onnx-int8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+BACKENDS = ["keras", "onnx", "onnx-int8", "tflite", "tflite-int8"]
+
+WORKER = """
+import json, resource, sys, time
+start = time.perf_counter()
+import numpy as np
+from app.services.face_embedder import create_embedder, default_model_path
+
+backend, int8, crops_path, output_path, runs = sys.argv[1], sys.argv[2] == "1", sys.argv[3], sys.argv[4], int(sys.argv[5])
+model_path = None if backend == "keras" else default_model_path(backend, int8=int8)
+embedder = create_embedder(backend, model_path=model_path)
+crops = list(np.load(crops_path))
+embedder.embeddings(crops[:1])  # warm-up
+load_s = time.perf_counter() - start
+
+latency = {}
+for batch in (1, 16):
+    samples = []
+    for i in range(runs):
+        items = [crops[(i + j) % len(crops)] for j in range(batch)]
+        t = time.perf_counter()
+        embedder.embeddings(items)
+        samples.append((time.perf_counter() - t) * 1000.0)
+    latency[batch] = float(np.percentile(samples, 50))
+
+np.save(output_path, embedder.embeddings(crops))
+print(json.dumps({
+    "load_s": round(load_s, 2),
+    "batch1_ms_p50": round(latency[1], 2),
+    "batch16_ms_p50": round(latency[16], 2),
+    "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+}))
+"""
+
+
+def load_crops(samples_dir):
+    import cv2
+    from app.services.face_embedder import FACENET_INPUT_SIZE
+
+    crops = []
+    if samples_dir:
+        for file_name in sorted(os.listdir(samples_dir)):
+            crop = cv2.imread(os.path.join(samples_dir, file_name), cv2.IMREAD_COLOR)
+            if crop is not None:
+                crops.append(cv2.resize(crop, (FACENET_INPUT_SIZE, FACENET_INPUT_SIZE)))
+    if not crops:
+        print("⚠️  Tidak ada crop sampel, memakai gambar acak (drift wajah asli bisa berbeda)")
+        rng = np.random.default_rng(0)
+        crops = list(rng.integers(0, 255, (32, FACENET_INPUT_SIZE, FACENET_INPUT_SIZE, 3), dtype=np.uint8))
+    return np.stack(crops)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", help="Folder crop wajah")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--output", help="Simpan report sebagai JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="embedding-backends-")
+    crops_path = os.path.join(workdir, "crops.npy")
+    np.save(crops_path, load_crops(args.samples))
+
+    # Keras selalu dijalankan sebagai referensi drift
+    backends = ["keras"] + [b for b in args.backends if b != "keras"]
+    report, reference = [], None
+    for name in backends:
+        backend, _, quant = name.partition("-")
+        output_path = os.path.join(workdir, f"{name}.npy")
+        result = subprocess.run(
+            [sys.executable, "-c", WORKER, backend, "1" if quant else "0", crops_path, output_path, str(args.runs)],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(f"⚠️  {name}: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'gagal'}")
+            continue
+        row = {"backend": name, **json.loads(result.stdout.strip().splitlines()[-1])}
+
+        embeddings = np.load(output_path)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        if reference is None and backend == "keras":
+            reference = embeddings
+        if reference is not None:
+            drift = 1.0 - np.sum(reference * embeddings, axis=1)
+            row["drift_mean"] = float(f"{drift.mean():.2e}")
+            row["drift_max"] = float(f"{drift.max():.2e}")
+        report.append(row)
+        print(
+            f"{name:>12}  load={row['load_s']:>6}s  b1={row['batch1_ms_p50']:>8}ms  "
+            f"b16={row['batch16_ms_p50']:>8}ms  rss={row['peak_rss_mb']:>7}MB  "
+            f"drift max={row.get('drift_max')}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
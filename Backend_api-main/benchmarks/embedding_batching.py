@@ -0,0 +1,105 @@
+"""
+Benchmark micro-batching embedding
+==================================
+Mengukur throughput vs latency p50/p99 MicroBatcher untuk beberapa batch window,
+dengan N client yang terus-menerus mengirim satu face crop (simulasi 40 mahasiswa
+presensi bersamaan).
+
+Model:
+    facenet  keras_facenet.FaceNet asli (butuh TensorFlow)
+    proxy    MLP NumPy 160x160x3 -> 512 sebagai pengganti kalau TensorFlow tidak ada;
+             sama-sama matmul-bound sehingga efek batching terhadap BLAS terlihat
+
+Cara run (dari folder Backend_api-main):
+    python -m benchmarks.embedding_batching --model proxy
+    python -m benchmarks.embedding_batching --model facenet --windows 0 2 5 10 20
+"""
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+
+from app.services.inference_executor import InferenceExecutor, MicroBatcher
+
+
+def load_model(name):
+    if name == "facenet":
+        from keras_facenet import FaceNet
+        embedder = FaceNet()
+        return lambda crops: list(embedder.embeddings(crops))
+
+    rng = np.random.default_rng(0)
+    w1 = rng.standard_normal((160 * 160 * 3, 1024)).astype(np.float32) * 0.01
+    w2 = rng.standard_normal((1024, 512)).astype(np.float32) * 0.01
+
+    def proxy(crops):
+        x = np.stack([c.reshape(-1) for c in crops]).astype(np.float32) / 255.0
+        return list(np.maximum(x @ w1, 0) @ w2)
+    return proxy
+
+
+async def run_window(model, window_ms, clients, duration, workers):
+    executor = InferenceExecutor("bench", max_workers=workers, max_queue=clients * 2)
+    crop = np.random.default_rng(1).integers(0, 255, (160, 160, 3), dtype=np.uint8)
+    if window_ms > 0:
+        batcher = MicroBatcher(model, executor, max_batch=clients, max_wait_ms=window_ms)
+        embed = batcher.submit
+    else:
+        batcher = None
+        embed = lambda item: executor.run(lambda: model([item])[0])
+
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await embed(crop)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(clients)])
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies)
+    return {
+        "window_ms": window_ms,
+        "clients": clients,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "batch_size_mean": batcher.stats()["batch_size_mean"] if batcher else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=["facenet", "proxy"], default="proxy")
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 2, 5, 10, 20],
+                        help="Batch window dalam ms (0 = tanpa batching, batch size 1)")
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--output", help="Simpan report sebagai JSON")
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    model([np.zeros((160, 160, 3), dtype=np.uint8)])  # warm-up
+
+    report = []
+    for window_ms in args.windows:
+        row = asyncio.run(run_window(model, window_ms, args.clients, args.duration, args.workers))
+        report.append(row)
+        print(
+            f"window={row['window_ms']:>5}ms  throughput={row['throughput_rps']:>7} req/s  "
+            f"p50={row['p50_ms']:>8}ms  p99={row['p99_ms']:>8}ms  batch={row['batch_size_mean']}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark backend detector wajah
+================================
+Detection rate dan latency per gambar untuk setiap backend di
+app/services/face_detector.py, pada folder sampel berlabel.
+
+Format folder sampel:
+    <dir>/labels.json   {"foto1.jpg": [[x, y, w, h], ...], "foto2.jpg": [], ...}
+    <dir>/foto1.jpg     ...
+
+Satu wajah berlabel dianggap terdeteksi bila ada box hasil deteksi dengan
+IoU >= --iou. False positive = box yang tidak cocok dengan label manapun.
+
+Cara run (dari folder Backend_api-main):
+    python -m benchmarks.face_detectors --samples ../face-recognition-test/samples
+    python -m benchmarks.face_detectors --samples samples --backends yunet haar --model-dir models/face_detector
+"""
+import argparse
+import json
+import os
+import time
+import cv2
+import numpy as np
+
+from app.config import FACE_DETECTOR_MODEL_DIR
+from app.services.face_detector import FACE_DETECTORS, create_detector
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match(truth, predicted, threshold):
+    """Greedy matching box label -> box deteksi. Return (jumlah cocok, false positive)."""
+    used = set()
+    hits = 0
+    for box in truth:
+        scores = [(iou(box, p), i) for i, p in enumerate(predicted) if i not in used]
+        if scores:
+            best, i = max(scores)
+            if best >= threshold:
+                used.add(i)
+                hits += 1
+    return hits, len(predicted) - len(used)
+
+
+def load_samples(samples_dir):
+    with open(os.path.join(samples_dir, "labels.json")) as f:
+        labels = json.load(f)
+    samples = []
+    for file_name, boxes in sorted(labels.items()):
+        image = cv2.imread(os.path.join(samples_dir, file_name), cv2.IMREAD_COLOR)
+        if image is None:
+            print(f"⚠️  Skip {file_name}: gambar tidak bisa dibaca")
+            continue
+        samples.append((file_name, image, boxes))
+    return samples
+
+
+def run_backend(backend, samples, model_dir, iou_threshold):
+    detector = create_detector(backend, model_dir=model_dir)
+    detector.detect(samples[0][1])  # warm-up (graph TensorFlow / lazy init)
+
+    latencies = []
+    faces = hits = false_positives = 0
+    for _, image, truth in samples:
+        start = time.perf_counter()
+        predicted = detector.detect(image)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        matched, extra = match(truth, [f["box"] for f in predicted], iou_threshold)
+        faces += len(truth)
+        hits += matched
+        false_positives += extra
+
+    latencies = np.array(latencies)
+    return {
+        "backend": backend,
+        "images": len(samples),
+        "faces": faces,
+        "detection_rate": round(hits / faces, 4) if faces else None,
+        "false_positives": false_positives,
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 2),
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 2),
+        "latency_ms_mean": round(float(latencies.mean()), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", required=True, help="Folder gambar + labels.json")
+    parser.add_argument("--backends", nargs="+", default=sorted(FACE_DETECTORS), choices=sorted(FACE_DETECTORS))
+    parser.add_argument("--model-dir", default=FACE_DETECTOR_MODEL_DIR)
+    parser.add_argument("--iou", type=float, default=0.5)
+    parser.add_argument("--output", help="Simpan report sebagai JSON")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    if not samples:
+        print("❌ Tidak ada sampel yang bisa dibaca")
+        return
+
+    report = []
+    for backend in args.backends:
+        try:
+            row = run_backend(backend, samples, args.model_dir, args.iou)
+        except Exception as e:
+            print(f"⚠️  {backend}: {e}")
+            continue
+        report.append(row)
+        print(
+            f"{row['backend']:>10}  detection={row['detection_rate']}  fp={row['false_positives']:>3}  "
+            f"p50={row['latency_ms_p50']:>8}ms  p95={row['latency_ms_p95']:>8}ms"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+Benchmark pipeline /face/recognize per tahap
+============================================
+Mengukur tiap tahap pipeline secara terpisah dan end to end:
+
+    decode     decode_image (decode tereduksi, FACE_DETECT_TARGET_SIDE)
+    detect     detector wajah (FACE_DETECTOR_BACKEND)
+    crop       IngestedImage.crop (ambil ulang dari resolusi penuh jika wajah kecil)
+    embed      FaceNet satu crop (FACE_EMBEDDER_BACKEND, atau "proxy")
+    match      FaceGallery.search terhadap gallery sintetis
+    serialize  json.dumps response recognize
+
+untuk resolusi VGA sampai 12 MP dan ukuran gallery 10 sampai 100k. Report berisi
+p50/p95/p99 dan throughput per tahap dalam JSON; bandingkan dua run (commit atau
+backend berbeda) dengan --compare.
+
+Gambar: tanpa --images dibuat gambar sintetis (tekstur mirip foto + wajah
+gambar); detector biasanya tidak menemukan wajah di sana, jadi crop memakai
+box tengah dan faces_found di report = 0. Untuk angka detect yang realistis,
+beri folder foto sendiri; tiap foto di-resize ke semua resolusi.
+
+Cara run (dari folder Backend_api-main):
+    python -m benchmarks.face_pipeline --output pipeline.json
+    python -m benchmarks.face_pipeline --images /path/ke/foto --detector yunet --embedder onnx
+    python -m benchmarks.face_pipeline --detector haar --embedder proxy --gallery-sizes 10 1000
+    python -m benchmarks.face_pipeline --output baru.json --compare lama.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+import cv2
+import numpy as np
+
+from app.config import (
+    FACE_ANN_BACKEND,
+    FACE_ANN_MIN_GALLERY_SIZE,
+    FACE_DETECTOR_BACKEND,
+    FACE_DETECTOR_MODEL_DIR,
+    FACE_DETECT_TARGET_SIDE,
+    FACE_EMBEDDER_BACKEND,
+    FACE_MATCH_THRESHOLD
+)
+from app.services.face_detector import FACE_DETECTORS, create_detector
+from app.services.face_embedder import FACE_EMBEDDERS, FACENET_INPUT_SIZE, create_embedder, preprocess
+from app.services.face_gallery import FaceGallery
+from app.services.image_ingest import decode_image
+from benchmarks.ann_recall import synthetic_gallery, synthetic_probes
+
+RESOLUTIONS = {
+    "vga": (640, 480),
+    "hd": (1280, 720),
+    "fhd": (1920, 1080),
+    "8mp": (3264, 2448),
+    "12mp": (4000, 3000),
+}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+IMAGE_STAGES = ("decode", "detect", "crop", "embed")
+GALLERY_STAGES = ("match", "serialize")
+
+
+class ProxyEmbedder:
+    """
+    MLP NumPy 160x160x3 -> 512 pengganti FaceNet (sama dengan proxy di
+    embedding_batching.py), untuk mesin tanpa TensorFlow / model hasil konversi.
+    """
+
+    name = "proxy"
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        size = FACENET_INPUT_SIZE * FACENET_INPUT_SIZE * 3
+        self._w1 = rng.standard_normal((size, 1024)).astype(np.float32) * 0.01
+        self._w2 = rng.standard_normal((1024, 512)).astype(np.float32) * 0.01
+
+    def embeddings(self, face_crops):
+        x = preprocess(face_crops).reshape(len(face_crops), -1)
+        return np.maximum(x @ self._w1, 0) @ self._w2
+
+
+def synthetic_photo(width, height, seed=0):
+    """Tekstur halus + noise sensor (entropi JPEG mirip foto HP) dengan satu wajah gambar di tengah"""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(40, 220, (max(height // 64, 2), max(width // 64, 2), 3), dtype=np.uint8)
+    img = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+    img = cv2.add(img, rng.integers(0, 12, img.shape, dtype=np.uint8))
+
+    cx, cy, r = width // 2, height // 2, min(width, height) // 6
+    cv2.ellipse(img, (cx, cy), (int(r * 0.8), r), 0, 0, 360, (140, 170, 210), -1)
+    for dx in (-r // 3, r // 3):
+        cv2.circle(img, (cx + dx, cy - r // 4), max(r // 10, 2), (40, 30, 30), -1)
+    cv2.ellipse(img, (cx, cy + r // 3), (r // 3, r // 8), 0, 0, 180, (60, 60, 150), max(r // 30, 1))
+    return img
+
+
+def load_images(folder):
+    images = []
+    for file_name in sorted(os.listdir(folder)):
+        if file_name.lower().endswith(IMAGE_EXTENSIONS):
+            img = cv2.imread(os.path.join(folder, file_name), cv2.IMREAD_COLOR)
+            if img is not None:
+                images.append(img)
+    return images
+
+
+def fit(img, width, height):
+    """Resize + crop tengah ke width x height tanpa mengubah aspek"""
+    h, w = img.shape[:2]
+    scale = max(width / w, height / h)
+    resized = cv2.resize(img, (max(int(round(w * scale)), width), max(int(round(h * scale)), height)))
+    y = (resized.shape[0] - height) // 2
+    x = (resized.shape[1] - width) // 2
+    return resized[y:y + height, x:x + width]
+
+
+def encode_jpeg(img, quality=90):
+    ok, buffer = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("Gagal encode JPEG")
+    return buffer.tobytes()
+
+
+def summarize(samples_ms):
+    samples = np.asarray(samples_ms)
+    mean = float(samples.mean())
+    return {
+        "runs": len(samples),
+        "mean_ms": round(mean, 3),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "throughput_per_s": round(1000.0 / mean, 1) if mean > 0 else None,
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000.0
+
+
+class Pipeline:
+    def __init__(self, detector, embedder, target_side):
+        self.detector = detector
+        self.embedder = embedder
+        self.target_side = target_side
+
+    def decode(self, data):
+        return decode_image(data, self.target_side)
+
+    def detect(self, image):
+        faces = self.detector.detect(image.image)
+        if faces:
+            return faces[0]["box"], True
+        # Tidak ada wajah (gambar sintetis): box tengah supaya crop/embed tetap terukur
+        h, w = image.image.shape[:2]
+        side = min(h, w) // 3
+        return [(w - side) // 2, (h - side) // 2, side, side], False
+
+    def crop(self, image, box):
+        return image.crop(box, min_side=FACENET_INPUT_SIZE)
+
+    def embed(self, crop):
+        return np.asarray(self.embedder.embeddings([crop])[0], dtype=np.float32)
+
+    @staticmethod
+    def match(gallery, embedding):
+        return gallery.search(embedding, FACE_MATCH_THRESHOLD)
+
+    @staticmethod
+    def serialize(matches):
+        # Sama dengan response /face/recognize; JSONResponse FastAPI memakai json.dumps
+        results = [
+            {"username": str(username), "distance": distance, "confidence": 1 - distance}
+            for username, distance in matches
+        ]
+        response = {"status": "success", "recognized": results or None}
+        return json.dumps(response, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def image_stages(self, data):
+        """decode -> detect -> crop -> embed, return (embedding, found, {stage: ms})"""
+        times = {}
+        image, times["decode"] = timed(self.decode, data)
+        (box, found), times["detect"] = timed(self.detect, image)
+        crop, times["crop"] = timed(self.crop, image, box)
+        embedding, times["embed"] = timed(self.embed, crop)
+        return embedding, found, times
+
+
+def build_gallery(size, ann_backend, ann_min_size):
+    centers = synthetic_gallery(size)
+    gallery = FaceGallery(None, ann_backend=ann_backend, ann_min_size=ann_min_size)
+    gallery.load_matrix([f"S{i:06d}" for i in range(size)], centers)
+    _, probes = synthetic_probes(centers, 64)
+    return gallery, probes
+
+
+def run(pipeline, photos, resolutions, gallery_sizes, iterations, warmup, ann_backend, ann_min_size):
+    report = {"image_stages": [], "gallery_stages": [], "end_to_end": []}
+
+    inputs = {}
+    for name in resolutions:
+        width, height = RESOLUTIONS[name]
+        inputs[name] = [encode_jpeg(fit(photo, width, height)) for photo in photos]
+
+    # Tahap yang bergantung pada resolusi gambar
+    for name in resolutions:
+        samples = {stage: [] for stage in IMAGE_STAGES}
+        found = 0
+        for i in range(warmup + iterations):
+            data = inputs[name][i % len(inputs[name])]
+            _, face_found, times = pipeline.image_stages(data)
+            if i < warmup:
+                continue
+            found += face_found
+            for stage in IMAGE_STAGES:
+                samples[stage].append(times[stage])
+        width, height = RESOLUTIONS[name]
+        row = {
+            "resolution": name,
+            "width": width,
+            "height": height,
+            "jpeg_bytes": int(np.mean([len(d) for d in inputs[name]])),
+            "faces_found": found,
+            **{stage: summarize(samples[stage]) for stage in IMAGE_STAGES},
+        }
+        report["image_stages"].append(row)
+        print(
+            f"{name:>5} {width}x{height}  "
+            + "  ".join(f"{stage}={row[stage]['p50_ms']}ms" for stage in IMAGE_STAGES)
+            + f"  wajah={found}/{iterations}"
+        )
+
+    # Tahap yang bergantung pada ukuran gallery, lalu end to end per pasangan
+    for size in gallery_sizes:
+        gallery, probes = build_gallery(size, ann_backend, ann_min_size)
+        samples = {stage: [] for stage in GALLERY_STAGES}
+        for i in range(warmup + iterations):
+            matches, match_ms = timed(pipeline.match, gallery, probes[i % len(probes)])
+            _, serialize_ms = timed(pipeline.serialize, matches)
+            if i >= warmup:
+                samples["match"].append(match_ms)
+                samples["serialize"].append(serialize_ms)
+        row = {
+            "gallery_size": size,
+            "ann_backend": ann_backend if size >= ann_min_size else "exact",
+            **{stage: summarize(samples[stage]) for stage in GALLERY_STAGES},
+        }
+        report["gallery_stages"].append(row)
+        print(
+            f"gallery={size:>6} ({row['ann_backend']})  "
+            + "  ".join(f"{stage}={row[stage]['p50_ms']}ms" for stage in GALLERY_STAGES)
+        )
+
+        for name in resolutions:
+            totals = []
+            for i in range(warmup + iterations):
+                start = time.perf_counter()
+                embedding, _, _ = pipeline.image_stages(inputs[name][i % len(inputs[name])])
+                pipeline.serialize(pipeline.match(gallery, embedding))
+                if i >= warmup:
+                    totals.append((time.perf_counter() - start) * 1000.0)
+            report["end_to_end"].append({"resolution": name, "gallery_size": size, **summarize(totals)})
+    return report
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def flatten(report):
+    """{(tahap, kunci): statistik} untuk membandingkan dua report"""
+    rows = {}
+    for row in report["image_stages"]:
+        for stage in IMAGE_STAGES:
+            rows[(stage, row["resolution"])] = row[stage]
+    for row in report["gallery_stages"]:
+        for stage in GALLERY_STAGES:
+            rows[(stage, f"gallery={row['gallery_size']}")] = row[stage]
+    for row in report["end_to_end"]:
+        rows[("end_to_end", f"{row['resolution']}/gallery={row['gallery_size']}")] = row
+    return rows
+
+
+def compare(baseline, report):
+    print(f"\nDibanding {baseline['meta'].get('commit')} ({baseline['meta'].get('detector')}/{baseline['meta'].get('embedder')}):")
+    old_rows = flatten(baseline)
+    for key, new in flatten(report).items():
+        old = old_rows.get(key)
+        if old is None:
+            continue
+        change = (new["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 if old["p50_ms"] else 0.0
+        print(f"{key[0]:>10} {key[1]:<20} p50 {old['p50_ms']:>10}ms -> {new['p50_ms']:>10}ms  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Folder foto (default: gambar sintetis)")
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument("--gallery-sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--detector", default=FACE_DETECTOR_BACKEND, choices=sorted(FACE_DETECTORS))
+    parser.add_argument("--model-dir", default=FACE_DETECTOR_MODEL_DIR)
+    parser.add_argument("--embedder", default=FACE_EMBEDDER_BACKEND, choices=sorted(FACE_EMBEDDERS) + ["proxy"])
+    parser.add_argument("--embedder-model", help="Path model onnx/tflite (default: model_cache/facenet)")
+    parser.add_argument("--ann", default=FACE_ANN_BACKEND, choices=["exact", "ivf"])
+    parser.add_argument("--ann-min-size", type=int, default=FACE_ANN_MIN_GALLERY_SIZE)
+    parser.add_argument("--target-side", type=int, default=FACE_DETECT_TARGET_SIDE)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output", help="Simpan report sebagai JSON")
+    parser.add_argument("--compare", help="Report JSON run sebelumnya")
+    args = parser.parse_args()
+
+    if args.images:
+        photos = load_images(args.images)
+        if not photos:
+            print("❌ Tidak ada gambar di folder")
+            return
+    else:
+        photos = [synthetic_photo(1600, 1200, seed) for seed in range(4)]
+
+    detector = create_detector(args.detector, model_dir=args.model_dir)
+    if args.embedder == "proxy":
+        embedder = ProxyEmbedder()
+    else:
+        embedder = create_embedder(args.embedder, model_path=args.embedder_model)
+    pipeline = Pipeline(detector, embedder, args.target_side)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "detector": args.detector,
+            "embedder": args.embedder,
+            "ann_backend": args.ann,
+            "ann_min_size": args.ann_min_size,
+            "target_side": args.target_side,
+            "images": args.images or "synthetic",
+            "iterations": args.iterations,
+            "cpu_count": os.cpu_count(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+        },
+        **run(
+            pipeline, photos, args.resolutions, args.gallery_sizes,
+            args.iterations, args.warmup, args.ann, args.ann_min_size
+        ),
+    }
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark decode + deteksi wajah
+================================
+Membandingkan decode resolusi penuh (cv2.imdecode IMREAD_COLOR, perilaku lama)
+dengan decode tereduksi dari app/services/image_ingest.py, masing-masing diikuti
+deteksi wajah, pada folder foto upload HP (JPEG 12 MP dsb).
+
+Cara run (dari folder Backend_api-main):
+    python -m benchmarks.image_ingest --images /path/ke/foto --backend mtcnn
+    python -m benchmarks.image_ingest --images /path/ke/foto --target-sides 480 640 960
+"""
+import argparse
+import json
+import os
+import time
+import cv2
+import numpy as np
+
+from app.config import FACE_DETECTOR_MODEL_DIR, FACE_DETECT_TARGET_SIDE
+from app.services.face_detector import FACE_DETECTORS, create_detector
+from app.services.image_ingest import decode_image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def measure(images, detector, target_side):
+    decode_ms, detect_ms, found = [], [], 0
+    for data in images:
+        start = time.perf_counter()
+        if target_side is None:
+            img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        else:
+            img = decode_image(data, target_side).image
+        decoded = time.perf_counter()
+        faces = detector.detect(img)
+        detect_ms.append((time.perf_counter() - decoded) * 1000.0)
+        decode_ms.append((decoded - start) * 1000.0)
+        found += bool(faces)
+    return {
+        "target_side": target_side or "full",
+        "images": len(images),
+        "faces_found": found,
+        "decode_ms_p50": round(float(np.percentile(decode_ms, 50)), 2),
+        "detect_ms_p50": round(float(np.percentile(detect_ms, 50)), 2),
+        "total_ms_p50": round(float(np.percentile(np.add(decode_ms, detect_ms), 50)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Folder foto")
+    parser.add_argument("--backend", default="mtcnn", choices=sorted(FACE_DETECTORS))
+    parser.add_argument("--model-dir", default=FACE_DETECTOR_MODEL_DIR)
+    parser.add_argument("--target-sides", type=int, nargs="+", default=[FACE_DETECT_TARGET_SIDE])
+    parser.add_argument("--output", help="Simpan report sebagai JSON")
+    args = parser.parse_args()
+
+    images = []
+    for file_name in sorted(os.listdir(args.images)):
+        if file_name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(os.path.join(args.images, file_name), "rb") as f:
+                images.append(f.read())
+    if not images:
+        print("❌ Tidak ada gambar di folder")
+        return
+
+    detector = create_detector(args.backend, model_dir=args.model_dir)
+    detector.detect(np.zeros((64, 64, 3), dtype=np.uint8))  # warm-up
+
+    report = [measure(images, detector, None)]
+    report += [measure(images, detector, side) for side in args.target_sides]
+    for row in report:
+        print(
+            f"target={str(row['target_side']):>5}  decode p50={row['decode_ms_p50']:>8}ms  "
+            f"detect p50={row['detect_ms_p50']:>8}ms  total p50={row['total_ms_p50']:>8}ms  "
+            f"wajah={row['faces_found']}/{row['images']}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
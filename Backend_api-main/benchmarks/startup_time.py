@@ -0,0 +1,57 @@
+"""
+Benchmark waktu startup API
+===========================
+Mengukur waktu dari start proses Python sampai GET / dijawab, di proses baru
+(cold start, cache import OS tetap hangat). Jalankan di commit lama dan baru
+untuk membandingkan efek lazy loading model.
+
+Cara run (dari folder Backend_api-main):
+    python -m benchmarks.startup_time --runs 5
+    MODEL_WARMUP=lazy python -m benchmarks.startup_time
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+import numpy as np
+
+PROBE = """
+import time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+import main
+with TestClient(main.app) as client:
+    assert client.get("/").status_code == 200
+    print(round(time.perf_counter() - start, 3))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Simpan report sebagai JSON")
+    args = parser.parse_args()
+
+    samples = []
+    for _ in range(args.runs):
+        result = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True)
+        if result.returncode != 0:
+            print(result.stderr)
+            sys.exit(1)
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+        print(f"startup sampai GET / = {samples[-1]}s")
+
+    report = {
+        "runs": args.runs,
+        "startup_s_p50": round(float(np.percentile(samples, 50)), 3),
+        "startup_s_max": round(max(samples), 3),
+    }
+    print(f"p50 = {report['startup_s_p50']}s, max = {report['startup_s_max']}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
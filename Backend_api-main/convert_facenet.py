@@ -0,0 +1,117 @@
+"""
+Konversi FaceNet (keras-facenet) ke ONNX / TFLite untuk runtime CPU
+Output ke MODEL_CACHE_DIR/facenet/ lalu SHA256SUMS cache model diperbarui.
+Setelah konversi, embedding dibandingkan dengan Keras (cosine drift) pada
+crop wajah sampel; gagal jika drift melebihi --max-drift.
+
+Cara run (butuh tensorflow + tf2onnx / onnxruntime, cukup di mesin build):
+    python convert_facenet.py --format onnx
+    python convert_facenet.py --format onnx --int8
+    python convert_facenet.py --format tflite --int8 --samples /path/ke/crop_wajah
+Lalu di server: FACE_EMBEDDER_BACKEND=onnx (dan FACE_EMBEDDER_INT8=1 untuk int8)
+"""
+import argparse
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from app.services.face_embedder import (
+    FACENET_INPUT_SIZE,
+    KerasFaceNetEmbedder,
+    create_embedder,
+    default_model_path
+)
+from app.services.model_cache import model_cache
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def load_samples(samples_dir, count=32):
+    """Crop wajah sampel (BGR, seperti output detector). Tanpa folder: noise acak (cek kasar saja)."""
+    if samples_dir:
+        crops = []
+        for file_name in sorted(os.listdir(samples_dir)):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                crop = cv2.imread(os.path.join(samples_dir, file_name), cv2.IMREAD_COLOR)
+                if crop is not None:
+                    crops.append(crop)
+        return crops
+    print("⚠️  --samples tidak diberikan, memakai gambar acak (drift wajah asli bisa berbeda)")
+    rng = np.random.default_rng(0)
+    return list(rng.integers(0, 255, (count, FACENET_INPUT_SIZE, FACENET_INPUT_SIZE, 3), dtype=np.uint8))
+
+
+def cosine_drift(reference, candidate):
+    """1 - cosine similarity per baris antara embedding Keras dan hasil konversi"""
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    return 1.0 - np.sum(reference * candidate, axis=1)
+
+
+def convert_onnx(keras_model, output_path, int8):
+    import tensorflow as tf
+    import tf2onnx
+
+    float_path = default_model_path("onnx")
+    spec = (tf.TensorSpec((None, FACENET_INPUT_SIZE, FACENET_INPUT_SIZE, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(keras_model, input_signature=spec, opset=13, output_path=float_path)
+    if int8:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        # Kuantisasi dinamis: bobot int8, aktivasi dikuantisasi saat runtime (tanpa data kalibrasi)
+        quantize_dynamic(float_path, output_path, weight_type=QuantType.QInt8)
+
+
+def convert_tflite(keras_model, output_path, int8):
+    import tensorflow as tf
+
+    @tf.function(input_signature=[tf.TensorSpec((None, FACENET_INPUT_SIZE, FACENET_INPUT_SIZE, 3), tf.float32)])
+    def serve(x):
+        return keras_model(x, training=False)
+
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([serve.get_concrete_function()], keras_model)
+    if int8:
+        # Dynamic range quantization: bobot int8, aktivasi float
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Konversi FaceNet ke ONNX / TFLite")
+    parser.add_argument("--format", choices=["onnx", "tflite"], required=True)
+    parser.add_argument("--int8", action="store_true", help="Kuantisasi dinamis int8")
+    parser.add_argument("--samples", help="Folder crop wajah untuk cek equivalence")
+    parser.add_argument("--max-drift", type=float, default=0.01,
+                        help="Batas cosine drift maksimum terhadap Keras (threshold match = 0.4)")
+    args = parser.parse_args()
+
+    output_path = default_model_path(args.format, int8=args.int8)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    print("🔗 Load FaceNet Keras...")
+    keras_embedder = KerasFaceNetEmbedder()
+    print(f"📦 Konversi ke {args.format}{' int8' if args.int8 else ''} -> {output_path}")
+    if args.format == "onnx":
+        convert_onnx(keras_embedder._model, output_path, args.int8)
+    else:
+        convert_tflite(keras_embedder._model, output_path, args.int8)
+    model_cache.write_checksums()
+
+    crops = load_samples(args.samples)
+    converted = create_embedder(args.format, model_path=output_path)
+    drift = cosine_drift(keras_embedder.embeddings(crops), converted.embeddings(crops))
+    print(
+        f"\n📏 Cosine drift vs Keras ({len(crops)} sampel): "
+        f"mean {drift.mean():.2e}, p99 {np.percentile(drift, 99):.2e}, max {drift.max():.2e}"
+    )
+    if drift.max() > args.max_drift:
+        print(f"❌ Drift melebihi batas {args.max_drift}")
+        return False
+    print(f"✅ Model {output_path} siap dipakai")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
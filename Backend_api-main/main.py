@@ -63,8 +63,17 @@
 
 # app.include_router(auth_route.router)
 
+import time
+
+# Diukur dari awal import main.py (termasuk import semua router); load model ML
+# tidak ikut karena jalan di background atau saat request pertama
+started_at = time.perf_counter()
+
+import logging
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from app.routes import (
     auth_route, 
@@ -88,10 +97,42 @@ from app.routes import (
     notification_route
 )
 
-# Import models (no relationships needed)
-from app.models import mata_kuliah_model, kelas_model, mahasiswa_model, dosen_model, presensi_model, kelas_mata_kuliah_model, face_registration_model, informasi_model, jadwal_kuliah_model, skor_materi_model, user_device_model
+from app.config import MODEL_WARMUP
+from app.services.image_ingest import request_too_large
+from app.services.model_registry import model_registry
 
-app = FastAPI(title="E-Learning API", version="1.0.0")
+# Import models (no relationships needed)
+from app.models import mata_kuliah_model, kelas_model, mahasiswa_model, dosen_model, presensi_model, kelas_mata_kuliah_model, face_registration_model, face_enrollment_job_model, informasi_model, jadwal_kuliah_model, skor_materi_model, user_device_model
+
+logger = logging.getLogger(__name__)
+startup_seconds = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global startup_seconds
+    if MODEL_WARMUP == "background":
+        model_registry.warm_up()
+    # Job enrollment wajah yang task-nya hilang karena restart tidak akan selesai
+    try:
+        stale_jobs = face_recognition_route.fail_stale_enrollment_jobs()
+        if stale_jobs:
+            logger.info(f"{stale_jobs} job enrollment wajah yang terhenti ditandai failed")
+    except Exception as e:
+        logger.error(f"Gagal menandai job enrollment yang terhenti: {e}")
+    startup_seconds = round(time.perf_counter() - started_at, 3)
+    logger.info(f"API siap menerima request dalam {startup_seconds}s (model warm-up: {MODEL_WARMUP})")
+    yield
+
+
+app = FastAPI(title="E-Learning API", version="1.0.0", lifespan=lifespan)
+
+# 🚫 Tolak upload gambar kebesaran dari Content-Length, sebelum body multipart dibaca
+@app.middleware("http")
+async def limit_image_upload_size(request: Request, call_next):
+    if request_too_large(request.url.path, request.headers.get("content-length")):
+        return JSONResponse(status_code=413, content={"detail": "Ukuran file melebihi batas"})
+    return await call_next(request)
 
 # 🚀 Tambahkan middleware CORS
 app.add_middleware(
@@ -151,7 +192,25 @@ def read_root():
             "face_registration": "/face-registration",
             "face_recognition": "/face",
             "gaze_detection": "/gaze",
+            "ready": "/ready",
             "informasi": "/api/informasi",
             "skor_materi": "/skor-materi"
         }
-    }
\ No newline at end of file
+    }
+
+@app.get("/ready")
+def readiness():
+    """
+    Status warm-up tiap model ML (cold/loading/ready/failed).
+    503 sampai semua model siap, kecuali MODEL_WARMUP=lazy (model dimuat saat request pertama).
+    """
+    ready = MODEL_WARMUP == "lazy" or model_registry.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "warmup": MODEL_WARMUP,
+            "startup_seconds": startup_seconds,
+            "models": model_registry.status()
+        }
+    )
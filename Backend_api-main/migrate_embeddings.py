@@ -0,0 +1,106 @@
+"""
+Konversi embedding .pkl ke embedding store (memory-mapped)
+Satu file matrix float32/float16 + tabel NIM + journal, lihat app/services/embedding_store.py
+
+Atau (--target db) salin ke kolom face_registrations.embedding untuk FACE_EMBEDDING_SOURCE=db;
+hanya NIM yang sudah punya baris face_registrations yang diisi.
+
+Cara run:
+    python migrate_embeddings.py
+    python migrate_embeddings.py --dtype float16
+    python migrate_embeddings.py --target db --dtype float16
+"""
+import argparse
+import os
+import pickle
+import sys
+
+import numpy as np
+
+from app.services.embedding_store import EmbeddingStore
+from app.services.face_gallery import EMBEDDINGS_DIR, EMBEDDING_STORE_DIR, EMBEDDING_DIM, normalize
+
+
+def read_pkl_files(embeddings_dir):
+    labels, vectors = [], []
+    for file_name in sorted(os.listdir(embeddings_dir)):
+        if not file_name.endswith(".pkl"):
+            continue
+        try:
+            with open(os.path.join(embeddings_dir, file_name), "rb") as f:
+                vectors.append(np.asarray(pickle.load(f), dtype=np.float32).reshape(EMBEDDING_DIM))
+            labels.append(file_name[:-len(".pkl")])
+            print(f"   ✓ {file_name}")
+        except Exception as e:
+            print(f"   ❌ {file_name}: {e}")
+    return labels, vectors
+
+
+def migrate(embeddings_dir, store_dir, dtype):
+    """Baca semua .pkl dan tulis sebagai satu generasi baru di store"""
+    labels, vectors = read_pkl_files(embeddings_dir)
+
+    matrix = normalize(np.vstack(vectors)) if vectors else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    store = EmbeddingStore(store_dir, EMBEDDING_DIM, dtype)
+    store.create(labels, matrix)
+
+    # Verifikasi: isi store harus sama dengan .pkl
+    stored_labels, stored_matrix = store.snapshot()
+    if stored_labels != labels:
+        print("\n❌ Label di store tidak sama dengan file .pkl")
+        return False
+    max_error = float(np.abs(stored_matrix - matrix).max()) if labels else 0.0
+    print(f"\n✅ {len(labels)} embedding dimigrasi ke {store_dir} ({dtype}, max error {max_error:.2e})")
+    return True
+
+
+def migrate_to_db(embeddings_dir, dtype):
+    """Isi face_registrations.embedding dari .pkl dengan nama file = embedding_filename"""
+    from app.core.database import SessionLocal
+    from app.models.face_registration_model import FaceRegistration
+    from app.services.face_registration_service import save_embedding, decode_embedding
+
+    labels, vectors = read_pkl_files(embeddings_dir)
+    by_file = {f"{label}.pkl": vector for label, vector in zip(labels, vectors)}
+
+    db = SessionLocal()
+    try:
+        updated, missing = 0, []
+        for face_reg in db.query(FaceRegistration).all():
+            vector = by_file.get(face_reg.embedding_filename)
+            if vector is None:
+                missing.append(face_reg.nim)
+                continue
+            vector = normalize(vector)
+            save_embedding(face_reg, vector, dtype)
+            # Verifikasi: hasil decode harus sama dengan .pkl
+            stored = decode_embedding(face_reg.embedding, dtype, EMBEDDING_DIM)
+            if stored is None or float(np.abs(stored - vector).max()) > 1e-2:
+                print(f"\n❌ Embedding {face_reg.nim} tidak sama setelah encode")
+                db.rollback()
+                return False
+            updated += 1
+        db.commit()
+    finally:
+        db.close()
+
+    for nim in missing:
+        print(f"   ⚠️  {nim}: file .pkl tidak ditemukan, embedding tidak diisi")
+    print(f"\n✅ {updated} embedding disalin ke face_registrations ({dtype})")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Konversi embedding .pkl ke embedding store")
+    parser.add_argument("--embeddings-dir", default=EMBEDDINGS_DIR)
+    parser.add_argument("--store-dir", default=EMBEDDING_STORE_DIR)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--target", choices=["store", "db"], default="store")
+    args = parser.parse_args()
+
+    print(f"🚀 Migrasi embedding dari {args.embeddings_dir}...\n")
+    if args.target == "db":
+        success = migrate_to_db(args.embeddings_dir, args.dtype)
+    else:
+        success = migrate(args.embeddings_dir, args.store_dir, args.dtype)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,11 @@
+-- ====================================================================
+-- Simpan embedding wajah langsung di tabel face_registrations
+-- Dipakai FACE_EMBEDDING_SOURCE=db: tiap node menarik baris baru/berubah
+-- lewat watermark updated_at (lihat app/services/gallery_db_sync.py)
+-- Isi kolom embedding dari file .pkl: python migrate_embeddings.py --target db
+-- ====================================================================
+
+ALTER TABLE `face_registrations`
+  ADD COLUMN `embedding` blob NULL COMMENT 'L2-normalised FaceNet embedding, 512 x embedding_dtype' AFTER `embedding_filename`,
+  ADD COLUMN `embedding_dtype` varchar(10) NULL COMMENT 'float32 or float16' AFTER `embedding`,
+  ADD INDEX `idx_face_registrations_updated_at` (`updated_at`);
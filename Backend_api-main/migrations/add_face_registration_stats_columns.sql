@@ -0,0 +1,11 @@
+-- ====================================================================
+-- Tambah kolom statistik verifikasi pada tabel face_registrations
+-- Dipakai oleh /face-registration/verify dan /face/verify
+-- Skip jika database sudah dari dump "e-learn sekarang.sql" (kolom sudah ada)
+-- ====================================================================
+
+ALTER TABLE `face_registrations`
+  ADD COLUMN `last_verified` timestamp NULL DEFAULT NULL COMMENT 'Last successful face verification' AFTER `registration_date`,
+  ADD COLUMN `verification_count` int DEFAULT '0' COMMENT 'Total number of successful verifications' AFTER `last_verified`,
+  ADD COLUMN `failed_attempts` int DEFAULT '0' COMMENT 'Number of failed verification attempts' AFTER `verification_count`,
+  ADD COLUMN `is_active` tinyint(1) DEFAULT '1' COMMENT 'Can be set to false to disable face login' AFTER `failed_attempts`;
@@ -0,0 +1,27 @@
+-- ====================================================================
+-- Enrollment wajah multi-foto asinkron (POST /face/enroll)
+-- face_enrollment_jobs: status job, dibaca endpoint polling dari worker mana pun
+-- face_registrations.sample_embeddings: embedding per foto (float16),
+-- kolom embedding berisi centroid-nya
+-- ====================================================================
+
+CREATE TABLE IF NOT EXISTS `face_enrollment_jobs` (
+  `id_job` varchar(32) NOT NULL COMMENT 'uuid4 hex, dikembalikan ke client sebagai job_id',
+  `nim` varchar(50) NOT NULL,
+  `status` enum('queued','running','done','failed') NOT NULL DEFAULT 'queued',
+  `total_images` int NOT NULL,
+  `accepted_images` int DEFAULT 0 COMMENT 'Foto yang ikut membentuk centroid',
+  `rejected` text NULL COMMENT 'JSON: [{image, reason, message}] foto yang ditolak',
+  `message` varchar(255) NULL,
+  `worker` varchar(128) NULL COMMENT 'host:pid proses yang memproses job',
+  `heartbeat_at` datetime NULL COMMENT 'Diperbarui berkala selama job hidup di worker-nya',
+  `created_at` datetime DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id_job`),
+  KEY `idx_face_enrollment_jobs_nim` (`nim`),
+  KEY `idx_face_enrollment_jobs_status` (`status`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+ALTER TABLE `face_registrations`
+  ADD COLUMN `sample_embeddings` mediumblob NULL COMMENT 'Per-image enrollment embeddings, sample_count x 512 float16' AFTER `embedding_dtype`,
+  ADD COLUMN `sample_count` int DEFAULT 0 COMMENT 'Number of rows in sample_embeddings' AFTER `sample_embeddings`;
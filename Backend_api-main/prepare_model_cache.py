@@ -0,0 +1,55 @@
+"""
+Siapkan cache bobot model untuk host offline
+Download bobot FaceNet (keras-facenet) ke MODEL_CACHE_DIR lalu tulis SHA256SUMS
+untuk semua file di cache (termasuk model detector, mis. YuNet .onnx, yang
+disalin manual ke model_cache/face_detector/).
+
+Cara run (di mesin yang online):
+    python prepare_model_cache.py
+Salin folder model_cache/ ke host offline, lalu set MODEL_OFFLINE=1.
+Cek cache di host offline:
+    python prepare_model_cache.py --check
+"""
+import argparse
+import os
+import sys
+
+from app.services.model_cache import ModelCache, CHECKSUM_FILE
+from app.config import MODEL_CACHE_DIR
+
+
+def prepare(cache):
+    print("📥 Download bobot FaceNet (jika belum ada)...")
+    from keras_facenet import FaceNet
+    FaceNet(cache_folder=os.path.join(cache.path, "keras-facenet"))
+    count = cache.write_checksums()
+    print(f"✅ {CHECKSUM_FILE} ditulis untuk {count} file di {cache.path}")
+    return True
+
+
+def check(cache):
+    checksums = cache.checksums()
+    if not checksums:
+        print(f"❌ {CHECKSUM_FILE} tidak ada di {cache.path}")
+        return False
+    ok = True
+    for name in sorted(checksums):
+        try:
+            cache.verify(os.path.join(cache.path, name))
+            print(f"   ✓ {name}")
+        except Exception as e:
+            print(f"   ❌ {e}")
+            ok = False
+    print(f"\n{'✅ Cache model valid' if ok else '❌ Cache model tidak valid'}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Siapkan / cek cache bobot model")
+    parser.add_argument("--cache-dir", default=MODEL_CACHE_DIR)
+    parser.add_argument("--check", action="store_true", help="Hanya verifikasi SHA256SUMS")
+    args = parser.parse_args()
+
+    cache = ModelCache(args.cache_dir)
+    success = check(cache) if args.check else prepare(cache)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,341 @@
+"""
+Threshold Calibration & Gallery Health
+======================================
+Kalibrasi threshold cosine distance dan cek kesehatan gallery embedding:
+
+- Matrix jarak semua pasangan identitas dihitung dengan satu matmul embedding
+  ternormalisasi, per chunk baris (memori O(chunk x n), bukan O(n^2)).
+- FAR (impostor lolos) dan FRR (pemilik ditolak) untuk setiap threshold, plus
+  kurva ROC dan EER.
+- Pasangan identitas yang hampir sama (near-duplicate) ditandai: registrasi
+  ganda, foto yang tertukar, atau kembar.
+- Threshold yang direkomendasikan untuk backend
+  (FACE_MATCH_THRESHOLD di Backend_api-main/app/config.py).
+
+Pasangan impostor diambil dari gallery (setiap .pkl = satu identitas).
+Pasangan genuine butuh foto/embedding tambahan per identitas di --probes:
+
+    probes/<username>/*.pkl   embedding (mis. hasil face_register.py)
+    probes/<username>/*.jpg   foto, di-embed dengan MTCNN + FaceNet
+
+Threshold direkomendasikan dari target false match 1:N (peluang wajah yang
+tidak terdaftar / orang lain cocok dengan salah satu identitas saat dicari ke
+seluruh gallery), jadi makin besar gallery makin ketat thresholdnya. Tanpa
+--probes hanya FAR yang bisa dihitung.
+
+Cara run:
+    python calibrate_threshold.py
+    python calibrate_threshold.py --embeddings ../Backend_api-main/embeddings --probes test_images
+    python calibrate_threshold.py --target-fmr 0.001 --output calibration.json
+"""
+
+import argparse
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+
+EMBEDDINGS_DIR = "embeddings"
+EMBEDDING_DIM = 512
+THRESHOLD = 0.4  # Default FACE_MATCH_THRESHOLD backend
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Histogram jarak impostor: cosine distance 0..2 dengan resolusi 0.0005
+HISTOGRAM_BINS = 4000
+DISTANCE_MAX = 2.0
+
+
+def normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norm = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norm[norm == 0] = 1.0
+    return matrix / norm
+
+
+def load_pkl(path):
+    with open(path, "rb") as f:
+        return np.asarray(pickle.load(f), dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+
+
+def load_gallery(embeddings_dir):
+    """Satu identitas per .pkl; return (labels, matrix ternormalisasi)"""
+    labels, vectors = [], []
+    for file_name in sorted(os.listdir(embeddings_dir)):
+        if not file_name.endswith(".pkl"):
+            continue
+        try:
+            vectors.append(load_pkl(os.path.join(embeddings_dir, file_name))[0])
+            labels.append(file_name[:-len(".pkl")])
+        except Exception as e:
+            print(f"   ❌ {file_name}: {e}")
+    if not vectors:
+        return labels, np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    return labels, normalize(np.vstack(vectors))
+
+
+class ImageEmbedder:
+    """MTCNN + FaceNet seperti face_register.py, dimuat hanya jika --probes berisi foto"""
+
+    def __init__(self):
+        from keras_facenet import FaceNet
+        from mtcnn import MTCNN
+        self.embedder = FaceNet()
+        self.detector = MTCNN()
+
+    def embed(self, path):
+        import cv2
+        img = cv2.imread(path)
+        if img is None:
+            return None
+        rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        faces = self.detector.detect_faces(rgb)
+        if not faces:
+            return None
+        x, y, w, h = faces[0]["box"]
+        x, y = max(0, x), max(0, y)
+        return self.embedder.embeddings([rgb[y:y + h, x:x + w]])[0]
+
+
+def load_probes(probes_dir, labels):
+    """Return (probe_labels, matrix ternormalisasi) dari probes/<username>/*"""
+    known = set(labels)
+    probe_labels, vectors = [], []
+    image_embedder = None
+    for label in sorted(os.listdir(probes_dir)):
+        folder = os.path.join(probes_dir, label)
+        if not os.path.isdir(folder):
+            continue
+        if label not in known:
+            print(f"   ⚠️  {label}: tidak ada di gallery, dilewati")
+            continue
+        for file_name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, file_name)
+            try:
+                if file_name.endswith(".pkl"):
+                    rows = list(load_pkl(path))
+                elif file_name.lower().endswith(IMAGE_EXTENSIONS):
+                    if image_embedder is None:
+                        print("🔄 Loading MTCNN + FaceNet untuk foto probe...")
+                        image_embedder = ImageEmbedder()
+                    embedding = image_embedder.embed(path)
+                    if embedding is None:
+                        print(f"   ⚠️  {label}/{file_name}: wajah tidak terdeteksi")
+                        continue
+                    rows = [embedding]
+                else:
+                    continue
+            except Exception as e:
+                print(f"   ❌ {label}/{file_name}: {e}")
+                continue
+            probe_labels += [label] * len(rows)
+            vectors += rows
+    if not vectors:
+        return probe_labels, np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    return probe_labels, normalize(np.vstack(vectors))
+
+
+def impostor_scan(gallery, chunk, duplicate_threshold):
+    """
+    Semua pasangan (i < j) gallery per chunk baris. Return histogram jarak,
+    jarak tetangga terdekat per identitas, dan pasangan di bawah duplicate_threshold.
+    """
+    n = len(gallery)
+    histogram = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+    nearest = np.full(n, np.inf, dtype=np.float32)
+    duplicates = []
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        distances = 1.0 - gallery[start:stop] @ gallery.T
+        np.maximum(distances, 0.0, out=distances)
+        rows = np.arange(stop - start)
+        distances[rows, rows + start] = np.inf  # diri sendiri
+
+        nearest[start:stop] = distances.min(axis=1)
+
+        # Hanya segitiga atas (j > i) supaya tiap pasangan dihitung sekali
+        upper = np.arange(n)[None, :] > (rows + start)[:, None]
+        pair_distances = distances[upper]
+        histogram += np.histogram(pair_distances, bins=HISTOGRAM_BINS, range=(0.0, DISTANCE_MAX))[0]
+
+        close_i, close_j = np.nonzero(upper & (distances < duplicate_threshold))
+        for i, j in zip(close_i, close_j):
+            duplicates.append((int(i + start), int(j), float(distances[i, j])))
+    return histogram, nearest, duplicates
+
+
+def genuine_scan(gallery, labels, probes, probe_labels):
+    """Jarak probe ke embedding pemiliknya, plus hasil identifikasi rank-1 (1:N)"""
+    index = {label: i for i, label in enumerate(labels)}
+    owners = np.array([index[label] for label in probe_labels], dtype=np.int64)
+    similarities = probes @ gallery.T
+    genuine = np.maximum(1.0 - similarities[np.arange(len(probes)), owners], 0.0)
+    best = np.argmax(similarities, axis=1)
+    best_distance = np.maximum(1.0 - similarities[np.arange(len(probes)), best], 0.0)
+    return genuine, best == owners, best_distance
+
+
+def far_at(histogram, total, thresholds):
+    """FAR(t) = pasangan impostor dengan jarak < t / total pasangan"""
+    cumulative = np.concatenate([[0], np.cumsum(histogram)])
+    bins = np.clip(np.floor(np.asarray(thresholds) / DISTANCE_MAX * HISTOGRAM_BINS).astype(int), 0, HISTOGRAM_BINS)
+    return cumulative[bins] / max(total, 1)
+
+
+def frr_at(genuine, thresholds):
+    """FRR(t) = probe genuine dengan jarak >= t / total probe"""
+    if len(genuine) == 0:
+        return np.full(len(thresholds), np.nan)
+    genuine = np.sort(genuine)
+    return 1.0 - np.searchsorted(genuine, thresholds, side="left") / len(genuine)
+
+
+def calibrate(labels, gallery, probe_labels, probes, target_fmr, duplicate_threshold, chunk, current=THRESHOLD):
+    n = len(labels)
+    started = time.perf_counter()
+    histogram, nearest, duplicates = impostor_scan(gallery, chunk, duplicate_threshold)
+    impostor_pairs = n * (n - 1) // 2
+
+    thresholds = np.round(np.arange(0.0, 1.0001, 0.01), 2)
+    fine = np.arange(0.0, DISTANCE_MAX, DISTANCE_MAX / HISTOGRAM_BINS)
+    far_fine = far_at(histogram, impostor_pairs, fine)
+
+    # Target 1:N -> FAR per pasangan: 1 - (1 - far)^(n - 1) <= target_fmr
+    target_far = 1.0 - (1.0 - target_fmr) ** (1.0 / max(n - 1, 1))
+    report = {
+        "identities": n,
+        "impostor_pairs": impostor_pairs,
+        "genuine_probes": len(probe_labels),
+        "target_false_match_rate_1_to_n": target_fmr,
+        "target_far_per_pair": float(f"{target_far:.3e}"),
+    }
+
+    # Rekomendasi: threshold terbesar yang FAR-nya masih <= target
+    allowed = np.nonzero(far_fine <= target_far)[0]
+    recommended = float(fine[allowed[-1]]) if len(allowed) else 0.0
+
+    genuine = np.array([])
+    if len(probe_labels):
+        genuine, correct, best_distance = genuine_scan(gallery, labels, probes, probe_labels)
+        frr_fine = frr_at(genuine, fine)
+        eer_index = int(np.nanargmin(np.abs(far_fine - frr_fine)))
+        report["eer"] = round(float((far_fine[eer_index] + frr_fine[eer_index]) / 2), 6)
+        report["eer_threshold"] = round(float(fine[eer_index]), 4)
+        report["genuine_distance"] = {
+            "p50": round(float(np.percentile(genuine, 50)), 4),
+            "p95": round(float(np.percentile(genuine, 95)), 4),
+            "max": round(float(genuine.max()), 4),
+        }
+        for name, t in (("current", current), ("recommended", recommended)):
+            accepted = best_distance < t
+            report[f"identification_at_{name}"] = {
+                "threshold": round(float(t), 4),
+                "rank1_correct": round(float(np.mean(correct & accepted)), 4),
+                "wrong_identity": round(float(np.mean(~correct & accepted)), 4),
+                "rejected": round(float(np.mean(~accepted)), 4),
+            }
+
+    far = far_at(histogram, impostor_pairs, thresholds)
+    frr = frr_at(genuine, thresholds)
+    report["roc"] = [
+        {
+            "threshold": float(t),
+            "far": round(float(a), 8),
+            "frr": None if np.isnan(r) else round(float(r), 6),
+        }
+        for t, a, r in zip(thresholds, far, frr)
+    ]
+    for name, t in (("current", current), ("recommended", recommended)):
+        far_t = float(far_at(histogram, impostor_pairs, [t])[0])
+        frr_t = float(frr_at(genuine, [t])[0])
+        report[name] = {
+            "threshold": round(float(t), 4),
+            "far": round(far_t, 8),
+            "frr": None if np.isnan(frr_t) else round(frr_t, 6),
+            # Peluang satu wajah asing lolos saat dicari ke seluruh gallery (1:N)
+            "false_match_rate_1_to_n": round(1.0 - (1.0 - far_t) ** max(n - 1, 0), 6),
+        }
+
+    finite = nearest[np.isfinite(nearest)]
+    report["nearest_neighbor_distance"] = {
+        "min": round(float(finite.min()), 4) if len(finite) else None,
+        "p1": round(float(np.percentile(finite, 1)), 4) if len(finite) else None,
+        "p50": round(float(np.percentile(finite, 50)), 4) if len(finite) else None,
+    }
+    duplicates.sort(key=lambda d: d[2])
+    report["duplicate_threshold"] = duplicate_threshold
+    report["near_duplicates"] = [
+        {"a": labels[i], "b": labels[j], "distance": round(d, 4)} for i, j, d in duplicates
+    ]
+    # Identitas yang tetangga terdekatnya di bawah threshold backend akan saling tertukar saat recognize
+    report["confusable_at_current"] = int(np.sum(nearest < current))
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+def print_report(report):
+    print("\n" + "=" * 60)
+    print("📊 THRESHOLD CALIBRATION")
+    print("=" * 60)
+    print(f"Identitas: {report['identities']} | Pasangan impostor: {report['impostor_pairs']:,} "
+          f"| Probe genuine: {report['genuine_probes']}")
+    nn = report["nearest_neighbor_distance"]
+    print(f"Jarak tetangga terdekat: min={nn['min']} p1={nn['p1']} p50={nn['p50']}")
+    if "eer" in report:
+        print(f"EER: {report['eer']:.4%} di threshold {report['eer_threshold']}")
+    for name in ("current", "recommended"):
+        row = report[name]
+        frr = "-" if row["frr"] is None else f"{row['frr']:.4%}"
+        print(f"{name:>11}: threshold={row['threshold']:<7} FAR={row['far']:.6%}  FRR={frr}  "
+              f"salah cocok 1:N={row['false_match_rate_1_to_n']:.4%}")
+    print(f"Identitas yang bisa tertukar di threshold {report['current']['threshold']}: {report['confusable_at_current']}")
+
+    duplicates = report["near_duplicates"]
+    if duplicates:
+        print(f"\n⚠️  {len(duplicates)} pasangan near-duplicate (jarak < {report['duplicate_threshold']}):")
+        for d in duplicates[:20]:
+            print(f"   {d['a']} ~ {d['b']}  ({d['distance']})")
+        if len(duplicates) > 20:
+            print(f"   ... dan {len(duplicates) - 20} lainnya (lihat --output)")
+    print(f"\n✅ Rekomendasi backend: FACE_MATCH_THRESHOLD={report['recommended']['threshold']}")
+    print(f"   Selesai dalam {report['seconds']} detik")
+    print("=" * 60 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings", default=EMBEDDINGS_DIR, help="Folder .pkl gallery")
+    parser.add_argument("--probes", help="Folder probes/<username>/*.pkl|*.jpg untuk pasangan genuine")
+    parser.add_argument("--target-fmr", type=float, default=0.01, help="False match 1:N yang diizinkan")
+    parser.add_argument("--current", type=float, default=THRESHOLD, help="FACE_MATCH_THRESHOLD yang dipakai sekarang")
+    parser.add_argument("--duplicate-threshold", type=float, default=0.2)
+    parser.add_argument("--chunk", type=int, default=1024, help="Baris per chunk matmul")
+    parser.add_argument("--output", help="Simpan report sebagai JSON")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.embeddings):
+        print(f"❌ Folder {args.embeddings} tidak ditemukan!")
+        return
+    print(f"📂 Loading gallery dari {args.embeddings}...")
+    labels, gallery = load_gallery(args.embeddings)
+    if len(labels) < 2:
+        print("❌ Butuh minimal 2 wajah terdaftar")
+        return
+
+    probe_labels, probes = [], np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    if args.probes:
+        probe_labels, probes = load_probes(args.probes, labels)
+
+    report = calibrate(
+        labels, gallery, probe_labels, probes,
+        args.target_fmr, args.duplicate_threshold, args.chunk, current=args.current
+    )
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
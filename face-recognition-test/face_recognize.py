@@ -570,30 +570,33 @@ def recognize_from_image(embeddings_db):
 
 def batch_test_all_registered(embeddings_db):
     """
-    Test recognition untuk semua wajah yang terdaftar
+    Test recognition untuk semua wajah yang terdaftar.
+    Jarak semua pasangan dihitung sekaligus (satu matmul embedding ternormalisasi);
+    untuk gallery besar dan kalibrasi threshold pakai calibrate_threshold.py
     """
     print("\n🧪 BATCH TEST MODE")
     print("="*60)
     print("Testing recognition untuk semua wajah terdaftar...")
     print("="*60 + "\n")
     
+    usernames = list(embeddings_db)
+    matrix = np.vstack([np.asarray(e, dtype=np.float32).reshape(-1) for e in embeddings_db.values()])
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    distances = np.maximum(1.0 - matrix @ matrix.T, 0.0)
+    
     results = []
     
-    for username, embedding in embeddings_db.items():
+    for i, username in enumerate(usernames):
         print(f"Testing: {username}")
         
-        # Test against all others
-        distances = {}
-        for other_username, other_embedding in embeddings_db.items():
-            distance = cosine(embedding, other_embedding)
-            distances[other_username] = distance
-        
-        # Sort by distance
-        sorted_matches = sorted(distances.items(), key=lambda x: x[1])
+        # Sort by distance (2 terdekat cukup)
+        row = distances[i]
+        order = np.argpartition(row, 1)[:2] if len(row) > 2 else np.arange(len(row))
+        order = order[np.argsort(row[order])]
         
         # Best match should be itself (distance ≈ 0)
-        best_match = sorted_matches[0]
-        second_match = sorted_matches[1] if len(sorted_matches) > 1 else None
+        best_match = (usernames[order[0]], float(distances[i, order[0]]))
+        second_match = (usernames[order[1]], float(distances[i, order[1]])) if len(order) > 1 else None
         
         print(f"  Best match: {best_match[0]} (distance: {best_match[1]:.4f})")
         if second_match: